@@ -0,0 +1,81 @@
+# flake8: noqa
+# type: ignore
+"""Initial
+
+Revision ID: 5b0c1f3e7a21
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '5b0c1f3e7a21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE SCHEMA IF NOT EXISTS email')
+    op.create_table(
+        'group_emails',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('source', sa.Text(), nullable=False),
+        sa.Column('destination_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('template_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('subject', sa.Text(), nullable=False),
+        sa.Column('message', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('delay', sa.Integer(), nullable=False),
+        sa.Column('send_with_gmt', postgresql.BOOLEAN(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('passed_to_handler_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        schema='email'
+    )
+    op.create_table(
+        'html_templates',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.Text(), nullable=False),
+        sa.Column('template', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        schema='email'
+    )
+    op.create_table(
+        'single_emails',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('source', sa.Text(), nullable=False),
+        sa.Column('destination_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('template_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('group_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('subject', sa.Text(), nullable=False),
+        sa.Column('message', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('delay', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('passed_to_handler_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('sent_result', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        schema='email'
+    )
+    op.create_index(
+        op.f('ix_email_single_emails_group_id'), 'single_emails', ['group_id'], unique=False, schema='email'
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_email_single_emails_group_id'), table_name='single_emails', schema='email')
+    op.drop_table('single_emails', schema='email')
+    op.drop_table('html_templates', schema='email')
+    op.drop_table('group_emails', schema='email')
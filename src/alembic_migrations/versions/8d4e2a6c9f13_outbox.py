@@ -0,0 +1,36 @@
+# flake8: noqa
+# type: ignore
+"""Outbox
+
+Revision ID: 8d4e2a6c9f13
+Revises: 5b0c1f3e7a21
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8d4e2a6c9f13'
+down_revision = '5b0c1f3e7a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('queue_name', sa.Text(), nullable=False),
+        sa.Column('message_body', sa.LargeBinary(), nullable=False),
+        sa.Column('message_headers', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('delay', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        schema='email'
+    )
+
+
+def downgrade():
+    op.drop_table('outbox', schema='email')
@@ -0,0 +1,153 @@
+# flake8: noqa
+# type: ignore
+"""Partition single_emails and delivery_state by created_at
+
+Revision ID: a7d3e5b9c146
+Revises: f4a1c9e7d352
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5b9c146'
+down_revision = 'f4a1c9e7d352'
+branch_labels = None
+depends_on = None
+
+FILLFACTOR = 70  # db.models.delivery_state.DELIVERY_STATE_FILLFACTOR на момент миграции
+AHEAD_DAYS = 7  # Дальше секции наперёд создаёт partition_retention
+ARCHIVE_SCHEMA = 'email_archive'
+
+
+def upgrade():
+    # Старые таблицы уезжают в сторону вместе с именами своих индексов — имена нужны новым таблицам.
+    op.execute('ALTER TABLE email.delivery_state RENAME TO delivery_state_old')
+    op.execute('ALTER INDEX IF EXISTS email.delivery_state_pkey RENAME TO delivery_state_old_pkey')
+    op.execute('ALTER TABLE email.single_emails RENAME TO single_emails_old')
+    op.execute('ALTER INDEX IF EXISTS email.single_emails_pkey RENAME TO single_emails_old_pkey')
+    op.execute('ALTER INDEX IF EXISTS email.single_emails_id_key RENAME TO single_emails_old_id_key')
+    op.execute('ALTER INDEX IF EXISTS email.ix_email_single_emails_group_id RENAME TO ix_email_single_emails_old_group_id')
+
+    op.execute(
+        """
+        CREATE TABLE email.single_emails (
+            id uuid NOT NULL,
+            source text NOT NULL,
+            destination_id uuid NOT NULL,
+            template_id uuid NOT NULL,
+            group_id uuid,
+            subject text NOT NULL,
+            message jsonb NOT NULL,
+            delay integer NOT NULL,
+            created_at timestamptz NOT NULL,
+            updated_at timestamptz,
+            deleted_at timestamptz,
+            CONSTRAINT single_emails_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute('CREATE INDEX ix_email_single_emails_group_id ON email.single_emails (group_id)')
+    op.execute(
+        """
+        CREATE TABLE email.delivery_state (
+            notification_id uuid NOT NULL,
+            created_at timestamptz NOT NULL,
+            passed_to_handler_at timestamptz,
+            sent_at timestamptz,
+            sent_result text,
+            CONSTRAINT delivery_state_pkey PRIMARY KEY (notification_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+
+    # Всё, что создано до конца сегодняшних суток (UTC), — в секцию *_legacy, дальше — суточные секции.
+    # fillfactor у секционированной таблицы не задать — он задаётся каждой секции delivery_state.
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            legacy_end timestamptz := date_trunc('day', now(), 'UTC') + interval '1 day';
+            partition_start timestamptz;
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE email.single_emails_legacy PARTITION OF email.single_emails
+                FOR VALUES FROM (MINVALUE) TO (%L)',
+                legacy_end
+            );
+            EXECUTE format(
+                'CREATE TABLE email.delivery_state_legacy PARTITION OF email.delivery_state
+                FOR VALUES FROM (MINVALUE) TO (%L) WITH (fillfactor = {FILLFACTOR})',
+                legacy_end
+            );
+            FOR day_number IN 0..{AHEAD_DAYS - 1} LOOP
+                partition_start := legacy_end + day_number * interval '1 day';
+                EXECUTE format(
+                    'CREATE TABLE email.%I PARTITION OF email.single_emails FOR VALUES FROM (%L) TO (%L)',
+                    'single_emails_p' || to_char(partition_start AT TIME ZONE 'UTC', 'YYYYMMDD'),
+                    partition_start,
+                    partition_start + interval '1 day'
+                );
+                EXECUTE format(
+                    'CREATE TABLE email.%I PARTITION OF email.delivery_state FOR VALUES FROM (%L) TO (%L)
+                    WITH (fillfactor = {FILLFACTOR})',
+                    'delivery_state_p' || to_char(partition_start AT TIME ZONE 'UTC', 'YYYYMMDD'),
+                    partition_start,
+                    partition_start + interval '1 day'
+                );
+            END LOOP;
+        END $$
+        """
+    )
+
+    op.execute(
+        """
+        INSERT INTO email.single_emails (
+            id, source, destination_id, template_id, group_id, subject, message, delay,
+            created_at, updated_at, deleted_at
+        )
+        SELECT id, source, destination_id, template_id, group_id, subject, message, delay,
+            COALESCE(created_at, now()), updated_at, deleted_at
+        FROM email.single_emails_old
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO email.delivery_state (notification_id, created_at, passed_to_handler_at, sent_at, sent_result)
+        SELECT state.notification_id, emails.created_at, state.passed_to_handler_at, state.sent_at, state.sent_result
+        FROM email.delivery_state_old AS state
+        JOIN email.single_emails AS emails ON emails.id = state.notification_id
+        """
+    )
+    op.execute('DROP TABLE email.delivery_state_old')
+    op.execute('DROP TABLE email.single_emails_old')
+    op.execute(f'CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}')
+
+
+def downgrade():
+    # Отцепленные в архив секции обратно не возвращаются — схема email_archive остаётся как есть.
+    op.execute('CREATE TABLE email.single_emails_plain AS SELECT * FROM email.single_emails')
+    op.execute(
+        """
+        CREATE TABLE email.delivery_state_plain AS
+        SELECT notification_id, passed_to_handler_at, sent_at, sent_result FROM email.delivery_state
+        """
+    )
+    op.execute('DROP TABLE email.delivery_state')
+    op.execute('DROP TABLE email.single_emails')
+
+    op.execute('ALTER TABLE email.single_emails_plain RENAME TO single_emails')
+    op.execute('ALTER TABLE email.single_emails ALTER COLUMN created_at DROP NOT NULL')
+    op.execute('ALTER TABLE email.single_emails ADD CONSTRAINT single_emails_pkey PRIMARY KEY (id)')
+    op.execute('ALTER TABLE email.single_emails ADD CONSTRAINT single_emails_id_key UNIQUE (id)')
+    op.execute('CREATE INDEX ix_email_single_emails_group_id ON email.single_emails (group_id)')
+
+    op.execute('ALTER TABLE email.delivery_state_plain RENAME TO delivery_state')
+    op.execute('ALTER TABLE email.delivery_state ADD CONSTRAINT delivery_state_pkey PRIMARY KEY (notification_id)')
+    op.execute(
+        """
+        ALTER TABLE email.delivery_state ADD CONSTRAINT delivery_state_notification_id_fkey
+        FOREIGN KEY (notification_id) REFERENCES email.single_emails (id) ON DELETE CASCADE
+        """
+    )
+    op.execute(f'ALTER TABLE email.delivery_state SET (fillfactor = {FILLFACTOR})')
@@ -0,0 +1,44 @@
+# flake8: noqa
+# type: ignore
+"""Hot path indexes
+
+Revision ID: b9e2d7f4a318
+Revises: a7d3e5b9c146
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b9e2d7f4a318'
+down_revision = 'a7d3e5b9c146'
+branch_labels = None
+depends_on = None
+
+# Индексы подобраны под запросы горячего пути, их планы проверяет tests/functional/src/test_query_plans.py.
+#
+# На delivery_state новых индексов нет намеренно: отметки (passed_to_handler_at, sent_at, sent_result)
+# меняются на каждое сообщение, а колонка из любого индекса, даже только из условия частичного индекса,
+# выключает HOT-обновления — ради которых delivery_state и вынесена в узкую таблицу. Все блокировки
+# ищут строку по первичному ключу (notification_id, created_at), условие на отметку проверяется на самой строке.
+# То же с group_emails и single_emails: все блокировки — по первичному ключу, и частичный индекс по отметкам
+# только добавил бы запись в индекс на каждую блокировку, не сократив поиск.
+
+
+def upgrade():
+    # UNIQUE (id) рядом с PRIMARY KEY (id) — второй такой же индекс, который API обновляет на каждую вставку.
+    op.execute('ALTER TABLE email.group_emails DROP CONSTRAINT IF EXISTS group_emails_id_key')
+    op.execute('ALTER TABLE email.html_templates DROP CONSTRAINT IF EXISTS html_templates_id_key')
+
+    # По group_id ищут только письма рассылок; одиночные письма из API (group_id IS NULL) в индекс не попадают.
+    op.execute('DROP INDEX email.ix_email_single_emails_group_id')
+    op.execute(
+        'CREATE INDEX ix_email_single_emails_group_id ON email.single_emails (group_id) WHERE group_id IS NOT NULL'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX email.ix_email_single_emails_group_id')
+    op.execute('CREATE INDEX ix_email_single_emails_group_id ON email.single_emails (group_id)')
+    op.execute('ALTER TABLE email.html_templates ADD CONSTRAINT html_templates_id_key UNIQUE (id)')
+    op.execute('ALTER TABLE email.group_emails ADD CONSTRAINT group_emails_id_key UNIQUE (id)')
@@ -0,0 +1,25 @@
+# flake8: noqa
+# type: ignore
+"""Outbox shard key
+
+Revision ID: c3f7a9b2d814
+Revises: 8d4e2a6c9f13
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3f7a9b2d814'
+down_revision = '8d4e2a6c9f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox', sa.Column('shard_key', sa.Text(), nullable=True), schema='email')
+
+
+def downgrade():
+    op.drop_column('outbox', 'shard_key', schema='email')
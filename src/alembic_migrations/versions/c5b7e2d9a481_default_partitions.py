@@ -0,0 +1,35 @@
+# flake8: noqa
+# type: ignore
+"""Default partitions for single_emails and delivery_state
+
+Revision ID: c5b7e2d9a481
+Revises: f2a6d9c3b518
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c5b7e2d9a481'
+down_revision = 'f2a6d9c3b518'
+branch_labels = None
+depends_on = None
+
+FILLFACTOR = 70  # db.models.delivery_state.DELIVERY_STATE_FILLFACTOR на момент миграции
+
+
+def upgrade():
+    # Если partition_retention не успел создать секцию наперёд, вставка ляжет сюда, а не упадёт.
+    op.execute('CREATE TABLE email.single_emails_default PARTITION OF email.single_emails DEFAULT')
+    op.execute(
+        f'CREATE TABLE email.delivery_state_default PARTITION OF email.delivery_state DEFAULT WITH (fillfactor = {FILLFACTOR})'
+    )
+
+
+def downgrade():
+    # Строки в секциях по умолчанию удалятся вместе с ними. Перед downgrade их забирает в суточные секции
+    # partition_retention (строки остаются там, только если для их дня секции нет).
+    op.execute('ALTER TABLE email.delivery_state DETACH PARTITION email.delivery_state_default')
+    op.execute('ALTER TABLE email.single_emails DETACH PARTITION email.single_emails_default')
+    op.execute('DROP TABLE email.delivery_state_default')
+    op.execute('DROP TABLE email.single_emails_default')
@@ -0,0 +1,28 @@
+# flake8: noqa
+# type: ignore
+"""Outbox delay float
+
+Revision ID: d6e1b4a2c907
+Revises: b9e2d7f4a318
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd6e1b4a2c907'
+down_revision = 'b9e2d7f4a318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Задержка бывает дробной (MessageBrokerData.delay), Integer молча её округлял.
+    op.alter_column('outbox', 'delay', type_=sa.Float(), existing_nullable=False, schema='email')
+
+
+def downgrade():
+    op.alter_column(
+        'outbox', 'delay', type_=sa.Integer(), existing_nullable=False, schema='email', postgresql_using='round(delay)'
+    )
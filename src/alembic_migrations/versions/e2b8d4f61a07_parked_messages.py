@@ -0,0 +1,47 @@
+# flake8: noqa
+# type: ignore
+"""Parked messages
+
+Revision ID: e2b8d4f61a07
+Revises: c3f7a9b2d814
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8d4f61a07'
+down_revision = 'c3f7a9b2d814'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'parked_messages',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('stage', sa.Text(), nullable=False),
+        sa.Column('queue_name', sa.Text(), nullable=False),
+        sa.Column('message_body', sa.LargeBinary(), nullable=False),
+        sa.Column('message_headers', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('source', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('parked_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('replayed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        schema='email'
+    )
+    op.create_index(op.f('ix_email_parked_messages_stage'), 'parked_messages', ['stage'], unique=False, schema='email')
+    op.create_index(op.f('ix_email_parked_messages_source'), 'parked_messages', ['source'], unique=False, schema='email')
+    op.create_index(
+        op.f('ix_email_parked_messages_parked_at'), 'parked_messages', ['parked_at'], unique=False, schema='email'
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_email_parked_messages_parked_at'), table_name='parked_messages', schema='email')
+    op.drop_index(op.f('ix_email_parked_messages_source'), table_name='parked_messages', schema='email')
+    op.drop_index(op.f('ix_email_parked_messages_stage'), table_name='parked_messages', schema='email')
+    op.drop_table('parked_messages', schema='email')
@@ -0,0 +1,25 @@
+# flake8: noqa
+# type: ignore
+"""Group emails expired_at
+
+Revision ID: e8c2f5a1d736
+Revises: d6e1b4a2c907
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e8c2f5a1d736'
+down_revision = 'd6e1b4a2c907'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('group_emails', sa.Column('expired_at', sa.DateTime(timezone=True), nullable=True), schema='email')
+
+
+def downgrade():
+    op.drop_column('group_emails', 'expired_at', schema='email')
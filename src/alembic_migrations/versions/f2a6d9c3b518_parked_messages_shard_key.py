@@ -0,0 +1,25 @@
+# flake8: noqa
+# type: ignore
+"""Parked messages shard key
+
+Revision ID: f2a6d9c3b518
+Revises: e8c2f5a1d736
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d9c3b518'
+down_revision = 'e8c2f5a1d736'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('parked_messages', sa.Column('shard_key', sa.Text(), nullable=True), schema='email')
+
+
+def downgrade():
+    op.drop_column('parked_messages', 'shard_key', schema='email')
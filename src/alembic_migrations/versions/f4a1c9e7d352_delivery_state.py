@@ -0,0 +1,64 @@
+# flake8: noqa
+# type: ignore
+"""Delivery state
+
+Revision ID: f4a1c9e7d352
+Revises: e2b8d4f61a07
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f4a1c9e7d352'
+down_revision = 'e2b8d4f61a07'
+branch_labels = None
+depends_on = None
+
+FILLFACTOR = 70  # db.models.delivery_state.DELIVERY_STATE_FILLFACTOR на момент миграции
+
+
+def upgrade():
+    op.create_table(
+        'delivery_state',
+        sa.Column('notification_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('passed_to_handler_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('sent_result', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['notification_id'], ['email.single_emails.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('notification_id'),
+        schema='email'
+    )
+    op.execute(f'ALTER TABLE email.delivery_state SET (fillfactor = {FILLFACTOR})')
+    op.execute(
+        """
+        INSERT INTO email.delivery_state (notification_id, passed_to_handler_at, sent_at, sent_result)
+        SELECT id, passed_to_handler_at, sent_at, sent_result
+        FROM email.single_emails
+        WHERE passed_to_handler_at IS NOT NULL OR sent_at IS NOT NULL OR sent_result IS NOT NULL
+        """
+    )
+    op.drop_column('single_emails', 'sent_result', schema='email')
+    op.drop_column('single_emails', 'sent_at', schema='email')
+    op.drop_column('single_emails', 'passed_to_handler_at', schema='email')
+
+
+def downgrade():
+    op.add_column(
+        'single_emails', sa.Column('passed_to_handler_at', sa.DateTime(timezone=True), nullable=True), schema='email'
+    )
+    op.add_column('single_emails', sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True), schema='email')
+    op.add_column('single_emails', sa.Column('sent_result', sa.Text(), nullable=True), schema='email')
+    op.execute(
+        """
+        UPDATE email.single_emails
+        SET passed_to_handler_at = delivery_state.passed_to_handler_at,
+            sent_at = delivery_state.sent_at,
+            sent_result = delivery_state.sent_result
+        FROM email.delivery_state
+        WHERE email.single_emails.id = delivery_state.notification_id
+        """
+    )
+    op.drop_table('delivery_state', schema='email')
@@ -55,6 +55,18 @@ LOGGING = {
         'email_sender': {
             'level': 'INFO',
             'handlers': ['file']
+        },
+        'outbox_relay': {
+            'level': 'INFO',
+            'handlers': ['file']
+        },
+        'partition_retention': {
+            'level': 'INFO',
+            'handlers': ['file']
+        },
+        'single_node': {
+            'level': 'INFO',
+            'handlers': ['file']
         }
     },
     'root': {
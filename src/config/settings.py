@@ -28,18 +28,45 @@ class RabbitSettings(BaseSettings):
     port: int = vault.get_secret('rabbit_port')
     login: SecretStr = vault.get_secret('rabbit_login')
     password: SecretStr = vault.get_secret('rabbit_password')
+    message_broker: str = vault.get_secret('message_broker')  # rabbit или memory (single_node)
     queue_waiting_depart: str = vault.get_secret('queue_waiting_depart')
     queue_waiting_retry: str = vault.get_secret('queue_waiting_retry')
     exchange_incoming: str = vault.get_secret('exchange_incoming')
     exchange_sorter: str = vault.get_secret('exchange_sorter')
     exchange_retry: str = vault.get_secret('exchange_retry')
+    exchange_retry_tiers: str = vault.get_secret('exchange_retry_tiers')
     default_message_ttl_ms: int = vault.get_secret('default_message_ttl_ms')
+    delay_levels: int = vault.get_secret('delay_levels')
     max_retry_count: int = vault.get_secret('max_retry_count')
+    retry_tiers: int = vault.get_secret('retry_tiers')
+    retry_factor: float = vault.get_secret('retry_factor')
+    retry_jitter: float = vault.get_secret('retry_jitter')
+    channel_pool_size: int = vault.get_secret('channel_pool_size')
+    publish_confirm_window: int = vault.get_secret('publish_confirm_window')
+    publish_confirm_timeout: float = vault.get_secret('publish_confirm_timeout')  # Без журнала (spill_after — с ним)
+    publish_attempts: int = vault.get_secret('publish_attempts')  # Попыток дослать неподтверждённые сообщения пачки
+    drain_timeout: int = vault.get_secret('drain_timeout')
+    spill_journal_path: str = vault.get_secret('spill_journal_path')  # Пусто — журнал выключен
+    spill_journal_size: int = vault.get_secret('spill_journal_size')
+    spill_after: float = vault.get_secret('spill_after')
+    spill_replay_interval: float = vault.get_secret('spill_replay_interval')
+    queue_shards: int = vault.get_secret('queue_shards')
+    consume_shards: str = vault.get_secret('consume_shards')
+    fair_sources: str = vault.get_secret('fair_sources')  # «source:weight[:max_in_flight],...», пусто — выключено
+    fair_sources_draining: str = vault.get_secret('fair_sources_draining')  # Убранные из fair_sources: дочитываем
+    fair_stats_interval: float = vault.get_secret('fair_stats_interval')
 
     queue_raw_single_messages: str = vault.get_secret('queue_raw_single_messages')
     queue_raw_group_messages: str = vault.get_secret('queue_raw_group_messages')
     queue_formatted_single_messages: str = vault.get_secret('queue_formatted_single_messages')
 
+    prefetch_raw_single_messages: int = vault.get_secret('prefetch_raw_single_messages')
+    max_in_flight_raw_single_messages: int = vault.get_secret('max_in_flight_raw_single_messages')
+    prefetch_raw_group_messages: int = vault.get_secret('prefetch_raw_group_messages')
+    max_in_flight_raw_group_messages: int = vault.get_secret('max_in_flight_raw_group_messages')
+    prefetch_formatted_single_messages: int = vault.get_secret('prefetch_formatted_single_messages')
+    max_in_flight_formatted_single_messages: int = vault.get_secret('max_in_flight_formatted_single_messages')
+
 
 class PostgresSettings(BaseSettings):
 
@@ -49,6 +76,20 @@ class PostgresSettings(BaseSettings):
     password: SecretStr = vault.get_secret('pg_password')
     host: str = vault.get_secret('pg_host')
     db_name: str = vault.get_secret('pg_db_name')
+    # Реплика для чтения в API (пусто — читаем с primary) и окно read-your-writes после записи, секунды.
+    replica_host: str = vault.get_secret('pg_replica_host')
+    read_your_writes_window: float = vault.get_secret('pg_read_your_writes_window')
+    replica_retry_interval: float = vault.get_secret('pg_replica_retry_interval')
+    # Пул свой у каждого процесса — размер удобно переопределять для сервиса через env (POOL_MAX_SIZE и т.д.).
+    pool_min_size: int = vault.get_secret('pg_pool_min_size')
+    pool_max_size: int = vault.get_secret('pg_pool_max_size')
+    pool_acquire_timeout: float = vault.get_secret('pg_pool_acquire_timeout')
+    statement_cache_size: int = vault.get_secret('pg_statement_cache_size')
+    connection_lifetime: float = vault.get_secret('pg_connection_lifetime')
+    pool_stats_interval: float = vault.get_secret('pg_pool_stats_interval')
+    # Микро-пачки записей горячего пути (db/storage/micro_batcher.py).
+    batch_max_size: int = vault.get_secret('pg_batch_max_size')
+    batch_max_delay: float = vault.get_secret('pg_batch_max_delay')
 
 
 class SettingsSwaggerDocs(BaseSettings):
@@ -99,6 +140,36 @@ class SettingsRedis(BaseSettings):
     port: int = vault.get_secret('redis_port')
 
 
+class SettingsDedup(BaseSettings):
+
+    """Класс настроек кэша обработанных сообщений."""
+
+    lru_size: int = vault.get_secret('dedup_lru_size')
+    use_redis: bool = vault.get_secret('dedup_use_redis')
+    redis_ttl: int = vault.get_secret('dedup_redis_ttl')
+
+
+class SettingsOutbox(BaseSettings):
+
+    """Класс настроек outbox_relay."""
+
+    batch_size: int = vault.get_secret('outbox_batch_size')
+    poll_interval: float = vault.get_secret('outbox_poll_interval')
+
+
+class SettingsPartitions(BaseSettings):
+
+    """Класс настроек секционирования single_emails и delivery_state (db/storage/partitions.py)."""
+
+    ahead_days: int = vault.get_secret('partitions_ahead_days')
+    min_ahead_days: int = vault.get_secret('partitions_min_ahead_days')  # Меньше — ошибка в лог
+    retention_days: int = vault.get_secret('partitions_retention_days')
+    archive_schema: str = vault.get_secret('partitions_archive_schema')  # Пусто — старые секции удаляются
+    check_interval: float = vault.get_secret('partitions_check_interval')
+    lock_timeout_ms: int = vault.get_secret('partitions_lock_timeout_ms')
+    idempotency_window: float = vault.get_secret('partitions_idempotency_window')
+
+
 class Config(BaseSettings):
 
     """Класс с конфигурацией проекта."""
@@ -110,6 +181,9 @@ class Config(BaseSettings):
     jaeger: SettingsJaeger = SettingsJaeger()
     redis: SettingsRedis = SettingsRedis()
     smtp: SMTPSettings = SMTPSettings()
+    outbox: SettingsOutbox = SettingsOutbox()
+    dedup: SettingsDedup = SettingsDedup()
+    partitions: SettingsPartitions = SettingsPartitions()
 
 
 config = Config()
@@ -0,0 +1,44 @@
+"""Модуль содержит абстрактные классы."""
+from abc import ABC, abstractmethod
+from typing import Union
+from uuid import UUID
+
+
+class AbstractDedupCache(ABC):
+
+    """Класс с интерфейсом кэша уже обработанных сообщений."""
+
+    @abstractmethod
+    async def start(self) -> None:
+        """Метод создаёт соединения, нужные кэшу."""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Метод закрывает соединения кэша."""
+        pass
+
+    @abstractmethod
+    async def is_done(self, stage: str, notification_id: Union[UUID, str]) -> bool:
+        """
+        Метод отвечает на вопрос, закончил ли этап stage работу с сообщением.
+
+        Args:
+            stage: название этапа (сервиса)
+            notification_id: id сообщения
+
+        Returns:
+            Вернёт True, если сообщение точно обработано.
+        """
+        pass
+
+    @abstractmethod
+    async def mark_done(self, stage: str, notification_id: Union[UUID, str]) -> None:
+        """
+        Метод запоминает, что этап stage закончил работу с сообщением.
+
+        Args:
+            stage: название этапа (сервиса)
+            notification_id: id сообщения
+        """
+        pass
@@ -0,0 +1,123 @@
+"""
+Модуль содержит кэш уже обработанных сообщений.
+
+При повторной доставке (ретраи, redelivery после падения consumer-а) callback-и раньше узнавали,
+что сообщение уже обработано, только после UPDATE ... RETURNING в Postgres.
+Во время шторма ретраев это сплошные холостые записи в БД.
+
+Теперь сначала спрашиваем кэш: LRU в памяти процесса (lru_size записей)
+и, если включено (use_redis), Redis — общий для всех экземпляров (ключи живут redis_ttl секунд).
+Отмечать сообщение можно только когда этап закончил с ним окончательно (успех или дроп этим же сообщением).
+Если блокировку в БД держит кто-то другой — отмечать нельзя: он ещё может упасть и вернуть сообщение на повтор.
+
+Кэш — только оптимизация: любая ошибка Redis логируется, а решение остаётся за блокировкой в БД.
+"""
+import logging
+from collections import OrderedDict
+from typing import Optional, Union
+from uuid import UUID
+
+import aioredis
+from aioredis import Redis
+
+from config.settings import config
+from db.cache.abstract_classes import AbstractDedupCache
+
+
+class DedupCache(AbstractDedupCache):
+
+    """Класс с интерфейсом кэша уже обработанных сообщений (LRU + Redis)."""
+
+    def __init__(self) -> None:
+        """Конструктор."""
+        self.redis: Optional[Redis] = None
+        self._lru: OrderedDict = OrderedDict()
+
+    async def start(self) -> None:
+        """Метод создаёт пул соединений с Redis (если он включён)."""
+        if config.dedup.use_redis:
+            redis_host = config.redis.host
+            redis_port = config.redis.port
+            self.redis = aioredis.from_url(f'redis://{redis_host}:{redis_port}', db=0)
+
+    async def stop(self) -> None:
+        """Метод закрывает соединения с Redis."""
+        if self.redis is not None:
+            await self.redis.close()
+
+    async def is_done(self, stage: str, notification_id: Union[UUID, str]) -> bool:
+        """
+        Метод отвечает на вопрос, закончил ли этап stage работу с сообщением.
+
+        Args:
+            stage: название этапа (сервиса)
+            notification_id: id сообщения
+
+        Returns:
+            Вернёт True, если сообщение точно обработано.
+        """
+        key = self._get_key(stage, notification_id)
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return True
+
+        if self.redis is None:
+            return False
+
+        try:
+            is_done = bool(await self.redis.exists(key))
+        except Exception as error:
+            logger.warning('Failed check %s in Redis: %s', key, error)
+            return False
+
+        if is_done:
+            self._remember(key)
+        return is_done
+
+    async def mark_done(self, stage: str, notification_id: Union[UUID, str]) -> None:
+        """
+        Метод запоминает, что этап stage закончил работу с сообщением.
+
+        Args:
+            stage: название этапа (сервиса)
+            notification_id: id сообщения
+        """
+        key = self._get_key(stage, notification_id)
+        self._remember(key)
+
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(key, 1, ex=config.dedup.redis_ttl)
+        except Exception as error:
+            logger.warning('Failed mark %s in Redis: %s', key, error)
+
+    def _remember(self, key: str) -> None:
+        """
+        Внутренний метод кладёт ключ в LRU и вытесняет самые давние ключи.
+
+        Args:
+            key: ключ
+        """
+        self._lru[key] = True
+        self._lru.move_to_end(key)
+        while len(self._lru) > config.dedup.lru_size:
+            self._lru.popitem(last=False)
+
+    def _get_key(self, stage: str, notification_id: Union[UUID, str]) -> str:
+        """
+        Внутренний метод собирает ключ кэша.
+
+        Args:
+            stage: название этапа (сервиса)
+            notification_id: id сообщения
+
+        Returns:
+            Вернёт ключ.
+        """
+        return f'dedup:{stage}:{notification_id}'
+
+
+logger = logging.getLogger('db.cache')
+dedup_cache = DedupCache()
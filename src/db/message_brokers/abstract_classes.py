@@ -1,22 +1,62 @@
 """Модуль содержит абстрактные классы."""
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, Union, Callable
+from typing import Optional, Union, Callable, List, Any, Dict
 
 from pamqp.commands import Basic
 
+from config.settings import config
+from db.message_brokers.fair_scheduler import DEFAULT_SOURCE, parse_fair_sources
+
+HIGH_PRIORITY = 'high'
+DEADLINE_HEADER = 'x-deadline'
+CREATED_AT_HEADER = 'x-created-at'  # Когда создано уведомление (секция single_emails, см. db/storage/partitions.py)
+SOURCE_HEADER = 'x-source'
+SHARD_KEY_HEADER = 'x-shard-key'  # Ключ шарда едет с сообщением: parking_replay вернёт его в тот же шард
+LAST_ERROR_HEADER = 'x-last-error'
+LAST_ERROR_MAX_LENGTH = 500
+
 
 class AbstractMessageBroker(ABC):
 
     """Класс с интерфейсом брокера сообщений."""
 
     @abstractmethod
-    async def consume(self, queue_name: str, callback: Callable) -> None:
+    async def start(self) -> None:
+        """Метод создаёт соединение с брокером."""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """Метод закрывает соединение с брокером."""
+        pass
+
+    @abstractmethod
+    def stop_consuming(self) -> None:
+        """Метод просит consume перестать брать новые сообщения и дождаться уже начатых."""
+        pass
+
+    @abstractmethod
+    async def consume(
+        self,
+        queue_name: str,
+        callback: Callable,
+        prefetch_count: int = 10,
+        max_in_flight: int = 10,
+        shards: Optional[List[int]] = None
+    ) -> None:
         """
         Метод обрабатывает сообщения функцией callback из очереди с названием queue_name.
 
         Args:
             queue_name: название очереди, из которой хотим получить данные
             callback: функция, которая будет обрабатывать сообщения
+            prefetch_count: сколько неподтверждённых сообщений брокер может выдать consumer-у заранее
+            max_in_flight: сколько callback-ов может выполняться одновременно
+            shards: номера шардов очереди, которые нужно слушать
+
+        Метод работает, пока не вызовут stop_consuming.
         """
         pass
 
@@ -26,7 +66,8 @@ class AbstractMessageBroker(ABC):
         message_body: bytes,
         queue_name: str,
         message_headers: Optional[dict] = None,
-        delay: Union[int, float] = 0
+        delay: Union[int, float] = 0,
+        shard_key: Optional[str] = None
     ) -> Union[Basic.Ack, Basic.Nack, Basic.Reject, None]:
         """
         Метод складывает сообщение в очередь.
@@ -36,12 +77,228 @@ class AbstractMessageBroker(ABC):
             delay: ttl сообщения, указывается в секундах
             queue_name: название очереди, в которую нужно отправить сообщение
             message_headers: заголовок сообщения (сюда нужно вставить x-request-id)
+            shard_key: ключ шардирования
 
         Returns:
             Вернёт ответ на вопрос была ли запись успешно добавлена
         """
         pass
 
+    @abstractmethod
+    async def publish_many(
+        self,
+        messages_body: List[bytes],
+        queue_name: str,
+        messages_headers: Optional[List[Optional[dict]]] = None,
+        delays: Optional[List[Union[int, float]]] = None,
+        shard_keys: Optional[List[Optional[str]]] = None,
+        spill: bool = True
+    ) -> List[bool]:
+        """
+        Метод складывает пачку сообщений в очередь.
+
+        Args:
+            messages_body: содержимое сообщений
+            queue_name: название очереди, в которую нужно отправить сообщения
+            messages_headers: заголовки сообщений (по одному на каждое сообщение)
+            delays: ttl сообщений в секундах (по одному на каждое сообщение)
+            shard_keys: ключи шардирования (по одному на каждое сообщение)
+            spill: можно ли при недоступности брокера дописать сообщения в локальный журнал
+
+        Returns:
+            Вернёт для каждого сообщения ответ на вопрос было ли оно успешно добавлено.
+        """
+        pass
+
+    @abstractmethod
+    async def retry(self, message: Any, error: Optional[str] = None) -> None:
+        """
+        Метод отправляет сообщение на повторную обработку с задержкой, растущей от попытки к попытке.
+
+        Args:
+            message: сообщение, которое не удалось обработать
+            error: почему не удалось (попадёт в заголовок x-last-error, а потом и в парковку)
+        """
+        pass
+
+    def get_retry_count(self, headers: dict) -> int:
+        """
+        Метод считает, сколько раз сообщение уже не удалось обработать.
+
+        Учитываются перепубликации через retry() (заголовок retry-count) и reject() (x-death с reason rejected).
+        Проходы через очереди задержки (reason expired) попытками не считаются.
+
+        Args:
+            headers: заголовки сообщения
+
+        Returns:
+            Вернёт кол-во неудачных попыток.
+        """
+        rejected = sum(
+            death['count']
+            for death in headers.get('x-death') or []
+            if death.get('reason') == 'rejected'
+        )
+        return int(headers.get('retry-count', 0)) + rejected
+
+    def get_deadline(self, headers: dict) -> Optional[float]:
+        """
+        Метод достаёт из заголовков крайний срок доставки уведомления.
+
+        Args:
+            headers: заголовки сообщения
+
+        Returns:
+            Вернёт unix timestamp или None, если срок не задан.
+        """
+        deadline = headers.get(DEADLINE_HEADER)
+        return None if deadline is None else float(deadline)
+
+    def get_created_at(self, headers: dict) -> Optional[float]:
+        """
+        Метод достаёт из заголовков время создания уведомления.
+
+        Args:
+            headers: заголовки сообщения
+
+        Returns:
+            Вернёт unix timestamp или None, если время не передано.
+        """
+        created_at = headers.get(CREATED_AT_HEADER)
+        return None if created_at is None else float(created_at)
+
+    def is_expired(self, deadline: Optional[float]) -> bool:
+        """
+        Метод отвечает на вопрос, истёк ли крайний срок доставки уведомления.
+
+        Args:
+            deadline: unix timestamp крайнего срока (None — срока нет)
+
+        Returns:
+            Вернёт True, если отправлять уведомление уже поздно.
+        """
+        return deadline is not None and deadline < time.time()
+
+    def _get_retry_headers(self, headers: dict, retry_count: int, retry_tier: int, error: Optional[str]) -> dict:
+        """
+        Внутренний метод собирает заголовки сообщения для следующей попытки.
+
+        Args:
+            headers: заголовки сообщения
+            retry_count: сколько попыток уже было
+            retry_tier: ступень повторов
+            error: почему не удалось обработать сообщение
+
+        Returns:
+            Вернёт новые заголовки.
+        """
+        headers = dict(headers)
+        headers.pop('x-death', None)  # Уже учтено в retry-count.
+        headers.update({'retry-count': retry_count + 1, 'retry-tier': str(retry_tier)})
+        if error is not None:
+            headers[LAST_ERROR_HEADER] = error[:LAST_ERROR_MAX_LENGTH]
+        return headers
+
+    def _get_lane_name(self, queue_name: str, message_headers: Optional[dict]) -> str:
+        """
+        Внутренний метод выбирает полосу очереди по заголовкам priority и x-source.
+
+        У каждой «живой» очереди есть полоса {queue_name}_high для срочных сообщений
+        (например, сброс пароля), чтобы они не стояли за многотысячной групповой рассылкой.
+        Обычные сообщения источников из fair_sources идут в свои полосы {queue_name}_source_{source}
+        (см. fair_scheduler.py), остальные — в саму очередь.
+
+        Args:
+            queue_name: название очереди
+            message_headers: заголовки сообщения
+
+        Returns:
+            Вернёт название полосы.
+        """
+        message_headers = message_headers or {}
+        if message_headers.get('priority') == HIGH_PRIORITY:
+            return self._get_high_lane_name(queue_name)
+
+        source = message_headers.get(SOURCE_HEADER)
+        if source in parse_fair_sources(config.rabbit_mq.fair_sources):
+            return f'{queue_name}_source_{source}'
+        return queue_name
+
+    def _get_lane_names(self, queue_name: str) -> List[str]:
+        """
+        Внутренний метод возвращает все полосы очереди.
+
+        Args:
+            queue_name: название очереди
+
+        Returns:
+            Вернёт названия полос (срочная — первая).
+        """
+        return [self._get_high_lane_name(queue_name), *self._get_fair_lane_names(queue_name)]
+
+    def _get_high_lane_name(self, queue_name: str) -> str:
+        """
+        Внутренний метод возвращает срочную полосу очереди.
+
+        Args:
+            queue_name: название очереди
+
+        Returns:
+            Вернёт название полосы.
+        """
+        return f'{queue_name}_{HIGH_PRIORITY}'
+
+    def _get_fair_lane_names(self, queue_name: str) -> Dict[str, str]:
+        """
+        Внутренний метод возвращает обычные полосы очереди, которые делят место через FairScheduler.
+
+        Полосы источников, убранных из fair_sources, но перечисленных в fair_sources_draining, тоже слушаем:
+        новые сообщения этих источников идут уже в саму очередь, а оставшиеся в их полосах надо дочитать.
+        Место они делят вместе с самой очередью (источник DEFAULT_SOURCE).
+
+        Args:
+            queue_name: название очереди
+
+        Returns:
+            Вернёт словарь название полосы — источник (у самой очереди источник DEFAULT_SOURCE).
+        """
+        fair_sources = parse_fair_sources(config.rabbit_mq.fair_sources)
+        lanes = {f'{queue_name}_source_{source}': source for source in fair_sources}
+        for draining_source in config.rabbit_mq.fair_sources_draining.split(','):
+            source = draining_source.strip().split(':')[0]
+            if source and source not in fair_sources:
+                lanes[f'{queue_name}_source_{source}'] = DEFAULT_SOURCE
+        lanes[queue_name] = DEFAULT_SOURCE
+        return lanes
+
+    def _get_retry_tier_ttl_ms(self, tier: int) -> int:
+        """
+        Внутренний метод возвращает ttl ступени повторов.
+
+        Args:
+            tier: номер ступени
+
+        Returns:
+            Вернёт ttl в миллисекундах.
+        """
+        return int(config.rabbit_mq.default_message_ttl_ms * config.rabbit_mq.retry_factor ** tier)
+
+    def _get_retry_delay(self, tier: int) -> float:
+        """
+        Внутренний метод выбирает случайную задержку в пределах ступени.
+
+        Разброс ограничен долей retry_jitter от ttl ступени: expiration срабатывает только в голове очереди,
+        так что соседи по ступени задерживают друг друга не больше чем на эту долю.
+
+        Args:
+            tier: номер ступени
+
+        Returns:
+            Вернёт задержку в секундах.
+        """
+        jitter = random.uniform(1 - config.rabbit_mq.retry_jitter, 1)  # noqa: S311
+        return self._get_retry_tier_ttl_ms(tier) * jitter / 1000
+
     @abstractmethod
     async def idempotency_startup(self) -> None:
         """
@@ -0,0 +1,24 @@
+"""
+Модуль выбирает реализацию брокера сообщений по настройке message_broker.
+
+rabbit — RabbitMQ (по умолчанию), memory — брокер в памяти процесса (см. memory_message_broker.py).
+"""
+from config.settings import config
+from db.message_brokers.abstract_classes import AbstractMessageBroker
+from db.message_brokers.memory_message_broker import InMemoryMessageBroker
+from db.message_brokers.rabbit_message_broker import RabbitMessageBroker
+
+
+def get_message_broker() -> AbstractMessageBroker:
+    """
+    Функция создаёт брокер сообщений.
+
+    Returns:
+        Вернёт брокер, выбранный в настройках.
+    """
+    if config.rabbit_mq.message_broker == 'memory':
+        return InMemoryMessageBroker()
+    return RabbitMessageBroker()
+
+
+message_broker_factory = get_message_broker()
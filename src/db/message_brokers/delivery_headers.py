@@ -0,0 +1,45 @@
+"""
+Модуль содержит общую для всех сервисов часть модели данных из очереди.
+
+Приоритет и крайний срок доставки уведомление несёт в заголовках через весь конвейер
+(group_handler, email_formatter, email_sender), поэтому и достаются они из заголовков одинаково.
+"""
+from typing import Optional, Union
+
+from pydantic import BaseModel, validator
+
+from db.message_brokers.broker_factory import message_broker_factory
+
+
+class DeliveryHeaders(BaseModel):
+
+    """Заголовки доставки: модели MessageData сервисов наследуются от неё (вместе со своим BaseConfigModel)."""
+
+    priority: Union[str, dict]
+    deadline: Union[float, dict, None]
+
+    @validator('priority')
+    def get_priority(cls, message: dict) -> str:  # noqa: WPS615
+        """
+        Метод выкусывает из словаря с заголовками приоритет (его передаём дальше по конвейеру).
+
+        Args:
+            message: сообщение
+
+        Returns:
+            Вернёт приоритет (high или normal).
+        """
+        return message['headers'].get('priority', 'normal')
+
+    @validator('deadline')
+    def get_deadline(cls, message: dict) -> Optional[float]:  # noqa: WPS615
+        """
+        Метод выкусывает из словаря с заголовками крайний срок доставки (его передаём дальше по конвейеру).
+
+        Args:
+            message: сообщение
+
+        Returns:
+            Вернёт unix timestamp или None, если срок не задан.
+        """
+        return message_broker_factory.get_deadline(message['headers'])
@@ -0,0 +1,255 @@
+"""
+Модуль содержит справедливый (weighted fair) планировщик обработки сообщений по источникам.
+
+Все продюсеры (source в SingleEmails/GroupEmails) пишут в одни и те же очереди,
+поэтому рассылка одной команды на миллион пользователей часами держит письма всех остальных.
+
+Сообщения источников из настройки fair_sources публикуются в отдельные очереди {queue_name}_source_{source}
+(source едет в заголовке x-source), остальные — в общую очередь queue_name.
+Consumer слушает их все, но callback запускает не сразу: сообщение встаёт в виртуальную очередь своего источника,
+а свободное место (одно из max_in_flight) получает источник с наименьшим виртуальным временем.
+Каждый запуск сдвигает виртуальное время источника на 1 / weight,
+так что при конкуренции источники получают место пропорционально весам (stride scheduling).
+Если кроме одного источника никого нет — он занимает всё место, простаивать ничего не будет.
+Дополнительно у источника может быть свой потолок одновременных callback-ов (доля concurrency).
+
+Формат fair_sources: «source:weight[:max_in_flight],...», например «auth:8,billing:4,marketing:1:5».
+Пустая строка — справедливое планирование выключено.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, NamedTuple, Optional
+
+DEFAULT_SOURCE = ''  # Источники, которых нет в fair_sources (общая очередь).
+DEFAULT_WEIGHT = 1
+
+
+class SourceShare(NamedTuple):
+
+    """Доля источника."""
+
+    weight: int
+    max_in_flight: Optional[int]
+
+
+@lru_cache(maxsize=None)
+def parse_fair_sources(fair_sources: str) -> Dict[str, SourceShare]:
+    """
+    Функция разбирает настройку fair_sources.
+
+    Args:
+        fair_sources: строка вида «auth:8,billing:4,marketing:1:5»
+
+    Returns:
+        Вернёт словарь source — доля источника.
+    """
+    shares = {}
+    for source_config in filter(None, fair_sources.split(',')):
+        source, weight, *max_in_flight = source_config.strip().split(':')
+        shares[source] = SourceShare(
+            weight=int(weight),
+            max_in_flight=int(max_in_flight[0]) if max_in_flight else None
+        )
+    return shares
+
+
+class SourceQueue:
+
+    """Виртуальная очередь источника со статистикой."""
+
+    def __init__(self, share: SourceShare) -> None:
+        """
+        Конструктор.
+
+        Args:
+            share: доля источника
+        """
+        self.share = share
+        self.waiting: Deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        self.virtual_time = 0.0  # noqa: WPS358
+        self.started = 0
+        self.total_wait = 0.0  # noqa: WPS358
+        self.max_wait = 0.0  # noqa: WPS358
+
+    def is_eligible(self) -> bool:
+        """
+        Метод отвечает на вопрос, можно ли сейчас запустить сообщение этого источника.
+
+        Returns:
+            Вернёт True, если есть ожидающие сообщения и источник не упёрся в свой потолок.
+        """
+        max_in_flight = self.share.max_in_flight
+        return bool(self.waiting) and (max_in_flight is None or self.in_flight < max_in_flight)
+
+
+class FairGate:
+
+    """Асинхронный контекстный менеджер: занимает место в планировщике от имени источника."""
+
+    def __init__(self, scheduler: 'FairScheduler', source: str) -> None:
+        """
+        Конструктор.
+
+        Args:
+            scheduler: планировщик
+            source: источник
+        """
+        self.scheduler = scheduler
+        self.source = source
+
+    async def __aenter__(self) -> None:
+        """Метод ждёт, пока планировщик не выделит источнику место."""
+        await self.scheduler.acquire(self.source)
+
+    async def __aexit__(self, *args: Any) -> None:
+        """
+        Метод освобождает место.
+
+        Args:
+            args: исключение, если оно было (не подавляем)
+        """
+        self.scheduler.release(self.source)
+
+
+class FairScheduler:  # noqa: WPS214
+
+    """Класс с интерфейсом справедливого планировщика."""
+
+    def __init__(self, shares: Dict[str, SourceShare], max_in_flight: int) -> None:
+        """
+        Конструктор.
+
+        Args:
+            shares: доли источников (источник DEFAULT_SOURCE добавится сам)
+            max_in_flight: сколько callback-ов всех источников может выполняться одновременно
+        """
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.sources = {source: SourceQueue(share) for source, share in shares.items()}
+        self.sources.setdefault(DEFAULT_SOURCE, SourceQueue(SourceShare(weight=DEFAULT_WEIGHT, max_in_flight=None)))
+
+    def gate(self, source: str) -> FairGate:
+        """
+        Метод возвращает «семафор» источника для async with.
+
+        Args:
+            source: источник
+
+        Returns:
+            Вернёт FairGate.
+        """
+        return FairGate(self, source)
+
+    async def report(self, name: str, interval: float) -> None:
+        """
+        Метод (фоновая задача) раз в interval секунд пишет метрики источников в лог.
+
+        Args:
+            name: что планируем (название очереди)
+            interval: период в секундах
+        """
+        while True:  # noqa: WPS457
+            await asyncio.sleep(interval)
+            logger.info('Fair scheduler %s: %s', name, self.get_stats())
+
+    async def acquire(self, source: str) -> None:
+        """
+        Метод ставит сообщение в виртуальную очередь источника и ждёт своей очереди.
+
+        Args:
+            source: источник
+
+        Raises:
+            asyncio.CancelledError: если задачу отменили, пока она ждала места
+        """
+        source_queue = self.sources[source]
+        if not source_queue.waiting and not source_queue.in_flight:
+            # Источник только что проснулся: накопленный за время простоя «кредит» не даём.
+            source_queue.virtual_time = max(source_queue.virtual_time, self._get_virtual_clock())
+
+        turn = asyncio.get_running_loop().create_future()
+        source_queue.waiting.append(turn)
+        enqueued_at = time.monotonic()
+        self._dispatch()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():  # Место уже выдали — вернём его.
+                self.release(source)
+            elif turn in source_queue.waiting:
+                source_queue.waiting.remove(turn)
+            raise
+
+        waited = time.monotonic() - enqueued_at
+        source_queue.total_wait += waited
+        source_queue.max_wait = max(source_queue.max_wait, waited)
+
+    def release(self, source: str) -> None:
+        """
+        Метод освобождает место источника и отдаёт его следующему по очереди.
+
+        Args:
+            source: источник
+        """
+        self.in_flight -= 1
+        self.sources[source].in_flight -= 1
+        self._dispatch()
+
+    def get_stats(self) -> Dict[str, dict]:
+        """
+        Метод собирает метрики по источникам и обнуляет максимальное ожидание.
+
+        Returns:
+            Вернёт для каждого источника глубину виртуальной очереди, кол-во выполняемых,
+            запущенных сообщений, среднее и максимальное ожидание места (секунды).
+        """
+        stats = {}
+        for source, source_queue in self.sources.items():
+            stats[source or 'default'] = {
+                'depth': len(source_queue.waiting),
+                'in_flight': source_queue.in_flight,
+                'started': source_queue.started,
+                'avg_wait': source_queue.total_wait / source_queue.started if source_queue.started else 0,
+                'max_wait': source_queue.max_wait
+            }
+            source_queue.max_wait = 0
+        return stats
+
+    def _dispatch(self) -> None:
+        """Внутренний метод раздаёт свободные места источникам с наименьшим виртуальным временем."""
+        while self.in_flight < self.max_in_flight:
+            eligible = [source_queue for source_queue in self.sources.values() if source_queue.is_eligible()]
+            if not eligible:
+                return
+
+            source_queue = min(eligible, key=lambda candidate: candidate.virtual_time)
+            turn = source_queue.waiting.popleft()
+            if turn.cancelled():
+                continue
+
+            turn.set_result(None)
+            self.in_flight += 1
+            source_queue.in_flight += 1
+            source_queue.started += 1
+            source_queue.virtual_time += 1 / source_queue.share.weight
+
+    def _get_virtual_clock(self) -> float:
+        """
+        Внутренний метод возвращает текущее виртуальное время планировщика.
+
+        Returns:
+            Вернёт минимальное виртуальное время среди активных источников (0, если активных нет).
+        """
+        active = [
+            source_queue.virtual_time
+            for source_queue in self.sources.values()
+            if source_queue.waiting or source_queue.in_flight
+        ]
+        return min(active, default=0)
+
+
+logger = logging.getLogger('db.message_brokers.fair_scheduler')
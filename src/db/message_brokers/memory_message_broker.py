@@ -0,0 +1,432 @@
+"""
+Модуль содержит брокер сообщений, живущий в памяти процесса.
+
+Он повторяет то поведение Rabbit (см. rabbit_message_broker.py), на которое опираются callback-и:
+
+Сообщение с задержкой появляется в «живой» очереди только по её истечению.
+reject() отправляет сообщение на default_message_ttl_ms в «очередь повторов» (как queue_waiting_retry),
+а в заголовок x-death добавляется запись с reason rejected — точно так же, как это делает Rabbit.
+retry() откладывает сообщение по ступеням повторов с jitter и увеличивает retry-count.
+nack(requeue=True) сразу возвращает сообщение в очередь.
+
+Брокер нужен, чтобы гонять весь конвейер (outbox → group_handler → email_formatter → email_sender)
+в одном процессе без Rabbit — для бенчмарков и небольших установок на одной машине (single_node).
+Очереди не durable: всё, что не успели обработать, пропадёт вместе с процессом.
+Шардов нет — очередь одна, поэтому порядок сообщений одного пользователя и так сохраняется.
+Полосы приоритета (priority=high) и источников (fair_sources) есть, как и в Rabbit.
+"""
+import asyncio
+import logging
+from typing import Any, AsyncContextManager, Callable, Dict, List, Optional, Set, Tuple, Union  # noqa: WPS235
+
+from aio_pika.abc import AbstractIncomingMessage
+
+from config.settings import config
+from db.message_brokers.abstract_classes import AbstractMessageBroker
+from db.message_brokers.fair_scheduler import FairScheduler, parse_fair_sources
+
+
+class InMemoryMessage:
+
+    """Сообщение in-memory брокера (та часть интерфейса AbstractIncomingMessage, которой пользуются callback-и)."""
+
+    def __init__(self, broker: 'InMemoryMessageBroker', body: bytes, headers: dict, routing_key: str) -> None:
+        """
+        Конструктор.
+
+        Args:
+            broker: брокер, которому принадлежит сообщение
+            body: содержимое сообщения
+            headers: заголовки сообщения
+            routing_key: название очереди
+        """
+        self.body = body
+        self.headers = headers
+        self.routing_key = routing_key
+        self.processed = False
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self._broker = broker
+
+    def info(self) -> dict:
+        """
+        Метод возвращает свойства сообщения.
+
+        Returns:
+            Вернёт словарь со свойствами (как aio_pika).
+        """
+        return {'headers': self.headers, 'routing_key': self.routing_key}
+
+    async def ack(self) -> None:
+        """Метод подтверждает сообщение."""
+        self._settle()
+
+    async def reject(self, requeue: bool = False) -> None:
+        """
+        Метод отклоняет сообщение.
+
+        Args:
+            requeue: вернуть в очередь сразу (иначе — через очередь повторов, как dead letter)
+        """
+        self._settle()
+        if requeue:
+            self._broker.put(self)
+        else:
+            self._broker.dead_letter(self)
+
+    async def nack(self, requeue: bool = True) -> None:
+        """
+        Метод отклоняет сообщение (для одного сообщения то же самое, что reject).
+
+        Args:
+            requeue: вернуть в очередь сразу (иначе — через очередь повторов, как dead letter)
+        """
+        await self.reject(requeue=requeue)
+
+    def _settle(self) -> None:
+        """
+        Внутренний метод помечает сообщение обработанным.
+
+        Raises:
+            RuntimeError: если сообщение уже подтверждено или отклонено
+        """
+        if self.processed:
+            raise RuntimeError('Message already processed')
+        self.processed = True
+
+
+class InMemoryMessageBroker(AbstractMessageBroker):  # noqa: WPS214
+
+    """Класс с интерфейсом брокера сообщений в памяти процесса."""
+
+    def __init__(self) -> None:
+        """Конструктор."""
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._timers: Set[asyncio.TimerHandle] = set()
+        self._stop_consuming: Optional[asyncio.Event] = None
+        self._in_flight_tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Метод готовит брокер к работе."""
+        self._stop_consuming = asyncio.Event()
+
+    async def stop(self) -> None:
+        """Метод отменяет отложенные сообщения (они не durable и пропадут)."""
+        for timer in self._timers:
+            timer.cancel()
+        self._timers.clear()
+
+    def stop_consuming(self) -> None:
+        """Метод просит consume перестать брать новые сообщения и дождаться начатых (drain)."""
+        self._stop_consuming.set()  # type: ignore
+
+    async def consume(
+        self,
+        queue_name: str,
+        callback: Callable,
+        prefetch_count: int = 10,
+        max_in_flight: int = 10,
+        shards: Optional[List[int]] = None
+    ) -> None:
+        """
+        Метод обрабатывает сообщения функцией callback из очереди с названием queue_name.
+
+        Шардов в памяти нет, поэтому shards ни на что не влияет.
+        Полосы те же, что в Rabbit: у срочной свой max_in_flight, обычные (по источникам) делят его через FairScheduler.
+        Метод работает, пока не вызовут stop_consuming().
+
+        Args:
+            queue_name: название очереди, из которой хотим получить данные
+            callback: функция, которая будет обрабатывать сообщения
+            prefetch_count: сколько сообщений полосы может ждать места или выполняться одновременно
+            max_in_flight: сколько callback-ов может выполняться одновременно
+            shards: не используется (нужен для совместимости интерфейса)
+        """
+        scheduler = FairScheduler(parse_fair_sources(config.rabbit_mq.fair_sources), max_in_flight)
+        lanes: List[Tuple[str, AsyncContextManager[Any]]] = [
+            (self._get_high_lane_name(queue_name), asyncio.Semaphore(max_in_flight))
+        ]
+        lanes.extend(
+            (lane_name, scheduler.gate(source))
+            for lane_name, source in self._get_fair_lane_names(queue_name).items()
+        )
+
+        report = asyncio.create_task(scheduler.report(queue_name, config.rabbit_mq.fair_stats_interval))
+        await asyncio.gather(*(
+            self._consume_lane(self._get_queue(lane_name), callback, in_flight, max(prefetch_count, 1))
+            for lane_name, in_flight in lanes
+        ))
+        report.cancel()
+        await self._drain()
+
+    async def publish(
+        self,
+        message_body: bytes,
+        queue_name: str,
+        message_headers: Optional[dict] = None,
+        delay: Union[int, float] = 0,
+        shard_key: Optional[str] = None
+    ) -> bool:
+        """
+        Метод складывает сообщение в очередь.
+
+        Args:
+            message_body: содержимое сообщения
+            delay: ttl сообщения, указывается в секундах (сколько секунд подождать прежде, чем отправить)
+            queue_name: название очереди, в которую нужно отправить сообщение
+            message_headers: заголовок сообщения (сюда нужно вставить x-request-id)
+            shard_key: не используется (очередь одна)
+
+        Returns:
+            Вернёт True — в памяти сообщение не теряется.
+        """
+        message = InMemoryMessage(
+            broker=self,
+            body=message_body,
+            headers=dict(message_headers or {}),
+            routing_key=self._get_lane_name(queue_name, message_headers)
+        )
+        if delay:
+            self._add_x_death(message, queue=config.rabbit_mq.queue_waiting_depart, reason='expired')
+            self._put_later(message, delay)
+        else:
+            self.put(message)
+        return True
+
+    async def publish_many(
+        self,
+        messages_body: List[bytes],
+        queue_name: str,
+        messages_headers: Optional[List[Optional[dict]]] = None,
+        delays: Optional[List[Union[int, float]]] = None,
+        shard_keys: Optional[List[Optional[str]]] = None,
+        spill: bool = True
+    ) -> List[bool]:
+        """
+        Метод складывает пачку сообщений в очередь.
+
+        Args:
+            messages_body: содержимое сообщений
+            queue_name: название очереди, в которую нужно отправить сообщения
+            messages_headers: заголовки сообщений (по одному на каждое сообщение)
+            delays: ttl сообщений в секундах (по одному на каждое сообщение)
+            shard_keys: не используется (очередь одна)
+            spill: не используется (журнала нет)
+
+        Returns:
+            Вернёт для каждого сообщения True.
+        """
+        messages_headers = messages_headers or [None for _ in messages_body]
+        delays = delays or [0 for _ in messages_body]
+        return [
+            await self.publish(message_body=body, queue_name=queue_name, message_headers=headers, delay=delay)
+            for body, headers, delay in zip(messages_body, messages_headers, delays)
+        ]
+
+    async def retry(self, message: AbstractIncomingMessage, error: Optional[str] = None) -> None:
+        """
+        Метод откладывает сообщение по ступеням повторов (как RabbitMessageBroker.retry).
+
+        Args:
+            message: сообщение, которое не удалось обработать
+            error: почему не удалось (попадёт в заголовок x-last-error)
+        """
+        retry_count = self.get_retry_count(message.headers or {})
+        retry_tier = min(retry_count, config.rabbit_mq.retry_tiers - 1)
+        headers = self._get_retry_headers(message.headers or {}, retry_count, retry_tier, error)
+        retry_message = InMemoryMessage(
+            broker=self,
+            body=message.body,
+            headers=headers,
+            routing_key=message.routing_key  # type: ignore
+        )
+
+        self._put_later(retry_message, self._get_retry_delay(retry_tier))
+        await message.ack()
+
+    async def idempotency_startup(self) -> None:
+        """Метод ничего не делает: очереди создаются при первом обращении."""
+
+    def put(self, message: InMemoryMessage) -> None:
+        """
+        Метод кладёт сообщение в «живую» очередь.
+
+        Args:
+            message: сообщение
+        """
+        message.processed = False
+        self._get_queue(message.routing_key).put_nowait(message)
+
+    def dead_letter(self, message: InMemoryMessage) -> None:
+        """
+        Метод повторяет путь отклонённого сообщения: exchange_retry → queue_waiting_retry → exchange_sorter.
+
+        Args:
+            message: отклонённое сообщение
+        """
+        self._add_x_death(message, queue=message.routing_key, reason='rejected')
+        self._add_x_death(message, queue=config.rabbit_mq.queue_waiting_retry, reason='expired')
+        self._put_later(message, config.rabbit_mq.default_message_ttl_ms / 1000)
+
+    async def _consume_lane(
+        self,
+        queue: asyncio.Queue,
+        callback: Callable,
+        in_flight: AsyncContextManager,
+        prefetch_count: int
+    ) -> None:
+        """
+        Внутренний метод обрабатывает сообщения одной полосы, пока не вызовут stop_consuming().
+
+        Args:
+            queue: очередь полосы
+            callback: функция, которая будет обрабатывать сообщения
+            in_flight: семафор (или FairGate), ограничивающий кол-во одновременно выполняемых callback-ов
+            prefetch_count: сколько сообщений полосы может быть взято из очереди одновременно
+        """
+        prefetched = asyncio.Semaphore(prefetch_count)
+
+        while not self._stop_consuming.is_set():  # type: ignore
+            await prefetched.acquire()
+            message = await self._get_message(queue)
+            if message is None:
+                prefetched.release()
+                break
+
+            task = asyncio.create_task(self._process_message(callback, in_flight, prefetched, message))
+            self._in_flight_tasks.add(task)
+            task.add_done_callback(self._in_flight_tasks.discard)
+
+    def _put_later(self, message: InMemoryMessage, delay: Union[int, float]) -> None:
+        """
+        Внутренний метод кладёт сообщение в очередь через delay секунд.
+
+        Args:
+            message: сообщение
+            delay: задержка в секундах
+        """
+        message.timer = asyncio.get_running_loop().call_later(delay, self._fire_timer, message)
+        self._timers.add(message.timer)
+
+    def _fire_timer(self, message: InMemoryMessage) -> None:
+        """
+        Внутренний метод срабатывает по истечению задержки.
+
+        Args:
+            message: сообщение
+        """
+        self._timers.discard(message.timer)  # type: ignore
+        message.timer = None
+        self.put(message)
+
+    def _add_x_death(self, message: InMemoryMessage, queue: str, reason: str) -> None:
+        """
+        Внутренний метод ведёт заголовок x-death так же, как Rabbit.
+
+        Для каждой пары (очередь, причина) одна запись со счётчиком, последняя — в начале списка.
+
+        Args:
+            message: сообщение
+            queue: очередь, из которой сообщение «умерло»
+            reason: причина (rejected, expired)
+        """
+        x_death = message.headers.setdefault('x-death', [])
+        same_deaths = [row for row in x_death if (row['queue'], row['reason']) == (queue, reason)]
+        death = same_deaths[0] if same_deaths else None
+
+        if death is None:
+            death = {'count': 0, 'reason': reason, 'queue': queue, 'routing-keys': [message.routing_key]}
+        else:
+            x_death.remove(death)
+        death['count'] += 1
+        x_death.insert(0, death)
+
+    def _get_queue(self, queue_name: str) -> asyncio.Queue:
+        """
+        Внутренний метод возвращает очередь, создавая её при первом обращении.
+
+        Args:
+            queue_name: название очереди
+
+        Returns:
+            Вернёт очередь.
+        """
+        if queue_name not in self._queues:
+            self._queues[queue_name] = asyncio.Queue()
+        return self._queues[queue_name]
+
+    async def _get_message(self, queue: asyncio.Queue) -> Optional[InMemoryMessage]:
+        """
+        Внутренний метод ждёт следующее сообщение или остановку consume.
+
+        Args:
+            queue: очередь
+
+        Returns:
+            Вернёт сообщение или None, если consume пора остановиться.
+        """
+        if not queue.empty():  # Быстрый путь: ждать нечего, обходимся без лишних future.
+            return queue.get_nowait()
+
+        getter = asyncio.ensure_future(queue.get())
+        stopper = asyncio.ensure_future(self._stop_consuming.wait())  # type: ignore
+        done, _ = await asyncio.wait({getter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        stopper.cancel()
+
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        return None
+
+    async def _process_message(
+        self,
+        callback: Callable,
+        in_flight: AsyncContextManager,
+        prefetched: asyncio.Semaphore,
+        message: InMemoryMessage
+    ) -> None:
+        """
+        Внутренний метод дожидается свободного места, выполняет callback и освобождает место.
+
+        Если callback упал, не ответив на сообщение — возвращаем его в очередь
+        (Rabbit сделал бы то же при закрытии канала).
+        Если пока ждали места, consume начал останавливаться — тоже возвращаем, не трогая.
+
+        Args:
+            callback: функция, которая обрабатывает сообщение
+            in_flight: семафор (или FairGate), ограничивающий кол-во одновременно выполняемых callback-ов
+            prefetched: семафор, ограничивающий кол-во взятых из очереди сообщений полосы
+            message: сообщение из очереди
+        """
+        try:
+            async with in_flight:
+                if self._stop_consuming.is_set():  # type: ignore
+                    return await message.nack(requeue=True)
+                await callback(message)
+        except Exception as error:
+            logger.warning('Callback failed on %s: %s', message.routing_key, error)
+            if not message.processed:
+                await message.nack(requeue=True)
+        finally:
+            prefetched.release()
+
+    async def _drain(self) -> None:
+        """
+        Внутренний метод ждёт завершения начатых callback-ов, но не дольше drain_timeout секунд.
+
+        Не успевшие callback-и отменяются, и метод дожидается их отмены:
+        иначе они продолжили бы работать с уже закрытыми каналом и соединениями.
+        """
+        if not self._in_flight_tasks:
+            return
+
+        logger.info('Draining %s in-flight messages', len(self._in_flight_tasks))
+        _, pending = await asyncio.wait(self._in_flight_tasks, timeout=config.rabbit_mq.drain_timeout)
+
+        if pending:
+            logger.warning('Drain timeout: %s messages are lost', len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+logger = logging.getLogger('db.message_brokers')
@@ -20,22 +20,87 @@
 
 Соответственно на совести разработчика следить за кол-вом таких итераций и,
 если их кол-во превысит max_retry_count — дропить message, уведомляя об этом из логгера.
+
+Про повторы.
+С одним x-message-ttl все упавшие сообщения возвращаются с одной частотой,
+и во время аварии SMTP или Auth повторы приходят синхронными волнами.
+Поэтому consumer вместо reject() вызывает retry(): сообщение перепубликуется в headers-обменник exchange_retry_tiers
+в очередь ступени retry-tier = min(retry-count, retry_tiers - 1), а оригинал подтверждается (basic_ack).
+У ступени n x-message-ttl = default_message_ttl_ms * retry_factor^n,
+а у каждого сообщения ещё и свой expiration — случайная доля (jitter) от ttl ступени.
+По истечению сообщение возвращается в exchange_sorter. Если перепубликовать не вышло — обычный reject(),
+и сообщение идёт старой дорогой через queue_waiting_retry.
+
+Про задержки.
+Rabbit выкидывает в dead letter просроченные сообщения только из головы очереди,
+поэтому в одной queue_waiting_depart сообщение с задержкой 24 часа держит все сообщения за ним.
+Так что очередь queue_waiting_depart осталась только для режима delay_levels=0 (и задержек за пределами уровней).
+
+Сообщения без задержки сразу публикуются в exchange_sorter.
+
+Остальные задержки раскладываются по степеням двойки: есть delay_levels уровней,
+у каждого уровня k свой headers-обменник и своя очередь с x-message-ttl = 2^k секунд.
+Сообщение публикуется в старший уровень с заголовками delay-bit-k (бит k задержки в секундах).
+Если бит уровня выставлен — сообщение ждёт в очереди уровня, иначе сразу идёт в обменник уровня ниже.
+Из нулевого уровня сообщение попадает в exchange_sorter (routing_key по дороге не меняется).
+В каждой очереди уровня у всех сообщений одинаковый ttl, а значит никто никого не блокирует.
+
+Про шардирование.
+Одна очередь Rabbit живёт в одном Erlang процессе и упирается в одно ядро.
+Поэтому при queue_shards > 1 каждая «живая» очередь queue_name делится на queue_shards очередей
+{queue_name}_shard_{k}, а k выбирается jump consistent hash от shard_key (например, destination_id).
+Шард выбирается при публикации и становится routing_key, так что exchange_sorter остаётся direct,
+а задержки и повторы возвращают сообщение в тот же шард.
+Сообщения одного пользователя всегда попадают в один шард, а значит порядок для него сохраняется.
+Consumer может слушать только часть шардов (consume_shards, например «0,1» — удобно задать через env CONSUME_SHARDS).
+
+Про приоритет.
+Сообщения с заголовком priority=high идут в отдельную полосу {queue_name}_high (и её шарды),
+а consume слушает обе полосы, причём у каждой свой лимит max_in_flight.
+Так срочное письмо не ждёт, пока освободится место за сотнями тысяч сообщений рассылки.
+Полоса зашита в routing_key, поэтому задержки и повторы её не теряют.
+
+Про справедливость между источниками.
+Обычные сообщения источников из fair_sources (заголовок x-source) идут в полосы {queue_name}_source_{source},
+и место (max_in_flight) между этими полосами и самой очередью делит FairScheduler — по весам источников
+(см. fair_scheduler.py). Срочная полоса в дележе не участвует.
+
+Про недоступность брокера.
+Если задан spill_journal_path, то пока Rabbit недоступен (или не подтверждает сообщение за spill_after секунд —
+так выглядит flow control, connection.blocked) publish не ждёт, а дописывает сообщение в локальный журнал
+(см. spill_journal.py) и отвечает «принято». Фоновая задача вычитывает журнал по порядку, как только брокер ожил.
+Пока журнал не пуст, новые сообщения тоже идут в него — иначе они обогнали бы старые.
+
+Соединение с Rabbit одно на процесс и живёт всё время работы сервиса (connect_robust само переподключается),
+а каналы для publish берутся из ограниченного пула (channel_pool_size).
+Поэтому перед работой нужно вызвать start(), а при завершении — stop().
 """
 import asyncio
-from typing import Optional, Union, Callable
+import logging
+import math
+import random
+import time
+from functools import partial
+from typing import (  # noqa: WPS235
+    Optional, Union, Callable, Set, List, Dict, Tuple, AsyncContextManager, Iterator, Sequence
+)
 
 import aio_pika
 from aio_pika import Message, DeliveryMode, ExchangeType
 from aio_pika.abc import AbstractRobustConnection, AbstractIncomingMessage, \
-    AbstractChannel, AbstractQueue
+    AbstractChannel, AbstractQueue, AbstractExchange
+from aio_pika.pool import Pool
 from pamqp.commands import Basic
 
 from config.settings import config
-from db.message_brokers.abstract_classes import AbstractMessageBroker
+from db.message_brokers.abstract_classes import SHARD_KEY_HEADER, AbstractMessageBroker
+from db.message_brokers.fair_scheduler import FairScheduler, parse_fair_sources
+from db.message_brokers.spill_journal import SpilledMessage, SpillJournal
 from utils.async_backoff import timeout_limiter
+from utils.consistent_hash import jump_hash
 
 
-class RabbitMessageBroker(AbstractMessageBroker):
+class RabbitMessageBroker(AbstractMessageBroker):  # noqa: WPS214
 
     """Класс с интерфейсом брокера сообщений RabbitMQ."""
 
@@ -45,28 +110,102 @@ class RabbitMessageBroker(AbstractMessageBroker):
         self.port = config.rabbit_mq.port
         self.login = config.rabbit_mq.login
         self.password = config.rabbit_mq.password
-
-    async def consume(self, queue_name: str, callback: Callable) -> None:
+        self.connection: Optional[AbstractRobustConnection] = None
+        self.channel_pool: Optional[Pool] = None
+        self._declared_queues: Set[str] = set()
+        self._stop_consuming: Optional[asyncio.Event] = None
+        self._in_flight_tasks: Set[asyncio.Task] = set()
+        self.spill_journal: Optional[SpillJournal] = None
+        self._replay_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Метод создаёт долгоживущее соединение с Rabbit, пул каналов и (если задан путь) журнал."""
+        self.connection = await self._get_connect()
+        self.channel_pool = Pool(self._get_channel, max_size=config.rabbit_mq.channel_pool_size)
+        self._stop_consuming = asyncio.Event()
+
+        if config.rabbit_mq.spill_journal_path:
+            self.spill_journal = SpillJournal(
+                path=config.rabbit_mq.spill_journal_path,
+                size=config.rabbit_mq.spill_journal_size
+            )
+            self.spill_journal.open()
+            self._replay_task = asyncio.create_task(self._replay_journal())
+
+    async def stop(self) -> None:
+        """Метод закрывает журнал, пул каналов и соединение с Rabbit."""
+        if self.spill_journal is not None:
+            self._replay_task.cancel()  # type: ignore
+            self.spill_journal.close()
+        await self.channel_pool.close()  # type: ignore
+        await self.connection.close()  # type: ignore
+
+    def stop_consuming(self) -> None:
+        """Метод просит consume перестать брать новые сообщения и дождаться начатых (drain)."""
+        self._stop_consuming.set()  # type: ignore
+
+    async def consume(
+        self,
+        queue_name: str,
+        callback: Callable,
+        prefetch_count: int = 10,
+        max_in_flight: int = 10,
+        shards: Optional[List[int]] = None
+    ) -> None:
         """
         Метод обрабатывает сообщения функцией callback из очереди с названием queue_name.
 
+        Слушаем все полосы очереди (см. описание модуля): у срочной свой max_in_flight,
+        а обычные полосы (по источникам) делят общий max_in_flight через FairScheduler.
+        Если очередь шардирована — слушаем шарды shards (по умолчанию из настройки consume_shards)
+        через один канал: prefetch_count действует на каждый шард, а max_in_flight общий на все шарды полосы.
+
+        Rabbit не выдаст больше prefetch_count неподтверждённых сообщений (basic_qos),
+        а одновременно будет выполняться не больше max_in_flight callback-ов:
+        следующее сообщение берём в обработку только когда освободилось место.
+        Имеет смысл держать prefetch_count >= max_in_flight, чтобы следующее сообщение уже лежало в буфере.
+
+        Метод работает, пока не вызовут stop_consuming() (например, по SIGTERM).
+        После этого новые сообщения больше не берутся, а начатые callback-и
+        получают до drain_timeout секунд, чтобы закончить работу. Только потом закрывается канал.
+
         Args:
             queue_name: название очереди, из которой хотим получить данные
             callback: функция, которая будет обрабатывать сообщения
+            prefetch_count: сколько неподтверждённых сообщений брокер может выдать consumer-у заранее
+            max_in_flight: сколько callback-ов может выполняться одновременно
+            shards: номера шардов, которые нужно слушать
         """
-        connection = await self._get_connect()
+        channel = await self.connection.channel()  # type: ignore
+        scheduler = FairScheduler(parse_fair_sources(config.rabbit_mq.fair_sources), max_in_flight)
+        report = asyncio.create_task(scheduler.report(queue_name, config.rabbit_mq.fair_stats_interval))
         try:
-            running_loop = asyncio.get_running_loop()
-            channel = await connection.channel()
-            queue = await self._create_alive_queue(queue_name=queue_name, channel=channel)
-            iterator = queue.iterator()
-            await iterator.consume()
+            await channel.set_qos(prefetch_count=prefetch_count)
+            consumers = await self._consume_lane(
+                channel=channel,
+                lane_name=self._get_high_lane_name(queue_name),
+                callback=callback,
+                in_flight=asyncio.Semaphore(max_in_flight),
+                shards=shards
+            )
+            for lane_name, source in self._get_fair_lane_names(queue_name).items():
+                consumers.extend(await self._consume_lane(
+                    channel=channel,
+                    lane_name=lane_name,
+                    callback=callback,
+                    in_flight=scheduler.gate(source),
+                    shards=shards
+                ))
 
-            async for message in iterator:
-                running_loop.create_task(callback(message))
+            await self._stop_consuming.wait()  # type: ignore
 
-        finally:  # Даже если украинские националисты будут под москвой мы всё равно закроем соединение. :)
-            await connection.close()
+            for queue, consumer_tag in consumers:  # noqa: WPS440
+                await queue.cancel(consumer_tag)
+            await self._drain()
+
+        finally:  # Даже если украинские националисты будут под москвой мы всё равно закроем канал. :)
+            report.cancel()
+            await channel.close()
 
     @timeout_limiter(max_timeout=10, logger_name='db.message_brokers.publish')
     async def publish(
@@ -74,7 +213,8 @@ class RabbitMessageBroker(AbstractMessageBroker):
         message_body: bytes,
         queue_name: str,
         message_headers: Optional[dict] = None,
-        delay: Union[int, float] = 0
+        delay: Union[int, float] = 0,
+        shard_key: Optional[str] = None
     ) -> bool:
         """
         Метод складывает сообщение в очередь.
@@ -84,33 +224,119 @@ class RabbitMessageBroker(AbstractMessageBroker):
             delay: ttl сообщения, указывается в секундах (сколько секунд подождать прежде, чем отправить)
             queue_name: название очереди, в которую нужно отправить сообщение
             message_headers: заголовок сообщения (сюда нужно вставить x-request-id)
+            shard_key: ключ шардирования (сообщения с одним ключом попадут в один шард)
 
         Returns:
-            Вернёт ответ на вопрос была ли запись успешно добавлена
+            Вернёт ответ на вопрос была ли запись успешно добавлена (в Rabbit или в журнал)
         """
-        connection = await self._get_connect()
-        try:
-            channel = await connection.channel()
+        if self.spill_journal is None:
+            return await self._publish_now(message_body, queue_name, message_headers, delay, shard_key)
 
-            exchange_incoming = await channel.declare_exchange(
-                name=config.rabbit_mq.exchange_incoming,
-                type=ExchangeType.FANOUT,
-                durable=True
-            )
+        if self._must_spill():
+            return self.spill_journal.append(message_body, queue_name, message_headers, delay, shard_key)
 
-            message = Message(
-                headers=message_headers or {},
-                body=message_body,
-                delivery_mode=DeliveryMode.PERSISTENT,
-                expiration=delay
+        try:
+            return await asyncio.wait_for(
+                self._publish_now(message_body, queue_name, message_headers, delay, shard_key),
+                timeout=config.rabbit_mq.spill_after
             )
+        except Exception as error:
+            logger.warning('Rabbit is unavailable (%s), message to %s goes to spill journal', error, queue_name)
+            return self.spill_journal.append(message_body, queue_name, message_headers, delay, shard_key)
 
-            await self._create_alive_queue(queue_name=queue_name, channel=channel)
-            result = await exchange_incoming.publish(message=message, routing_key=queue_name)
-            return isinstance(result, Basic.Ack)
+    async def publish_many(
+        self,
+        messages_body: List[bytes],
+        queue_name: str,
+        messages_headers: Optional[List[Optional[dict]]] = None,
+        delays: Optional[List[Union[int, float]]] = None,
+        shard_keys: Optional[List[Optional[str]]] = None,
+        spill: bool = True
+    ) -> List[bool]:
+        """
+        Метод складывает пачку сообщений в очередь через один канал.
+
+        Сообщения отправляются не дожидаясь подтверждения предыдущих:
+        одновременно «в пути» может быть до publish_confirm_window неподтверждённых сообщений.
+        Так скорость упирается в сеть, а не в round trip на каждое сообщение.
+
+        Если Rabbit подтвердил не всё, то в журнал уходит всё, начиная с первого неподтверждённого сообщения
+        (даже уже подтверждённые после него — они придут ещё раз): иначе при вычитке журнала
+        неподтверждённые сообщения оказались бы позади следующих за ними.
+
+        Журнал не сбрасывается на диск (fsync), так что «записано в журнал» — не то же, что «подтверждено Rabbit».
+        Тем, у кого сообщения уже лежат в надёжном хранилище (outbox), нужно spill=False.
+
+        Args:
+            messages_body: содержимое сообщений
+            queue_name: название очереди, в которую нужно отправить сообщения
+            messages_headers: заголовки сообщений (по одному на каждое сообщение)
+            delays: ttl сообщений в секундах (по одному на каждое сообщение)
+            shard_keys: ключи шардирования (по одному на каждое сообщение)
+            spill: можно ли дописывать неподтверждённые сообщения в журнал (False — только Basic.Ack)
+
+        Returns:
+            Вернёт для каждого сообщения ответ на вопрос было ли оно успешно добавлено (Basic.Ack или журнал).
+        """
+        messages_headers = messages_headers or [None for _ in messages_body]
+        delays = delays or [0 for _ in messages_body]
+        shard_keys = shard_keys or [None for _ in messages_body]
+        messages = list(zip(messages_body, messages_headers, delays, shard_keys))
+
+        if self.spill_journal is None or not spill:
+            # Журнала нет — ждать подтверждения дольше spill_after незачем (и некуда), ждём publish_confirm_timeout.
+            return await self._publish_many_now(messages, queue_name, config.rabbit_mq.publish_confirm_timeout)
+
+        if self._must_spill():
+            published = [False for _ in messages]
+        else:
+            try:
+                published = await self._publish_many_now(messages, queue_name, config.rabbit_mq.spill_after)
+            except Exception as error:
+                logger.warning('Rabbit is unavailable (%s), messages to %s go to spill journal', error, queue_name)
+                published = [False for _ in messages]
+
+        # Всё, начиная с первого неподтверждённого, дописываем в журнал (в исходном порядке).
+        first_failed = published.index(False) if False in published else len(messages)
+        return published[:first_failed] + [
+            self.spill_journal.append(body, queue_name, headers, delay, shard_key)
+            for body, headers, delay, shard_key in messages[first_failed:]
+        ]
+
+    async def retry(self, message: AbstractIncomingMessage, error: Optional[str] = None) -> None:
+        """
+        Метод отправляет сообщение на повторную обработку через ступени повторов (см. описание модуля).
+
+        Чем больше попыток уже было — тем дольше сообщение подождёт,
+        а jitter разносит повторы во времени, чтобы они не приходили волной.
+
+        Args:
+            message: сообщение, которое не удалось обработать
+            error: почему не удалось (попадёт в заголовок x-last-error)
+        """
+        retry_count = self.get_retry_count(message.headers or {})
+        retry_tier = min(retry_count, config.rabbit_mq.retry_tiers - 1)
+        headers = self._get_retry_headers(message.headers or {}, retry_count, retry_tier, error)
+        retry_message = Message(
+            headers=headers,
+            body=message.body,
+            delivery_mode=DeliveryMode.PERSISTENT,
+            expiration=self._get_retry_delay(retry_tier)
+        )
 
-        finally:  # Даже если метеорит упадёт на землю мы всё равно закроем соединение. :)
-            await connection.close()
+        try:
+            async with self.channel_pool.acquire() as channel:  # type: ignore
+                if channel.is_closed:
+                    await channel.reopen()
+                exchange = await channel.get_exchange(name=config.rabbit_mq.exchange_retry_tiers, ensure=False)
+                result = await exchange.publish(message=retry_message, routing_key=message.routing_key or '')
+        except Exception as publish_error:
+            logger.warning('Failed publish to retry tier %s: %s', retry_tier, publish_error)
+            result = None
+
+        if isinstance(result, Basic.Ack):
+            return await message.ack()
+        return await message.reject()  # Запасной путь — через queue_waiting_retry.
 
     async def idempotency_startup(self) -> None:
         """
@@ -121,10 +347,8 @@ class RabbitMessageBroker(AbstractMessageBroker):
         но этот метод все действие выполнит только один раз,
         следовательно, никакого резона вызывать его более одного раза нет.
         """
-        connection = await self._get_connect()
+        channel = await self.connection.channel()  # type: ignore
         try:
-            channel = await connection.channel()
-
             # Обменник, принимающий все входящие в rabbit сообщения.
             exchange_incoming = await channel.declare_exchange(
                 name=config.rabbit_mq.exchange_incoming,
@@ -172,8 +396,466 @@ class RabbitMessageBroker(AbstractMessageBroker):
             )
             await queue_waiting_depart.bind(exchange_incoming)
             await queue_waiting_retry.bind(exchange_retry)
+            await self._create_delay_levels(channel=channel, exchange_sorter=exchange_sorter)
+            await self._create_retry_tiers(channel=channel)
         finally:
-            await connection.close()
+            await channel.close()
+
+    async def _create_delay_levels(self, channel: AbstractChannel, exchange_sorter: AbstractExchange) -> None:
+        """
+        Внутренний метод создаёт уровни задержки (см. описание модуля).
+
+        Уровни создаются снизу вверх: каждому уровню нужен уже существующий обменник уровня ниже.
+
+        Args:
+            channel: канал
+            exchange_sorter: сортирующий обменник, в который попадают сообщения из нулевого уровня
+        """
+        exchange_below = exchange_sorter
+        queue_waiting_depart = config.rabbit_mq.queue_waiting_depart
+
+        for level in range(config.rabbit_mq.delay_levels):
+            level_ttl_ms = 1000 * 2 ** level
+            exchange_level = await channel.declare_exchange(
+                name=self._get_delay_exchange_name(level),
+                type=ExchangeType.HEADERS,
+                durable=True
+            )
+            queue_level = await channel.declare_queue(
+                name=f'{queue_waiting_depart}_delay_{level}',
+                durable=True,
+                arguments={
+                    'x-dead-letter-exchange': exchange_below.name,
+                    'x-message-ttl': level_ttl_ms
+                }
+            )
+            # Бит выставлен — ждём 2^level секунд в очереди уровня, иначе сразу спускаемся на уровень ниже.
+            await queue_level.bind(exchange_level, arguments={'x-match': 'all', f'delay-bit-{level}': '1'})
+            await exchange_below.bind(exchange_level, arguments={'x-match': 'all', f'delay-bit-{level}': '0'})
+            exchange_below = exchange_level
+
+    def _must_spill(self) -> bool:
+        """
+        Внутренний метод отвечает на вопрос, нужно ли писать сообщение сразу в журнал.
+
+        Returns:
+            Вернёт True, если соединения с Rabbit нет или в журнале ещё есть невычитанные сообщения.
+        """
+        is_connected = self.connection is not None and self.connection.connected.is_set()  # type: ignore
+        return not is_connected or not self.spill_journal.is_empty()  # type: ignore
+
+    async def _replay_journal(self) -> None:
+        """
+        Внутренний метод (фоновая задача) по порядку перекладывает сообщения из журнала в Rabbit.
+
+        Сообщение удаляется из журнала только после подтверждения брокера.
+        Если брокер не подтвердил его за spill_after секунд — ждём spill_replay_interval и пробуем снова.
+        """
+        while True:  # noqa: WPS457
+            spilled = self.spill_journal.peek()  # type: ignore
+            if spilled is None or not self.connection.connected.is_set():  # type: ignore
+                await asyncio.sleep(config.rabbit_mq.spill_replay_interval)
+                continue
+
+            if await self._replay_spilled(spilled):
+                self.spill_journal.pop()  # type: ignore
+            else:
+                await asyncio.sleep(config.rabbit_mq.spill_replay_interval)
+
+    async def _replay_spilled(self, spilled: SpilledMessage) -> bool:
+        """
+        Внутренний метод отдаёт брокеру одно сообщение из журнала.
+
+        Args:
+            spilled: сообщение из журнала
+
+        Returns:
+            Вернёт ответ на вопрос подтвердил ли брокер сообщение за spill_after секунд.
+        """
+        # Часть задержки сообщение уже провело в журнале.
+        delay = max(spilled.delay - (time.time() - spilled.spilled_at), 0) if spilled.delay else 0
+        try:
+            return await asyncio.wait_for(
+                self._publish_now(
+                    spilled.message_body,
+                    spilled.queue_name,
+                    spilled.message_headers,
+                    delay,
+                    spilled.shard_key
+                ),
+                timeout=config.rabbit_mq.spill_after
+            )
+        except Exception as error:
+            logger.warning('Failed replay spill journal: %s', error)
+            return False
+
+    async def _create_retry_tiers(self, channel: AbstractChannel) -> None:
+        """
+        Внутренний метод создаёт ступени повторов (см. описание модуля).
+
+        Args:
+            channel: канал
+        """
+        exchange_retry_tiers = await channel.declare_exchange(
+            name=config.rabbit_mq.exchange_retry_tiers,
+            type=ExchangeType.HEADERS,
+            durable=True
+        )
+        queue_waiting_retry = config.rabbit_mq.queue_waiting_retry
+
+        for tier in range(config.rabbit_mq.retry_tiers):
+            queue_tier = await channel.declare_queue(
+                name=f'{queue_waiting_retry}_tier_{tier}',
+                durable=True,
+                arguments={
+                    'x-dead-letter-exchange': config.rabbit_mq.exchange_sorter,
+                    'x-message-ttl': self._get_retry_tier_ttl_ms(tier)
+                }
+            )
+            await queue_tier.bind(exchange_retry_tiers, arguments={'x-match': 'all', 'retry-tier': str(tier)})
+
+    async def _publish_now(
+        self,
+        message_body: bytes,
+        queue_name: str,
+        message_headers: Optional[dict],
+        delay: Union[int, float],
+        shard_key: Optional[str]
+    ) -> bool:
+        """
+        Внутренний метод публикует сообщение в Rabbit (без журнала).
+
+        Args:
+            message_body: содержимое сообщения
+            queue_name: название очереди
+            message_headers: заголовки сообщения
+            delay: задержка в секундах
+            shard_key: ключ шардирования
+
+        Returns:
+            Вернёт ответ на вопрос подтвердил ли Rabbit сообщение.
+        """
+        async with self.channel_pool.acquire() as channel:  # type: ignore
+            if channel.is_closed:  # Канал мог закрыться из-за ошибки — переоткрываем, а не берём новый.
+                await channel.reopen()
+
+            # Обменник объявлен в idempotency_startup, тут достаточно ссылки на него (без похода в Rabbit).
+            exchange = await channel.get_exchange(name=self._get_exchange_name(delay), ensure=False)
+            message = self._create_message(
+                message_body=message_body,
+                message_headers=message_headers,
+                delay=delay,
+                shard_key=shard_key
+            )
+            routing_key = self._get_routing_key(queue_name, message_headers, shard_key)
+
+            await self._ensure_alive_queue(queue_name=routing_key, channel=channel)
+            result = await exchange.publish(message=message, routing_key=routing_key)
+            return isinstance(result, Basic.Ack)
+
+    async def _publish_many_now(
+        self,
+        messages: Sequence[Tuple[bytes, Optional[Dict], float, Optional[str]]],
+        queue_name: str,
+        confirm_timeout: float
+    ) -> List[bool]:
+        """
+        Внутренний метод публикует пачку сообщений в Rabbit (без журнала) через один канал.
+
+        Публикуют publish_confirm_window исполнителей, которые берут следующее сообщение из общего итератора,
+        а Message собирается только перед своей публикацией. Так в памяти одновременно не больше
+        publish_confirm_window сообщений и корутин, сколько бы получателей ни было в пачке.
+
+        Args:
+            messages: сообщения — кортежи (body, headers, delay, shard_key)
+            queue_name: название очереди
+            confirm_timeout: сколько секунд ждать подтверждения каждого сообщения
+
+        Returns:
+            Вернёт для каждого сообщения ответ на вопрос подтвердил ли его Rabbit.
+        """
+        published = [False for _ in messages]
+        pending = iter(enumerate(messages))
+        publishers_count = min(config.rabbit_mq.publish_confirm_window, len(messages))
+
+        async with self.channel_pool.acquire() as channel:  # type: ignore
+            if channel.is_closed:
+                await channel.reopen()
+
+            await asyncio.gather(*(
+                self._publish_pending(channel, pending, queue_name, published, confirm_timeout)
+                for _ in range(publishers_count)
+            ))
+        return published
+
+    async def _publish_pending(
+        self,
+        channel: AbstractChannel,
+        pending: Iterator[Tuple[int, tuple]],
+        queue_name: str,
+        published: List[bool],
+        confirm_timeout: float
+    ) -> None:
+        """
+        Внутренний метод (исполнитель) публикует сообщения из общего итератора по одному, дожидаясь подтверждения.
+
+        Args:
+            channel: канал, через который публикуем
+            pending: общий для всех исполнителей итератор (номер в пачке, сообщение)
+            queue_name: название очереди
+            published: сюда записывается, подтвердил ли Rabbit сообщение с этим номером
+            confirm_timeout: сколько секунд ждать подтверждения каждого сообщения
+        """
+        for index, (body, headers, delay, shard_key) in pending:
+            routing_key = self._get_routing_key(queue_name, headers, shard_key)
+            try:
+                await self._ensure_alive_queue(queue_name=routing_key, channel=channel)
+                # Обменник объявлен в idempotency_startup, тут достаточно ссылки на него (без похода в Rabbit).
+                exchange = await channel.get_exchange(name=self._get_exchange_name(delay), ensure=False)
+                result = await asyncio.wait_for(
+                    exchange.publish(
+                        message=self._create_message(
+                            message_body=body,
+                            message_headers=headers,
+                            delay=delay,
+                            shard_key=shard_key
+                        ),
+                        routing_key=routing_key
+                    ),
+                    timeout=confirm_timeout
+                )
+            except Exception as error:  # Nack, возврат, потеря канала или flow control — для нас всё одно.
+                logger.warning('Failed publish to %s: %s', routing_key, error)
+                continue
+            published[index] = isinstance(result, Basic.Ack)
+
+    def _create_message(
+        self,
+        message_body: bytes,
+        message_headers: Optional[dict],
+        delay: Union[int, float],
+        shard_key: Optional[str] = None
+    ) -> Message:
+        """
+        Внутренний метод собирает сообщение для Rabbit.
+
+        Ключ шарда кладётся в заголовок x-shard-key: повторы сохраняют заголовки,
+        так что он доедет и до парковки, а parking_replay вернёт сообщение в тот же шард.
+
+        Args:
+            message_body: содержимое сообщения
+            message_headers: заголовок сообщения
+            delay: ttl сообщения в секундах
+            shard_key: ключ шардирования
+
+        Returns:
+            Вернёт сообщение, готовое к публикации.
+        """
+        headers = dict(message_headers or {})
+        expiration = None
+        if shard_key is not None:
+            headers[SHARD_KEY_HEADER] = shard_key
+
+        if self._is_delayed_by_levels(delay):
+            headers.update(self._get_delay_bits(delay))
+        elif delay:
+            expiration = delay
+
+        return Message(
+            headers=headers,
+            body=message_body,
+            delivery_mode=DeliveryMode.PERSISTENT,
+            expiration=expiration
+        )
+
+    def _get_exchange_name(self, delay: Union[int, float]) -> str:
+        """
+        Внутренний метод выбирает обменник, в который нужно публиковать сообщение с задержкой delay.
+
+        Args:
+            delay: задержка в секундах
+
+        Returns:
+            Вернёт название обменника.
+        """
+        if not delay:
+            return config.rabbit_mq.exchange_sorter  # Ждать нечего — сразу в «живую» очередь.
+        if self._is_delayed_by_levels(delay):
+            return self._get_delay_exchange_name(config.rabbit_mq.delay_levels - 1)
+        return config.rabbit_mq.exchange_incoming
+
+    def _is_delayed_by_levels(self, delay: Union[int, float]) -> bool:
+        """
+        Внутренний метод отвечает на вопрос, можно ли отложить сообщение через уровни задержки.
+
+        Args:
+            delay: задержка в секундах
+
+        Returns:
+            Вернёт True, если задержка помещается в delay_levels уровней.
+        """
+        return 0 < math.ceil(delay) < 2 ** config.rabbit_mq.delay_levels
+
+    def _get_delay_bits(self, delay: Union[int, float]) -> Dict[str, str]:
+        """
+        Внутренний метод раскладывает задержку на биты — по заголовку на каждый уровень.
+
+        Args:
+            delay: задержка в секундах
+
+        Returns:
+            Вернёт заголовки вида {'delay-bit-0': '1', 'delay-bit-1': '0', ...}.
+        """
+        seconds = math.ceil(delay)
+        return {
+            f'delay-bit-{level}': str(seconds >> level & 1)
+            for level in range(config.rabbit_mq.delay_levels)
+        }
+
+    def _get_delay_exchange_name(self, level: int) -> str:
+        """
+        Внутренний метод возвращает название обменника уровня задержки.
+
+        Args:
+            level: номер уровня
+
+        Returns:
+            Вернёт название обменника.
+        """
+        exchange_incoming = config.rabbit_mq.exchange_incoming
+        return f'{exchange_incoming}_delay_{level}'
+
+    async def _consume_lane(
+        self,
+        channel: AbstractChannel,
+        lane_name: str,
+        callback: Callable,
+        in_flight: AsyncContextManager,
+        shards: Optional[List[int]]
+    ) -> List[Tuple[AbstractQueue, str]]:
+        """
+        Внутренний метод подписывается на все шарды полосы с общим для полосы ограничителем in_flight.
+
+        Args:
+            channel: канал
+            lane_name: название полосы
+            callback: функция, которая будет обрабатывать сообщения
+            in_flight: семафор (или FairGate), ограничивающий кол-во одновременно выполняемых callback-ов
+            shards: номера шардов, которые нужно слушать
+
+        Returns:
+            Вернёт пары (очередь, consumer_tag), чтобы потом отписаться.
+        """
+        consumers = []
+
+        for shard_queue_name in self._get_consume_queue_names(lane_name, shards):
+            queue = await self._create_alive_queue(queue_name=shard_queue_name, channel=channel)
+            consumer_tag = await queue.consume(partial(self._process_message, callback, in_flight))
+            consumers.append((queue, consumer_tag))
+        return consumers
+
+    def _get_routing_key(self, queue_name: str, message_headers: Optional[dict], shard_key: Optional[str]) -> str:
+        """
+        Внутренний метод выбирает очередь для сообщения: полосу по приоритету, а в ней шард.
+
+        Args:
+            queue_name: название очереди
+            message_headers: заголовки сообщения
+            shard_key: ключ шардирования
+
+        Returns:
+            Вернёт routing_key (он же название очереди).
+        """
+        lane_name = self._get_lane_name(queue_name, message_headers)
+        return self._get_shard_queue_name(queue_name=lane_name, shard_key=shard_key)
+
+    def _get_shard_queue_name(self, queue_name: str, shard_key: Optional[str]) -> str:
+        """
+        Внутренний метод выбирает шард очереди для сообщения.
+
+        Args:
+            queue_name: название очереди
+            shard_key: ключ шардирования (без ключа — случайный шард, порядок таким сообщениям не важен)
+
+        Returns:
+            Вернёт название шарда (или самой очереди, если шардирование выключено).
+        """
+        queue_shards = config.rabbit_mq.queue_shards
+        if queue_shards <= 1:
+            return queue_name
+
+        if shard_key is None:
+            shard = random.randrange(queue_shards)  # noqa: S311
+        else:
+            shard = jump_hash(shard_key, queue_shards)
+        return f'{queue_name}_shard_{shard}'
+
+    def _get_consume_queue_names(self, queue_name: str, shards: Optional[List[int]]) -> List[str]:
+        """
+        Внутренний метод возвращает названия очередей, которые нужно слушать consumer-у.
+
+        Args:
+            queue_name: название очереди
+            shards: номера шардов (None — берём из настройки consume_shards: «all» или «0,1,...»)
+
+        Returns:
+            Вернёт названия шардов (или саму очередь, если шардирование выключено).
+        """
+        if config.rabbit_mq.queue_shards <= 1:
+            return [queue_name]
+
+        if shards is None:
+            consume_shards = config.rabbit_mq.consume_shards
+            if consume_shards == 'all':
+                shards = list(range(config.rabbit_mq.queue_shards))
+            else:
+                shards = [int(shard) for shard in consume_shards.split(',')]
+        return [f'{queue_name}_shard_{shard}' for shard in shards]
+
+    async def _process_message(
+        self,
+        callback: Callable,
+        in_flight: AsyncContextManager,
+        message: AbstractIncomingMessage
+    ) -> None:
+        """
+        Внутренний метод дожидается свободного места и выполняет callback.
+
+        Если пока ждали места, сервис начал останавливаться — возвращаем сообщение в очередь не трогая его.
+
+        Args:
+            callback: функция, которая обрабатывает сообщение
+            in_flight: семафор (или FairGate), ограничивающий кол-во одновременно выполняемых callback-ов
+            message: сообщение из очереди
+        """
+        task = asyncio.current_task()
+        self._in_flight_tasks.add(task)  # type: ignore
+        try:
+            async with in_flight:
+                if self._stop_consuming.is_set():  # type: ignore
+                    return await message.nack(requeue=True)
+                await callback(message)
+        finally:
+            self._in_flight_tasks.discard(task)  # type: ignore
+
+    async def _drain(self) -> None:
+        """
+        Внутренний метод ждёт завершения начатых callback-ов, но не дольше drain_timeout секунд.
+
+        Не успевшие callback-и отменяются, и метод дожидается их отмены:
+        иначе они продолжили бы работать с уже закрытыми каналом и соединениями.
+        """
+        if not self._in_flight_tasks:
+            return
+
+        logger.info('Draining %s in-flight messages', len(self._in_flight_tasks))
+        _, pending = await asyncio.wait(self._in_flight_tasks, timeout=config.rabbit_mq.drain_timeout)
+
+        if pending:
+            logger.warning('Drain timeout: %s messages will be redelivered', len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def _create_alive_queue(self, queue_name: str, channel: AbstractChannel) -> AbstractQueue:
         """
@@ -197,8 +879,31 @@ class RabbitMessageBroker(AbstractMessageBroker):
             }
         )
         await queue.bind(config.rabbit_mq.exchange_sorter, routing_key=queue_name)
+        self._declared_queues.add(queue_name)
         return queue
 
+    async def _ensure_alive_queue(self, queue_name: str, channel: AbstractChannel) -> None:
+        """
+        Внутренний метод создаёт «живую» очередь, только если этот процесс её ещё не создавал.
+
+        Очереди durable, так что объявлять их на каждый publish — лишний поход в Rabbit.
+
+        Args:
+            queue_name: название очереди
+            channel: канал
+        """
+        if queue_name not in self._declared_queues:
+            await self._create_alive_queue(queue_name=queue_name, channel=channel)
+
+    async def _get_channel(self) -> AbstractChannel:
+        """
+        Внутренний метод класса (нужен пулу каналов для создания нового канала).
+
+        Returns:
+            Вернёт канал поверх общего соединения.
+        """
+        return await self.connection.channel()  # type: ignore
+
     async def _get_connect(self) -> AbstractRobustConnection:
         """
         Внутренний метод класса (нужен для создания соединения).
@@ -214,7 +919,7 @@ class RabbitMessageBroker(AbstractMessageBroker):
         )
 
 
-message_broker_factory = RabbitMessageBroker()
+logger = logging.getLogger('db.message_brokers')
 
 
 # Отсюда и ниже примеры, их нужно удалить после того, как станет всё ясно.
@@ -231,17 +936,20 @@ async def callback(message: AbstractIncomingMessage) -> None:  # noqa: D103
 
 async def quick_start() -> None:
     """Функция для быстрого знакомства с интерфейсом."""
-    await message_broker_factory.idempotency_startup()
+    message_broker = RabbitMessageBroker()
+    await message_broker.start()
+    await message_broker.idempotency_startup()
     queue_name = 'queue_alive'
 
     for i in range(5):
         message_body = f'message {i}'.encode()
-        await message_broker_factory.publish(
+        await message_broker.publish(
             message_body=message_body,
             queue_name=queue_name,
             message_headers={'x-request-id': 'wwwwww'}
         )
-    await message_broker_factory.consume(queue_name=queue_name, callback=callback)
+    await message_broker.consume(queue_name=queue_name, callback=callback)
+    await message_broker.stop()
 
 
 if __name__ == '__main__':
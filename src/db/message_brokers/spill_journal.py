@@ -0,0 +1,191 @@
+"""
+Модуль содержит локальный журнал сообщений, которые не удалось отдать брокеру.
+
+Когда Rabbit недоступен или включил flow control (connection.blocked), publish не ждёт его,
+а дописывает сообщение в конец журнала — файла, отображённого в память (mmap).
+Как только брокер снова принимает сообщения, RabbitMessageBroker вычитывает журнал с начала, по порядку.
+
+Формат файла:
+в начале заголовок (read_offset, write_offset), дальше записи подряд:
+длина метаданных, длина тела, метаданные (JSON), тело.
+Смещения хранятся в самом файле, так что после перезапуска сервиса чтение продолжится с того же места.
+Когда журнал вычитан полностью, смещения сбрасываются в начало,
+а если в хвосте не хватает места — непрочитанные записи переносятся в начало файла
+(только если они поместятся в уже вычитанное место, не задев сами себя).
+
+Запись в mmap попадает в page cache ядра, поэтому падение процесса журналу не страшно.
+flush() (msync) делаем при закрытии и после вычитки — иначе каждый publish стоил бы записи на диск.
+"""
+import mmap
+import os
+import struct
+import time
+from typing import NamedTuple, Optional, Union
+
+import orjson
+
+JOURNAL_HEADER = struct.Struct('>QQ')
+RECORD_HEADER = struct.Struct('>II')
+
+
+class SpilledMessage(NamedTuple):
+
+    """Сообщение из журнала."""
+
+    message_body: bytes
+    queue_name: str
+    message_headers: Optional[dict]
+    delay: Union[int, float]
+    shard_key: Optional[str]
+    spilled_at: float
+
+
+class SpillJournal:  # noqa: WPS214
+
+    """Класс с интерфейсом журнала сообщений (append-only, mmap)."""
+
+    def __init__(self, path: str, size: int) -> None:
+        """
+        Конструктор.
+
+        Args:
+            path: путь к файлу журнала
+            size: размер файла в байтах (больше журнал не вырастет)
+        """
+        self.path = path
+        self.size = size
+        self._file_descriptor: Optional[int] = None
+        self._journal: Optional[mmap.mmap] = None
+
+    def open(self) -> None:
+        """Метод открывает (или создаёт) файл журнала и отображает его в память."""
+        self._file_descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        if os.fstat(self._file_descriptor).st_size < self.size:
+            os.ftruncate(self._file_descriptor, self.size)
+        self._journal = mmap.mmap(self._file_descriptor, self.size)
+
+        _, write_offset = JOURNAL_HEADER.unpack_from(self._journal, 0)
+        if not write_offset:  # Новый файл.
+            self._set_offsets(JOURNAL_HEADER.size, JOURNAL_HEADER.size)
+
+    def close(self) -> None:
+        """Метод сбрасывает журнал на диск и закрывает файл."""
+        self._journal.flush()  # type: ignore
+        self._journal.close()  # type: ignore
+        os.close(self._file_descriptor)  # type: ignore
+
+    def is_empty(self) -> bool:
+        """
+        Метод отвечает на вопрос, остались ли в журнале невычитанные сообщения.
+
+        Returns:
+            Вернёт True, если журнал пуст.
+        """
+        read_offset, write_offset = JOURNAL_HEADER.unpack_from(self._journal, 0)  # type: ignore
+        return read_offset == write_offset
+
+    def append(
+        self,
+        message_body: bytes,
+        queue_name: str,
+        message_headers: Optional[dict],
+        delay: Union[int, float],
+        shard_key: Optional[str]
+    ) -> bool:
+        """
+        Метод дописывает сообщение в конец журнала.
+
+        Args:
+            message_body: содержимое сообщения
+            queue_name: название очереди
+            message_headers: заголовки сообщения
+            delay: задержка в секундах
+            shard_key: ключ шардирования
+
+        Returns:
+            Вернёт False, если журнал переполнен.
+        """
+        meta = orjson.dumps({
+            'queue_name': queue_name,
+            'message_headers': message_headers,
+            'delay': delay,
+            'shard_key': shard_key,
+            'spilled_at': time.time()
+        })
+        record_size = RECORD_HEADER.size + len(meta) + len(message_body)
+
+        read_offset, write_offset = JOURNAL_HEADER.unpack_from(self._journal, 0)  # type: ignore
+        if write_offset + record_size > self.size:
+            read_offset, write_offset = self._compact(read_offset, write_offset)
+        if write_offset + record_size > self.size:
+            return False
+
+        RECORD_HEADER.pack_into(self._journal, write_offset, len(meta), len(message_body))  # type: ignore
+        self._journal.seek(write_offset + RECORD_HEADER.size)  # type: ignore
+        self._journal.write(meta + message_body)  # type: ignore
+        self._set_offsets(read_offset, write_offset + record_size)
+        return True
+
+    def peek(self) -> Optional[SpilledMessage]:
+        """
+        Метод читает первое невычитанное сообщение, не удаляя его из журнала.
+
+        Returns:
+            Вернёт сообщение или None, если журнал пуст.
+        """
+        if self.is_empty():
+            return None
+
+        read_offset, _ = JOURNAL_HEADER.unpack_from(self._journal, 0)  # type: ignore
+        meta_size, body_size = RECORD_HEADER.unpack_from(self._journal, read_offset)  # type: ignore
+        meta_offset = read_offset + RECORD_HEADER.size
+        body_offset = meta_offset + meta_size
+
+        meta = orjson.loads(self._journal[meta_offset:body_offset])  # type: ignore
+        return SpilledMessage(message_body=self._journal[body_offset:body_offset + body_size], **meta)  # type: ignore
+
+    def pop(self) -> None:
+        """Метод удаляет из журнала первое невычитанное сообщение (после того, как брокер его подтвердил)."""
+        read_offset, write_offset = JOURNAL_HEADER.unpack_from(self._journal, 0)  # type: ignore
+        meta_size, body_size = RECORD_HEADER.unpack_from(self._journal, read_offset)  # type: ignore
+        read_offset += RECORD_HEADER.size + meta_size + body_size
+
+        if read_offset == write_offset:  # Всё вычитали — начинаем файл сначала.
+            self._set_offsets(JOURNAL_HEADER.size, JOURNAL_HEADER.size)
+            self._journal.flush()  # type: ignore
+        else:
+            self._set_offsets(read_offset, write_offset)
+
+    def _compact(self, read_offset: int, write_offset: int) -> tuple:
+        """
+        Внутренний метод переносит невычитанные записи в начало файла, освобождая место в хвосте.
+
+        Переносим, только если новое место целиком лежит в уже вычитанной части файла:
+        до обновления заголовка записи остаются нетронутыми на старом месте, и если процесс упадёт посреди
+        переноса, заголовок по-прежнему укажет на целые данные. Если места не хватает, журнал считается
+        переполненным, пока вычитка не сдвинет read_offset.
+
+        Args:
+            read_offset: откуда начинаются невычитанные записи
+            write_offset: где они заканчиваются
+
+        Returns:
+            Вернёт новые (read_offset, write_offset).
+        """
+        unread_size = write_offset - read_offset
+        if read_offset - JOURNAL_HEADER.size < unread_size:  # Перенос затёр бы ещё не вычитанные записи.
+            return read_offset, write_offset
+
+        self._journal.move(JOURNAL_HEADER.size, read_offset, unread_size)  # type: ignore
+        self._set_offsets(JOURNAL_HEADER.size, JOURNAL_HEADER.size + unread_size)
+        return JOURNAL_HEADER.size, JOURNAL_HEADER.size + unread_size
+
+    def _set_offsets(self, read_offset: int, write_offset: int) -> None:
+        """
+        Внутренний метод записывает смещения в заголовок журнала.
+
+        Args:
+            read_offset: смещение первой невычитанной записи
+            write_offset: смещение, куда писать следующую запись
+        """
+        JOURNAL_HEADER.pack_into(self._journal, 0, read_offset, write_offset)  # type: ignore
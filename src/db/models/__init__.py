@@ -1,3 +1,6 @@
+from . import delivery_state
 from . import email_group_notifications
 from . import email_single_notifications
 from . import email_templates
+from . import outbox
+from . import parked_messages
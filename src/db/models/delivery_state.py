@@ -0,0 +1,37 @@
+"""Модуль содержит таблицу состояния доставки одиночных email."""
+from sqlalchemy import Column, DateTime, Text
+from sqlalchemy.dialects.postgresql import UUID
+
+from db.db_init import Base
+
+EXPIRED_RESULT = 'expired'  # sent_result уведомлений, которые не успели отправить до крайнего срока
+DELIVERY_STATE_FILLFACTOR = 70  # Свободное место в странице под HOT-обновления (задаётся миграцией)
+
+
+class DeliveryState(Base):  # type: ignore
+
+    """
+    Таблица DeliveryState.
+
+    Отметки обработки (взято в обработку, отправлено, ответ SMTP) раньше лежали прямо в single_emails,
+    рядом с JSONB message, и каждая блокировка, разблокировка и запись ответа переписывала всю широкую строку.
+    Теперь они живут в узкой таблице с fillfactor < 100: обновления в основном HOT (без новых записей в индексах),
+    а single_emails после вставки почти не меняется.
+
+    Строка появляется, когда email_formatter впервые берёт уведомление в обработку (или API его меняет),
+    до этого отметок у уведомления нет.
+
+    Таблица секционирована так же, как single_emails (по created_at уведомления, см. db/storage/partitions.py):
+    секции обеих таблиц за одни сутки отцепляются вместе. Внешнего ключа на single_emails нет —
+    на секционированную таблицу с составным ключом он бы мешал отцеплять секции; строку состояния
+    без уведомления не создать — её вставляют только из SELECT по single_emails.
+    """
+
+    __tablename__ = 'delivery_state'
+    __table_args__ = {'schema': 'email'}
+
+    notification_id = Column(UUID(as_uuid=True), primary_key=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)  # single_emails.created_at
+    passed_to_handler_at = Column(DateTime(timezone=True))
+    sent_at = Column(DateTime(timezone=True))
+    sent_result = Column(Text)
@@ -14,7 +14,7 @@ class GroupEmails(Base):  # type: ignore
     __tablename__ = 'group_emails'
     __table_args__ = {'schema': 'email'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     source = Column(Text, nullable=False)
     destination_id = Column(UUID(as_uuid=True), nullable=False)
     template_id = Column(UUID(as_uuid=True), nullable=False)
@@ -26,3 +26,4 @@ class GroupEmails(Base):  # type: ignore
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True))
     passed_to_handler_at = Column(DateTime(timezone=True))
+    expired_at = Column(DateTime(timezone=True))  # Крайний срок истёк до рассылки — письма не создавались
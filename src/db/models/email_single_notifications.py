@@ -1,7 +1,7 @@
 """Модуль содержит таблицу одиночных email."""
 from uuid import uuid4
 
-from sqlalchemy import Column, Integer, DateTime, func, Text
+from sqlalchemy import Column, Index, Integer, DateTime, func, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 from db.db_init import Base
@@ -9,22 +9,30 @@ from db.db_init import Base
 
 class SingleEmails(Base):  # type: ignore
 
-    """Таблица SingleEmails."""
+    """
+    Таблица SingleEmails.
+
+    Секционирована по created_at (по суткам, см. db/storage/partitions.py), поэтому created_at входит
+    в первичный ключ: уникальность на секционированной таблице обязана включать ключ секционирования.
+    Схема секций задаётся миграцией, секции наперёд создаёт сервис partition_retention.
+    """
 
     __tablename__ = 'single_emails'
-    __table_args__ = {'schema': 'email'}
+    __table_args__ = (
+        # Письма рассылок ищут по group_id; одиночные письма (group_id IS NULL) в индекс не попадают.
+        Index('ix_email_single_emails_group_id', 'group_id', postgresql_where='group_id IS NOT NULL'),
+        {'schema': 'email'}
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     source = Column(Text, nullable=False)
     destination_id = Column(UUID(as_uuid=True), nullable=False)
     template_id = Column(UUID(as_uuid=True), nullable=False)
-    group_id = Column(UUID(as_uuid=True), index=True)
+    group_id = Column(UUID(as_uuid=True))
     subject = Column(Text, nullable=False)
     message = Column(JSONB, nullable=False)
     delay = Column(Integer, default=0, nullable=False)
-    created_at = Column(DateTime(timezone=True), default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True))
-    passed_to_handler_at = Column(DateTime(timezone=True))
-    sent_at = Column(DateTime(timezone=True))
-    sent_result = Column(Text)
+    # Отметки обработки — в узкой таблице delivery_state (db/models/delivery_state.py).
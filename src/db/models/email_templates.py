@@ -14,7 +14,7 @@ class HTMLTemplates(Base):  # type: ignore
     __tablename__ = 'html_templates'
     __table_args__ = {'schema': 'email'}
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, nullable=False)
     title = Column(Text, nullable=False)
     template = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), default=func.now())
@@ -0,0 +1,26 @@
+"""Модуль содержит таблицу outbox — сообщения, ожидающие отправки в брокер."""
+from sqlalchemy import Column, Float, DateTime, func, Text, BigInteger, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
+
+from db.db_init import Base
+
+
+class Outbox(Base):  # type: ignore
+
+    """
+    Таблица Outbox.
+
+    API пишет сюда сообщение для брокера в той же транзакции, что и сам email,
+    а outbox_relay пачками перекладывает их в брокер и удаляет отсюда.
+    """
+
+    __tablename__ = 'outbox'
+    __table_args__ = {'schema': 'email'}
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    queue_name = Column(Text, nullable=False)
+    message_body = Column(LargeBinary, nullable=False)
+    message_headers = Column(JSONB)
+    delay = Column(Float, default=0, nullable=False)  # Секунды, дробные тоже (задержка в Rabbit — в мс).
+    shard_key = Column(Text)
+    created_at = Column(DateTime(timezone=True), default=func.now(), nullable=False)
@@ -0,0 +1,29 @@
+"""Модуль содержит таблицу парковки — сообщения, которые так и не удалось обработать."""
+from sqlalchemy import Column, DateTime, func, Text, BigInteger, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB
+
+from db.db_init import Base
+
+
+class ParkedMessages(Base):  # type: ignore
+
+    """
+    Таблица ParkedMessages.
+
+    Сюда обработчики складывают сообщения, исчерпавшие max_retry_count (вместо того, чтобы просто выкинуть),
+    а parking_replay после аварии возвращает их в конвейер через outbox.
+    """
+
+    __tablename__ = 'parked_messages'
+    __table_args__ = {'schema': 'email'}
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    stage = Column(Text, nullable=False, index=True)
+    queue_name = Column(Text, nullable=False)
+    message_body = Column(LargeBinary, nullable=False)
+    message_headers = Column(JSONB)
+    source = Column(Text, index=True)
+    shard_key = Column(Text)  # Из заголовка x-shard-key: при возврате сообщение попадёт в свой шард
+    error = Column(Text)
+    parked_at = Column(DateTime(timezone=True), default=func.now(), nullable=False, index=True)
+    replayed_at = Column(DateTime(timezone=True))
@@ -0,0 +1,68 @@
+"""
+Модуль содержит парковку сообщений, которые так и не удалось обработать.
+
+Раньше сообщение, превысившее max_retry_count, подтверждалось и оставалось только в логе
+(Too many repeat inserts in the queue), так что после аварии SMTP или Auth потерянную работу собирали руками.
+Теперь обработчик паркует его в таблицу parked_messages: этап, очередь, тело, заголовки,
+источник (x-source), ключ шарда (x-shard-key) и последнюю ошибку (x-last-error, её проставляет retry()).
+Вернуть сообщения в конвейер можно пачками и с ограничением скорости — см. parking_replay.
+"""
+import logging
+from typing import Any
+
+from sqlalchemy import insert
+
+from db.message_brokers.abstract_classes import LAST_ERROR_HEADER, SHARD_KEY_HEADER, SOURCE_HEADER
+from db.models.parked_messages import ParkedMessages
+from db.storage.abstract_classes import AbstractDBClient
+from db.storage.orm_factory import db
+
+
+class ParkingLot:
+
+    """Класс с интерфейсом парковки сообщений."""
+
+    def __init__(self, database: AbstractDBClient) -> None:
+        """
+        Конструктор.
+
+        Args:
+            database: интерфейс для низкоуровневой работы с БД.
+        """
+        self.db = database
+
+    async def park(self, stage: str, queue_name: str, message: Any) -> bool:
+        """
+        Метод паркует сообщение.
+
+        x-death в таблицу не пишем: это служебный заголовок Rabbit (с датами), попытки и так есть в retry-count.
+
+        Args:
+            stage: этап (сервис), на котором сообщение застряло
+            queue_name: очередь, из которой оно пришло (в неё же его вернёт parking_replay)
+            message: сообщение из очереди
+
+        Returns:
+            Вернёт ответ на вопрос удалось ли запарковать сообщение.
+        """
+        headers = dict(message.headers or {})
+        headers.pop('x-death', None)
+        query = insert(ParkedMessages).values(
+            stage=stage,
+            queue_name=queue_name,
+            message_body=message.body,
+            message_headers=headers,
+            source=headers.get(SOURCE_HEADER),
+            shard_key=headers.get(SHARD_KEY_HEADER),
+            error=headers.get(LAST_ERROR_HEADER)
+        )
+        try:
+            await self.db.execute(query)
+        except Exception as error:
+            logger.error('Failed park message from %s: %s', queue_name, error)
+            return False
+        return True
+
+
+logger = logging.getLogger('db.parking')
+parking_lot = ParkingLot(database=db)
@@ -1,15 +1,18 @@
 from abc import ABC, abstractmethod
-from typing import Union, Optional, List
+from typing import Any, Union, Optional, List, AsyncContextManager, Iterable, Sequence
 
 from databases.interfaces import Record
+from sqlalchemy import Table
 from sqlalchemy.sql import Update, Select, Insert, Delete
 
+from db.storage.compiled_query import CompiledQuery
+
 
 class AbstractDBClient(ABC):
     """Абстрактный класс подключения к БД."""
 
     @abstractmethod
-    async def start(self) -> None:
+    async def start(self, with_replica: bool = False) -> None:
         """Метод создаёт соединение с БД."""
         pass
 
@@ -22,3 +25,28 @@ class AbstractDBClient(ABC):
     async def execute(self, query: Union[Update, Select, Insert, Delete]) -> Optional[List[Record]]:
         """Метод выполняет запрос в БД."""
         pass
+
+    @abstractmethod
+    async def execute_read(self, query: Select) -> List[Record]:
+        """Метод выполняет select на реплике (или на primary, если реплики нет или она недоступна)."""
+        pass
+
+    @abstractmethod
+    def prepare(self, query: Union[Update, Select, Insert, Delete], fetch_all: bool = False) -> CompiledQuery:
+        """Метод один раз компилирует запрос для execute_compiled."""
+        pass
+
+    @abstractmethod
+    async def execute_compiled(self, compiled_query: CompiledQuery, **params: Any) -> Any:
+        """Метод выполняет скомпилированный запрос, подставив параметры."""
+        pass
+
+    @abstractmethod
+    async def copy_records(self, table: Table, columns: Sequence[str], records: Iterable[Sequence[Any]]) -> int:
+        """Метод загружает строки в таблицу через COPY."""
+        pass
+
+    @abstractmethod
+    def transaction(self) -> AsyncContextManager:
+        """Метод открывает транзакцию (все запросы внутри неё выполняются в одном соединении)."""
+        pass
@@ -0,0 +1,107 @@
+"""
+Модуль содержит микро-батчер: копит мелкие записи в БД и выполняет их пачкой, одним запросом.
+
+Каждый callback обрабатывает одно сообщение, и раньше каждое сообщение стоило своего похода в Postgres.
+Теперь callback отдаёт свою часть работы в submit() и ждёт результата, а батчер собирает такие части
+от всех одновременно обрабатываемых сообщений — пока не наберётся max_size штук или не пройдёт max_delay секунд
+с первой из них — и выполняет их одним вызовом flush (например, UPDATE ... FROM unnest(...)).
+Одно сообщение ждёт не дольше max_delay, зато на пачку приходится один запрос и один commit.
+
+submit() возвращает управление только после того, как пачка записана:
+сообщение подтверждается брокеру лишь после того, как его результат оказался в БД.
+При остановке (stop) недобранная пачка записывается сразу, а начатые записи дожидаются.
+"""
+import asyncio
+import logging
+from itertools import repeat
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Set, Tuple
+
+FlushFunction = Callable[[List[Any]], Awaitable[Optional[Sequence[Any]]]]
+
+
+class MicroBatcher:
+
+    """Класс с интерфейсом микро-батчера."""
+
+    def __init__(self, name: str, flush: FlushFunction, max_size: int, max_delay: float) -> None:
+        """
+        Конструктор.
+
+        Args:
+            name: название (для логов)
+            flush: корутина, выполняющая пачку; может вернуть по результату на каждый элемент (в том же порядке)
+            max_size: сколько элементов набрать, чтобы выполнить пачку сразу
+            max_delay: сколько секунд ждать с первого элемента пачки, прежде чем выполнить её недобранной
+        """
+        self.name = name
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._flush = flush
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Метод добавляет элемент в пачку и ждёт, пока её выполнят.
+
+        Args:
+            item: элемент (например, id сообщения и его результат)
+
+        Returns:
+            Вернёт результат flush для этого элемента (None, если flush ничего не вернул).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+
+        return await future
+
+    async def stop(self) -> None:
+        """Метод сразу выполняет недобранную пачку и дожидается всех начатых."""
+        self._start_flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def _start_flush(self) -> None:
+        """Внутренний метод забирает накопленную пачку и запускает её выполнение в фоне."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        flush_task = asyncio.create_task(self._run(batch))
+        self._flushing.add(flush_task)
+        flush_task.add_done_callback(self._flushing.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """
+        Внутренний метод выполняет пачку и раздаёт результаты ожидающим.
+
+        Если flush упал — ошибку получит каждый элемент пачки (и каждое сообщение уйдёт на повтор).
+
+        Args:
+            batch: элементы пачки с их future
+        """
+        try:
+            results = await self._flush([item for item, _ in batch])
+        except Exception as error:
+            logger.warning('Micro batch %s of %s items failed: %s', self.name, len(batch), error)
+            for _, failed in batch:
+                if not failed.done():
+                    failed.set_exception(error)
+            return
+
+        for (_, future), item_result in zip(batch, repeat(None) if results is None else results):
+            if not future.done():  # Ожидающего могли отменить — результат ему уже не нужен.
+                future.set_result(item_result)
+
+
+logger = logging.getLogger('db.storage.micro_batcher')
@@ -1,16 +1,104 @@
-"""Модуль содержит классы для асинхронной работы с БД."""
-from typing import Union, Optional, List
+"""
+Модуль содержит классы для асинхронной работы с БД.
+
+Все запросы процесса идут через один пул соединений asyncpg (блокировки, чтение, запись),
+поэтому его размер, время ожидания свободного соединения, кэш подготовленных запросов
+и время жизни простаивающего соединения задаются в настройках pg.
+При start() пул прогревается: все pool_min_size соединений открываются и проверяются сразу,
+а не на первых запросах. Раз в pool_stats_interval секунд в лог пишется загрузка пула:
+размер, сколько соединений свободно, сколько запросов ждут соединения, среднее и максимальное ожидание.
+
+GET ручки API читают через execute_read с реплики (pg_replica_host), чтобы не конкурировать
+с блокировками воркеров на primary. Пул реплики открывается только в start(with_replica=True) и только если
+реплика задана, иначе execute_read читает с primary. Если реплика недоступна, execute_read читает с primary
+и pg_replica_retry_interval секунд не пробует реплику, чтобы не ждать её таймаут на каждом запросе.
+Реплика отстаёт: что клиент только что записал, вызывающий читает через execute (см. EmailsFactory.select).
+
+Запросы вне транзакции при ошибке повторяются (timeout_limiter). Внутри транзакции — нет:
+после ошибки Postgres отвергает все запросы до конца транзакции (current transaction is aborted),
+так что повтор внутри неё только ждал бы max_timeout впустую. Такой запрос сразу поднимает DataBaseError,
+транзакция откатывается, а повторять её целиком (уже в новой транзакции) — решение вызывающего.
+
+Массовая вставка (рассылка на группу) идёт не через INSERT ... VALUES, а через бинарный COPY (copy_records):
+Postgres не разбирает огромный запрос и не упирается в лимит параметров (32767 на запрос).
+"""
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from functools import wraps
+from typing import (  # noqa: WPS235
+    Any, Union, Optional, List, AsyncContextManager, AsyncIterator, Iterable, Sequence, Callable
+)
 
 import databases
 from databases.interfaces import Record
+from sqlalchemy import Table
 from sqlalchemy.sql import Update, Select, Insert, Delete
 
 from config.settings import config
 from db.storage.abstract_classes import AbstractDBClient
+from db.storage.compiled_query import CompiledQuery
 from utils.async_backoff import timeout_limiter
+from utils.custom_exceptions import DataBaseError
+
+
+def retry_outside_transaction(logger_name: str) -> Callable:
+    """
+    Функция-декоратор повторяет запрос (timeout_limiter), только если он выполняется вне транзакции.
+
+    Args:
+        logger_name: имя логгера для timeout_limiter
+
+    Returns:
+        Вернёт декоратор метода AsyncPGClient.
+    """
+
+    def func_wrapper(method: Callable) -> Callable:
+        """
+        Декоратор метода.
+
+        Args:
+            method: метод AsyncPGClient, выполняющий запрос
+
+        Returns:
+            Вернёт метод, который повторяет запрос только вне транзакции.
+        """
+        with_retries = timeout_limiter(max_timeout=10, logger_name=logger_name)(method)
 
+        @wraps(method)
+        async def inner(client: 'AsyncPGClient', *args: Any, **kwargs: Any) -> Any:
+            """
+            Возвращаемая декоратором функция.
 
-class AsyncPGClient(AbstractDBClient):
+            Args:
+                client: экземпляр AsyncPGClient
+                args: аргументы метода
+                kwargs: именованные аргументы метода
+
+            Returns:
+                Вернёт результат метода.
+
+            Raises:
+                DataBaseError: если запрос внутри транзакции упал (транзакция уже отвергает запросы)
+            """
+            if not client.in_transaction():
+                return await with_retries(client, *args, **kwargs)
+            try:
+                return await method(client, *args, **kwargs)
+            except Exception as error:
+                raise DataBaseError(
+                    db_name=method.__name__,
+                    message='Query failed inside transaction',
+                    error_type=str(error)
+                )
+
+        return inner
+
+    return func_wrapper
+
+
+class AsyncPGClient(AbstractDBClient):  # noqa: WPS214
 
     """Класс создаёт сессию для асинхронной работы с Postgres."""
 
@@ -18,21 +106,65 @@ class AsyncPGClient(AbstractDBClient):
 
         """Конструктор."""
 
-        user = config.pg.login.get_secret_value()
-        password = config.pg.password.get_secret_value()
-        host = config.pg.host
-        db_name = config.pg.db_name
-        self.session = databases.Database(f'postgresql://{user}:{password}@{host}/{db_name}')  # noqa: WPS221
+        self.session = self._create_session(config.pg.host)
+        self.replica_session = self._create_session(config.pg.replica_host) if config.pg.replica_host else None
+        self.read_session = self.session  # Станет replica_session после start(with_replica=True).
+        self._replica_down_until = 0.0  # noqa: WPS358 — до этого момента (monotonic) execute_read читает с primary
+        self._waiting = 0
+        self._acquired = 0
+        self._total_wait = 0.0  # noqa: WPS358
+        self._max_wait = 0.0  # noqa: WPS358
+        self._report_task: Optional[asyncio.Task] = None
+
+    async def start(self, with_replica: bool = False) -> None:
+        """
+        Метод создаёт пул соединений с БД и прогревает его.
 
-    async def start(self) -> None:
-        """Метод создаёт соединение с БД."""
+        Args:
+            with_replica: открыть и пул реплики для execute_read (нужен только API)
+        """
         await self.session.connect()
+        await asyncio.gather(*(self._ping(self.session) for _ in range(config.pg.pool_min_size)))
+
+        if with_replica and self.replica_session is not None:
+            await self.replica_session.connect()
+            await asyncio.gather(*(self._ping(self.replica_session) for _ in range(config.pg.pool_min_size)))
+            self.read_session = self.replica_session
+
+        if config.pg.pool_stats_interval:
+            self._report_task = asyncio.create_task(self._report())
 
     async def stop(self) -> None:
-        """Метод закрывает соединение с БД."""
+        """Метод закрывает соединения с БД."""
+        if self._report_task is not None:
+            self._report_task.cancel()
+        if self.read_session is not self.session:
+            await self.read_session.disconnect()
         await self.session.disconnect()
 
-    @timeout_limiter(max_timeout=10, logger_name='db.orm_factory.execute')
+    def transaction(self) -> AsyncContextManager:
+        """
+        Метод открывает транзакцию.
+
+        Все запросы, выполненные внутри async with db.transaction(), попадут в одну транзакцию.
+        Если внутри блока случится исключение — транзакция откатится.
+
+        Returns:
+            Вернёт асинхронный контекстный менеджер транзакции.
+        """
+        return self.session.transaction()
+
+    def in_transaction(self) -> bool:
+        """
+        Метод проверяет, выполняется ли текущая задача внутри транзакции (db.transaction()).
+
+        Returns:
+            Вернёт True, если соединение задачи сейчас в транзакции.
+        """
+        connection = self.session.connection()  # Соединение привязано к задаче, сам вызов в пул не ходит.
+        return bool(connection._transaction_stack)  # noqa: WPS437 — databases не даёт это наружу
+
+    @retry_outside_transaction(logger_name='db.orm_factory.execute')
     async def execute(self, query: Union[Update, Select, Insert, Delete]) -> Optional[List[Record]]:
         """
         Метод выполняет запрос в БД.
@@ -43,11 +175,217 @@ class AsyncPGClient(AbstractDBClient):
         Returns:
             Если запрос select — список полей, в противном случае ничего.
         """
-        if query.is_select:
-            return await self.session.fetch_all(query)
-        return await self.session.execute(query)
+        async with self._acquire(self.session):
+            if query.is_select:
+                return await self.session.fetch_all(query)
+            return await self.session.execute(query)
+
+    async def execute_read(self, query: Select) -> List[Record]:
+        """
+        Метод выполняет select на реплике.
+
+        Реплика не отвечает — запрос уходит на primary (с повторами, как execute), а реплика
+        replica_retry_interval секунд не используется. Внутри транзакции читать так нельзя —
+        запрос уйдёт в другое соединение, используйте execute.
+
+        Args:
+            query: запрос к БД
+
+        Returns:
+            Вернёт список полей.
+        """
+        if self.read_session is not self.session and time.monotonic() >= self._replica_down_until:
+            try:
+                return await self._fetch_replica(query)
+            except Exception as error:
+                self._replica_down_until = time.monotonic() + config.pg.replica_retry_interval
+                logger.warning('Replica is unavailable, reading from primary: %s', error)
+        return await self.execute(query) or []
+
+    def prepare(self, query: Union[Update, Select, Insert, Delete], fetch_all: bool = False) -> CompiledQuery:
+        """
+        Метод один раз компилирует запрос (см. compiled_query.py).
+
+        Компилировать можно до start(): нужен только диалект.
+
+        Args:
+            query: запрос к БД (меняющиеся значения — через bindparam)
+            fetch_all: execute_compiled вернёт все строки, даже если запрос не select
+
+        Returns:
+            Вернёт скомпилированный запрос для execute_compiled.
+        """
+        dialect = self.session._backend._dialect  # type: ignore  # noqa: WPS437
+        return CompiledQuery(query, dialect=dialect, fetch_all=fetch_all)
+
+    @retry_outside_transaction(logger_name='db.orm_factory.execute_compiled')
+    async def execute_compiled(self, compiled_query: CompiledQuery, **params: Any) -> Any:
+        """
+        Метод выполняет скомпилированный запрос напрямую через соединение asyncpg.
+
+        Соединение то же, что у execute (привязано к задаче), так что запрос попадает и в открытую транзакцию.
+
+        Args:
+            compiled_query: скомпилированный запрос
+            params: значения bindparam
+
+        Returns:
+            Если запрос select (или fetch_all) — список строк (asyncpg Record),
+            в противном случае первое поле RETURNING или None.
+        """
+        query_args = compiled_query.bind(params)
+        async with self._acquire(self.session):
+            raw_connection = self.session.connection().raw_connection
+            if compiled_query.fetch_all:
+                return await raw_connection.fetch(compiled_query.sql, *query_args)
+            return await raw_connection.fetchval(compiled_query.sql, *query_args)
+
+    async def copy_records(self, table: Table, columns: Sequence[str], records: Iterable[Sequence[Any]]) -> int:
+        """
+        Метод загружает строки в таблицу бинарным COPY через соединение asyncpg.
+
+        Значения по умолчанию SQLAlchemy (default=...) COPY не проставляет — их нужно передать в records.
+        Повторов (timeout_limiter) здесь нет: внутри транзакции повторять COPY после ошибки бессмысленно,
+        решение о повторе остаётся за вызывающим.
+
+        Args:
+            table: таблица SQLAlchemy
+            columns: названия колонок в порядке значений в строке
+            records: строки (итерируются лениво, целиком в памяти не нужны)
+
+        Returns:
+            Вернёт кол-во загруженных строк.
+        """
+        async with self._acquire(self.session):
+            raw_connection = self.session.connection().raw_connection
+            status = await raw_connection.copy_records_to_table(
+                table.name,
+                schema_name=table.schema,
+                columns=list(columns),
+                records=records
+            )
+        return int(status.split()[-1])  # Ответ Postgres вида «COPY 1000».
+
+    def get_pool_stats(self) -> dict:
+        """
+        Метод собирает метрики загрузки пула и обнуляет максимальное ожидание.
+
+        Returns:
+            Вернёт размер пула, кол-во свободных соединений, ждущих соединения запросов,
+            среднее и максимальное ожидание соединения (секунды).
+            Ожидание считается по обоим пулам, если открыт пул реплики — добавятся его размер и свободные соединения.
+        """
+        size, idle = self._get_pool_size(self.session)
+        stats = {
+            'size': size,
+            'idle': idle,
+            'max_size': config.pg.pool_max_size,
+            'waiting': self._waiting,
+            'avg_wait': self._total_wait / self._acquired if self._acquired else 0,
+            'max_wait': self._max_wait
+        }
+        if self.read_session is not self.session:
+            stats['replica_size'], stats['replica_idle'] = self._get_pool_size(self.read_session)
+        self._max_wait = 0
+        return stats
+
+    def _create_session(self, host: str) -> databases.Database:
+        """
+        Внутренний метод создаёт (но не открывает) пул соединений с Postgres на host.
+
+        Args:
+            host: хост (и порт) primary или реплики
+
+        Returns:
+            Вернёт databases.Database.
+        """
+        user = config.pg.login.get_secret_value()
+        password = config.pg.password.get_secret_value()
+        db_name = config.pg.db_name
+        return databases.Database(
+            f'postgresql://{user}:{password}@{host}/{db_name}',  # noqa: WPS221
+            min_size=config.pg.pool_min_size,
+            max_size=config.pg.pool_max_size,
+            statement_cache_size=config.pg.statement_cache_size,
+            max_inactive_connection_lifetime=config.pg.connection_lifetime
+        )
+
+    def _get_pool_size(self, session: databases.Database) -> tuple:
+        """
+        Внутренний метод возвращает размер пула и кол-во свободных соединений.
+
+        Args:
+            session: пул primary или реплики
+
+        Returns:
+            Вернёт (размер, свободные).
+        """
+        pool = session._backend._pool  # type: ignore  # noqa: WPS437 — databases не даёт пул наружу
+        if pool is None:
+            return 0, 0
+        return pool.get_size(), pool.get_idle_size()
+
+    async def _fetch_replica(self, query: Select) -> List[Record]:
+        """
+        Внутренний метод выполняет select на реплике.
+
+        Args:
+            query: запрос к БД
+
+        Returns:
+            Вернёт список полей.
+        """
+        async with self._acquire(self.read_session):
+            return await self.read_session.fetch_all(query)
+
+    @asynccontextmanager
+    async def _acquire(self, session: databases.Database) -> AsyncIterator[None]:
+        """
+        Внутренний метод берёт соединение из пула, но ждёт его не дольше pool_acquire_timeout секунд.
+
+        Соединение databases привязано к задаче: запросы внутри (и транзакция вокруг) используют его же.
+
+        Args:
+            session: пул primary или реплики
+
+        Yields:
+            Ничего — соединение уже привязано к задаче.
+        """
+        async with AsyncExitStack() as stack:
+            started_at = time.monotonic()
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(
+                    stack.enter_async_context(session.connection()),
+                    timeout=config.pg.pool_acquire_timeout
+                )
+            finally:
+                self._waiting -= 1
+
+            waited = time.monotonic() - started_at
+            self._acquired += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            yield
+
+    async def _ping(self, session: databases.Database) -> None:
+        """
+        Внутренний метод проверяет соединение (при прогреве каждый вызов берёт своё соединение).
+
+        Args:
+            session: пул primary или реплики
+        """
+        await session.fetch_val('SELECT 1')
+
+    async def _report(self) -> None:
+        """Внутренний метод (фоновая задача) раз в pool_stats_interval секунд пишет загрузку пула в лог."""
+        with suppress(asyncio.CancelledError):
+            while True:  # noqa: WPS457
+                await asyncio.sleep(config.pg.pool_stats_interval)
+                logger.info('Postgres pool: %s', self.get_pool_stats())
 
 
+logger = logging.getLogger('db.orm_factory')
 db = AsyncPGClient()
 
 
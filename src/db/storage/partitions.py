@@ -0,0 +1,91 @@
+"""
+Модуль содержит правила секционирования single_emails и delivery_state по времени создания (created_at).
+
+Обе таблицы разбиты на секции по суткам (UTC): email.single_emails_pYYYYMMDD, email.delivery_state_pYYYYMMDD.
+Всё, что было до перехода на секции, лежит в одной секции *_legacy: её partition_retention не отцепляет никогда.
+Секции наперёд создаёт, а старые отцепляет (и архивирует или удаляет) сервис partition_retention.
+Если секции наперёд всё же кончились, вставка попадёт в секцию по умолчанию *_default, а не упадёт;
+partition_retention переносит такие строки в созданную для них секцию и пишет об этом ошибку в лог.
+
+Запросы горячего пути знают время создания уведомления (заголовок x-created-at едет через весь конвейер)
+и ограничивают created_at снизу началом его секции: Postgres отбрасывает все более старые секции
+и трогает только свежие. Если время создания неизвестно (сообщение отправлено до перехода на секции),
+ограничение снимается — запрос пройдёт по всем секциям, но отработает верно.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+PARTITION_SCHEMA = 'email'
+PARTITIONED_TABLES = ('single_emails', 'delivery_state')
+PARTITION_INTERVAL = timedelta(days=1)
+ALL_PARTITIONS = datetime.min.replace(tzinfo=timezone.utc)
+LEGACY_PARTITION_SUFFIX = 'legacy'
+DEFAULT_PARTITION_SUFFIX = 'default'
+
+
+def get_partition_start(moment: datetime) -> datetime:
+    """
+    Функция возвращает начало секции, в которую попадёт момент.
+
+    Args:
+        moment: время (с часовым поясом)
+
+    Returns:
+        Вернёт начало суток по UTC.
+    """
+    return moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_partition_name(table: str, partition_start: datetime) -> str:
+    """
+    Функция возвращает название секции.
+
+    Args:
+        table: секционированная таблица
+        partition_start: начало секции
+
+    Returns:
+        Вернёт название вида single_emails_p20261018 (без схемы).
+    """
+    return f'{table}_p{partition_start:%Y%m%d}'
+
+
+def get_legacy_partition_name(table: str) -> str:
+    """
+    Функция возвращает название секции со всем, что создано до перехода на секции.
+
+    Args:
+        table: секционированная таблица
+
+    Returns:
+        Вернёт название вида single_emails_legacy (без схемы).
+    """
+    return f'{table}_{LEGACY_PARTITION_SUFFIX}'
+
+
+def get_default_partition_name(table: str) -> str:
+    """
+    Функция возвращает название секции по умолчанию (туда попадает то, для чего не нашлось суточной секции).
+
+    Args:
+        table: секционированная таблица
+
+    Returns:
+        Вернёт название вида single_emails_default (без схемы).
+    """
+    return f'{table}_{DEFAULT_PARTITION_SUFFIX}'
+
+
+def get_created_from(created_at: Optional[float]) -> datetime:
+    """
+    Функция возвращает нижнюю границу created_at для запросов горячего пути.
+
+    Args:
+        created_at: unix timestamp создания уведомления (None — неизвестно)
+
+    Returns:
+        Вернёт начало секции уведомления или ALL_PARTITIONS, если время создания неизвестно.
+    """
+    if created_at is None:
+        return ALL_PARTITIONS
+    return get_partition_start(datetime.fromtimestamp(created_at, timezone.utc))
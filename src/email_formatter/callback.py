@@ -10,10 +10,12 @@ import orjson
 from aio_pika.abc import AbstractIncomingMessage
 
 from config.settings import config
-from db.message_brokers.rabbit_message_broker import message_broker_factory
+from db.message_brokers.abstract_classes import CREATED_AT_HEADER, DEADLINE_HEADER, SOURCE_HEADER
+from db.message_brokers.broker_factory import message_broker_factory
+from db.parking.parking_lot import parking_lot
 from email_formatter.models.data_from_queue import MessageData
 from email_formatter.models.log import log_names
-from email_formatter.services.email_formatter import formatter_service
+from email_formatter.services.email_formatter import STAGE, formatter_service
 
 
 async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WPS212,WPS213
@@ -38,30 +40,41 @@ async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WP
     message_data = MessageData(
         x_request_id=header,
         count_retry=header,
+        priority=header,
+        deadline=header,
+        created_at=header,
         notification_id=message.body
     )
 
-    if message_data.count_retry > config.rabbit_mq.max_retry_count:
-        logger.info(log_names.error.drop_message, 'Too many repeat inserts in the queue', message_data.x_request_id)
+    # Просроченное уведомление выкидываем сразу — до походов в БД, Auth и SMTP.
+    if message_broker_factory.is_expired(message_data.deadline):
+        logger.info(log_names.error.drop_message, 'Deadline has passed', message_data.x_request_id)
+        await formatter_service.expire(message_data.notification_id, message_data.created_at)
         return await message.ack()
 
-    locked = await formatter_service.lock(message_data.notification_id)
+    # Попытки кончились — паркуем сообщение, чтобы после аварии вернуть его в конвейер.
+    if message_data.count_retry > config.rabbit_mq.max_retry_count:
+        return await park(message, message_data.x_request_id)
+
+    # Блокируем сообщение и тем же запросом достаём его данные с шаблоном.
+    claimed_data = await formatter_service.claim(message_data.notification_id, message_data.created_at)
 
     # Если не удалось заблокировать, значит уже обработано (или удалено).
-    if not locked:
+    if claimed_data is None:
         logger.info(log_names.error.drop_message, 'Message has being processed or deleted', message_data.x_request_id)
         return await message.ack()
 
     # Начало транзакции.
     try:
         notification_data = await formatter_service.get_data(
-            notification_id=message_data.notification_id,
+            claimed_data=claimed_data,
             x_request_id=message_data.x_request_id
         )
 
         # Проверяем подписан ли пользователь на сообщение.
         if not formatter_service.check_subscription(notification_data.user_data.groups, notification_data.group):
             logger.info(log_names.error.drop_message, 'User is not subscribed for message', message_data.x_request_id)
+            await formatter_service.mark_done(message_data.notification_id)
             return await message.ack()
 
         html_text = await formatter_service.render_html(
@@ -82,7 +95,14 @@ async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WP
         if not await message_broker_factory.publish(
             message_body=formatted_notification,
             queue_name=config.rabbit_mq.queue_formatted_single_messages,
-            message_headers={'x-request-id': message_data.x_request_id}
+            message_headers={
+                'x-request-id': message_data.x_request_id,
+                'priority': message_data.priority,
+                DEADLINE_HEADER: message_data.deadline,
+                CREATED_AT_HEADER: message_data.created_at,
+                SOURCE_HEADER: notification_data.source
+            },
+            shard_key=str(notification_data.destination_id)
         ):
             logger.warning(
                 log_names.warn.retrying,
@@ -90,17 +110,36 @@ async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WP
                 'Failed connect to Rabbit',
                 message_data.x_request_id
             )
-            await formatter_service.unlock(message_data.notification_id)
-            return await message.reject()
+            await formatter_service.unlock(message_data.notification_id, message_data.created_at)
+            return await message_broker_factory.retry(message, 'Failed connect to Rabbit')
 
         logger.info(log_names.info.success_completed, f'id {message_data.notification_id}', message_data.x_request_id)
+        await formatter_service.mark_done(message_data.notification_id)
         return await message.ack()  # Только после всех этих действий мы можем сказать очереди — перемога.
 
     except Exception as error:
         # Если не смогли завершить транзакцию, снимаем блокировку и реджектим сообщение.
-        await formatter_service.unlock(message_data.notification_id)
+        await formatter_service.unlock(message_data.notification_id, message_data.created_at)
         logger.warning(log_names.warn.retrying, message_data.notification_id, error, message_data.x_request_id)
-        return await message.reject()
+        return await message_broker_factory.retry(message, str(error))
+
+
+async def park(message: AbstractIncomingMessage, x_request_id: str) -> None:
+    """
+    Функция паркует сообщение, исчерпавшее max_retry_count (см. db/parking).
+
+    В кэш обработанных сообщение не отмечаем: иначе после возврата из парковки его выкинет claim().
+    Если запарковать не вышло — сообщение уходит на ещё один повтор, но не теряется.
+
+    Args:
+        message: сообщение, приходящее из очереди
+        x_request_id: id запроса
+    """
+    if not await parking_lot.park(STAGE, config.rabbit_mq.queue_raw_single_messages, message):
+        return await message_broker_factory.retry(message, 'Failed park message')
+
+    logger.info(log_names.error.drop_message, 'Too many repeat inserts in the queue (parked)', x_request_id)
+    return await message.ack()
 
 
 logger = logging.getLogger('email_formatter')
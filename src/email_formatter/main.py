@@ -7,13 +7,15 @@
 """
 import asyncio
 import logging
+import signal
 from logging import config as logging_config
 
 import aiohttp
 
 from config.logging_settings import LOGGING
 from config.settings import config
-from db.message_brokers.rabbit_message_broker import message_broker_factory
+from db.cache.dedup_cache import dedup_cache
+from db.message_brokers.broker_factory import message_broker_factory
 from db.storage import orm_factory
 from email_formatter.callback import callback  # type: ignore
 from email_formatter.models.log import log_names
@@ -26,8 +28,12 @@ async def startup() -> None:
 
     headers = {'Authorization': config.auth_api.access_token.get_secret_value()}
     aiohttp_session.session = aiohttp.ClientSession(headers=headers)
+    await message_broker_factory.start()
     await message_broker_factory.idempotency_startup()
+    # По SIGTERM перестаём брать новые сообщения и доделываем начатые (см. consume).
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, message_broker_factory.stop_consuming)
     await orm_factory.db.start()
+    await dedup_cache.start()
     logger.info(log_names.info.started, 'formatter handler')
 
 
@@ -36,7 +42,9 @@ async def shutdown() -> None:
     """Функция для действий во время завершения работы приложения."""
 
     await aiohttp_session.session.close()  # type: ignore
+    await message_broker_factory.stop()
     await orm_factory.db.stop()
+    await dedup_cache.stop()
 
 
 async def main() -> None:
@@ -46,7 +54,9 @@ async def main() -> None:
     await startup()
     await message_broker_factory.consume(
         queue_name=config.rabbit_mq.queue_raw_single_messages,
-        callback=callback
+        callback=callback,
+        prefetch_count=config.rabbit_mq.prefetch_raw_single_messages,
+        max_in_flight=config.rabbit_mq.max_in_flight_raw_single_messages
     )
     await shutdown()
 
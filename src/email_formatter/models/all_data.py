@@ -18,6 +18,7 @@ class NotificationData(BaseConfigModel):
 
     """Все данные, которые сервис юзает."""
 
+    destination_id: Optional[UUID]
     user_data: Optional[AuthData]
     template: Optional[str]
     message: Optional[dict]
@@ -39,6 +40,7 @@ class FinalData(BaseConfigModel):
 
     """Все данные, которые сервис юзает."""
 
+    destination_id: UUID
     user_data: FinalAuth
     template: str
     message: dict
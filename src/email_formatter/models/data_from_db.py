@@ -31,3 +31,10 @@ class RawDataDB(BaseConfigModel):
             Вернёт словарь.
         """
         return orjson.loads(message)
+
+
+class ClaimedDataDB(RawDataDB):
+
+    """Класс с «сырыми» данными из DB, взятыми в обработку, вместе с шаблоном."""
+
+    template: Optional[str]
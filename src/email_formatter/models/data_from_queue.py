@@ -1,18 +1,21 @@
 """Модуль содержит Pydantic модель для данных, приходящих из очереди."""
-from typing import Union
+from typing import Optional, Union
 
 from pydantic import validator
 
+from db.message_brokers.broker_factory import message_broker_factory
+from db.message_brokers.delivery_headers import DeliveryHeaders
 from email_formatter.models.base_config import BaseConfigModel  # type: ignore
 
 
-class MessageData(BaseConfigModel):
+class MessageData(DeliveryHeaders, BaseConfigModel):
 
     """Данные из очереди."""
 
     x_request_id: Union[str, dict]
     notification_id: Union[bytes, str]
     count_retry: Union[int, dict]
+    created_at: Union[float, dict, None]
 
     @validator('x_request_id')
     def x_request_id_to_str(cls, message: dict) -> str:
@@ -51,4 +54,17 @@ class MessageData(BaseConfigModel):
         Returns:
             Вернёт count retry значение.
         """
-        return message['headers']['x-death'][0]['count']
+        return message_broker_factory.get_retry_count(message['headers'])
+
+    @validator('created_at')
+    def get_created_at(cls, message: dict) -> Optional[float]:  # noqa: WPS615
+        """
+        Метод выкусывает из словаря с заголовками время создания уведомления (его передаём дальше по конвейеру).
+
+        Args:
+            message: сообщение
+
+        Returns:
+            Вернёт unix timestamp или None, если время не передано.
+        """
+        return message_broker_factory.get_created_at(message['headers'])
@@ -8,40 +8,44 @@ from uuid import UUID
 
 from jinja2 import Environment
 
+from db.cache.dedup_cache import dedup_cache
+from db.storage.partitions import get_created_from
 from email_formatter.models.all_data import NotificationData, AuthData, FinalData
+from email_formatter.models.data_from_db import ClaimedDataDB
 from email_formatter.services.auth import auth_service
 from email_formatter.services.pg import db_service
 
+STAGE = 'email_formatter'
+
 
 class EmailFormatterService:
 
     """Класс с интерфейсом для Email Formatter Service."""
 
-    async def get_data(self, notification_id: Union[UUID, str], x_request_id: str) -> Optional[FinalData]:
+    async def get_data(self, claimed_data: ClaimedDataDB, x_request_id: str) -> FinalData:
         """
-        Метод достаёт данные.
+        Метод собирает данные: к взятому из БД уведомлению добавляет данные о пользователе из Auth.
 
         Args:
-            notification_id: id сообщения
+            claimed_data: данные уведомления с шаблоном (см. claim)
             x_request_id: id запроса
 
         Returns:
-            Вернёт pydantic модель AuthData.
+            Вернёт pydantic модель FinalData.
         """
-        result = NotificationData()
-        raw_data = await db_service.get_raw_data_by_id(notification_id=notification_id)
-
-        if raw_data:
-            result.message = raw_data.message  # type: ignore
-            result.group = raw_data.group_id
-            result.subject = raw_data.subject
-            result.source = raw_data.source
-            result.template = await db_service.get_template_by_id(template_id=raw_data.template_id)
-            user_data = await auth_service.get_user_data_by_id(
-                destination_id=raw_data.destination_id,
-                x_request_id=x_request_id
-            )
-            result.user_data = AuthData(**user_data)  # type: ignore
+        user_data = await auth_service.get_user_data_by_id(
+            destination_id=claimed_data.destination_id,
+            x_request_id=x_request_id
+        )
+        result = NotificationData(
+            destination_id=claimed_data.destination_id,
+            message=claimed_data.message,
+            group=claimed_data.group_id,
+            subject=claimed_data.subject,
+            source=claimed_data.source,
+            template=claimed_data.template,
+            user_data=AuthData(**user_data)  # type: ignore
+        )
         result.message.update(result.user_data)  # type: ignore
         return FinalData(**result.dict())
 
@@ -78,27 +82,58 @@ class EmailFormatterService:
 
         return message_group in user_group
 
-    async def lock(self, notification_id: Union[UUID, str]) -> bool:
+    async def claim(self, notification_id: Union[UUID, str], created_at: Optional[float]) -> Optional[ClaimedDataDB]:
         """
-        Метод проставляет отметку в БД, что сообщение взято в обработку.
+        Метод проставляет отметку в БД, что сообщение взято в обработку, и заодно достаёт его данные с шаблоном.
 
         Args:
             notification_id: id сообщения
+            created_at: время создания уведомления (заголовок x-created-at)
 
         Returns:
-            Вернёт ответ на вопрос удалось ли проставить отметку.
-            Если нет — значит кто-то до нас её уже проставил, а значит это сообщение уже не наше дело.
+            Вернёт данные уведомления, если удалось проставить отметку.
+            Если нет (None) — значит кто-то до нас её уже проставил, а значит это сообщение уже не наше дело.
+            Если сообщение есть в кэше обработанных — в БД даже не ходим.
+        """
+        if await dedup_cache.is_done(STAGE, notification_id):
+            return None
+        return await db_service.claim_and_fetch(
+            notification_id=notification_id,
+            created_from=get_created_from(created_at)
+        )
+
+    async def mark_done(self, notification_id: Union[UUID, str]) -> None:
+        """
+        Метод запоминает в кэше, что сервис закончил работу с сообщением (успех или окончательный дроп).
+
+        Args:
+            notification_id: id сообщения
+        """
+        await dedup_cache.mark_done(STAGE, notification_id)
+
+    async def expire(self, notification_id: Union[UUID, str], created_at: Optional[float]) -> None:
+        """
+        Метод окончательно снимает с обработки уведомление, у которого истёк крайний срок.
+
+        Args:
+            notification_id: id сообщения
+            created_at: время создания уведомления
         """
-        return await db_service.mark_as_passed_to_handler(notification_id=notification_id)
+        await db_service.mark_as_expired(notification_id=notification_id, created_from=get_created_from(created_at))
+        await dedup_cache.mark_done(STAGE, notification_id)
 
-    async def unlock(self, notification_id: Union[UUID, str]) -> None:
+    async def unlock(self, notification_id: Union[UUID, str], created_at: Optional[float]) -> None:
         """
         Метод убирает отметку в БД, что сообщение взято в обработку.
 
         Args:
             notification_id: id сообщения
+            created_at: время создания уведомления
         """
-        await db_service.unmark_as_passed_to_handler(notification_id=notification_id)
+        await db_service.unmark_as_passed_to_handler(
+            notification_id=notification_id,
+            created_from=get_created_from(created_at)
+        )
 
 
 logger = logging.getLogger('email_formatter')
@@ -1,21 +1,116 @@
 """
 Модуль содержит сервис для работы с Postgres.
 Уже высокоуровневая бизнес логика.
+
+Запросы горячего пути собраны один раз (с bindparam) и компилируются при создании сервиса,
+на каждое сообщение остаётся только подставить параметры (см. db/storage/compiled_query.py).
 """
 import logging
+from datetime import datetime
 from typing import Optional, Union
 from uuid import UUID
 
-from sqlalchemy import select, and_, update, func
+from sqlalchemy import bindparam, literal, select, and_, update, func
+from sqlalchemy.dialects.postgresql import insert
 
+from db.models.delivery_state import EXPIRED_RESULT, DeliveryState
 from db.models.email_single_notifications import SingleEmails
 from db.models.email_templates import HTMLTemplates
 from db.storage.abstract_classes import AbstractDBClient
 from db.storage.orm_factory import db
-from email_formatter.models.data_from_db import RawDataDB
+from email_formatter.models.data_from_db import ClaimedDataDB
 from email_formatter.models.log import log_names
 
 
+# Взятие в обработку и выборка данных за один поход в БД.
+# Отметка passed_to_handler_at живёт в delivery_state (db/models/delivery_state.py): строку состояния создаём,
+# если её ещё нет, или ставим отметку в существующей, если она пустая. Если отметка уже стоит
+# (или уведомление удалено) — upsert ничего не вернёт, а значит и запрос вернёт пустоту.
+# FOR SHARE на строке single_emails не даёт API удалить или изменить уведомление, пока мы его берём (и наоборот).
+# created_from — начало секции уведомления (db/storage/partitions.py): более старые секции Postgres не трогает.
+CLAIMED = insert(
+    DeliveryState
+).from_select(
+    ['notification_id', 'created_at', 'passed_to_handler_at'],
+    select(
+        SingleEmails.id,
+        SingleEmails.created_at,
+        func.now()
+    ).filter(
+        and_(
+            SingleEmails.id == bindparam('notification_id'),
+            SingleEmails.created_at >= bindparam('created_from'),
+            SingleEmails.deleted_at == None  # noqa: E711
+        )
+    ).with_for_update(
+        read=True
+    )
+)
+CLAIMED = CLAIMED.on_conflict_do_update(
+    index_elements=[DeliveryState.notification_id, DeliveryState.created_at],
+    set_={'passed_to_handler_at': CLAIMED.excluded.passed_to_handler_at},
+    where=DeliveryState.passed_to_handler_at == None  # noqa: E711
+).returning(
+    DeliveryState.notification_id,
+    DeliveryState.created_at
+).cte('claimed')
+
+CLAIM_AND_FETCH = select(
+    SingleEmails.template_id,
+    SingleEmails.destination_id,
+    SingleEmails.message,
+    SingleEmails.group_id,
+    SingleEmails.source,
+    SingleEmails.subject,
+    HTMLTemplates.template
+).select_from(
+    CLAIMED.join(
+        SingleEmails,
+        and_(
+            SingleEmails.id == CLAIMED.c.notification_id,
+            SingleEmails.created_at == CLAIMED.c.created_at,
+            SingleEmails.created_at >= bindparam('created_from')
+        )
+    ).outerjoin(
+        HTMLTemplates,
+        HTMLTemplates.id == SingleEmails.template_id
+    )
+)
+
+UNMARK_AS_PASSED_TO_HANDLER = update(
+    DeliveryState
+).filter(
+    and_(
+        DeliveryState.notification_id == bindparam('notification_id'),
+        DeliveryState.created_at >= bindparam('created_from')
+    )
+).values(
+    passed_to_handler_at=None
+)
+
+EXPIRED = insert(
+    DeliveryState
+).from_select(
+    ['notification_id', 'created_at', 'sent_result'],
+    select(
+        SingleEmails.id,
+        SingleEmails.created_at,
+        literal(EXPIRED_RESULT)
+    ).filter(
+        and_(
+            SingleEmails.id == bindparam('notification_id'),
+            SingleEmails.created_at >= bindparam('created_from'),
+            SingleEmails.deleted_at == None  # noqa: E711
+        )
+    )
+)
+MARK_AS_EXPIRED = EXPIRED.on_conflict_do_update(
+    index_elements=[DeliveryState.notification_id, DeliveryState.created_at],
+    set_={'sent_result': EXPIRED.excluded.sent_result},
+    where=DeliveryState.sent_at == None  # noqa: E711
+)
+
+
 class DBService:  # noqa: WPS214
 
     """Класс для высокоуровневой работы с PG."""
@@ -28,124 +123,70 @@ class DBService:  # noqa: WPS214
             database: интерфейс для низкоуровневой работы с БД.
         """
         self.db = database
-
-    async def get_raw_data_by_id(self, notification_id: Union[UUID, str]) -> Optional[RawDataDB]:
+        self._claim_and_fetch = database.prepare(CLAIM_AND_FETCH)
+        self._unmark_as_passed_to_handler = database.prepare(UNMARK_AS_PASSED_TO_HANDLER)
+        self._mark_as_expired = database.prepare(MARK_AS_EXPIRED)
+
+    async def claim_and_fetch(
+        self,
+        notification_id: Union[UUID, str],
+        created_from: datetime
+    ) -> Optional[ClaimedDataDB]:
         """
-        Метод достаёт «сырые» данные по notification_id.
+        Метод берёт сообщение в обработку (проставляет отметку) и тем же запросом достаёт его данные с шаблоном.
+
+        Раньше это были три похода в БД подряд (UPDATE и два SELECT), теперь — один.
 
         Args:
             notification_id: id сообщения
+            created_from: начало секции уведомления (db/storage/partitions.py)
 
         Returns:
-            Вернёт pydantic модель RawDataModel.
+            Вернёт pydantic модель ClaimedDataDB.
+            None — если отметку не удалось поставить: её уже кто-то поставил перед нами (или сообщение удалено).
         """
-        query = select(
-            SingleEmails.template_id,
-            SingleEmails.destination_id,
-            SingleEmails.message,
-            SingleEmails.group_id,
-            SingleEmails.source,
-            SingleEmails.subject
-        ).filter(
-            and_(
-                SingleEmails.deleted_at == None,  # noqa: E711
-                SingleEmails.id == notification_id
-            )
+        result = await self.db.execute_compiled(
+            self._claim_and_fetch,
+            notification_id=notification_id,
+            created_from=created_from
         )
-        result = await self.db.execute(query)
-
-        if result:
-            row, = result
-            logger.info(log_names.info.success_get, notification_id, 'single_emails table')
-            return RawDataDB(**row._mapping)  # noqa: WPS437
-
-        logger.error(log_names.error.failed_get, notification_id, 'single_emails table')
-        return None
-
-    async def get_template_by_id(self, template_id: Union[UUID, str]) -> Optional[str]:
-        """
-        Метод достаёт шаблон по template_id.
-
-        Args:
-            template_id: id шаблона
 
-        Returns:
-            Вернёт HTML строку-шаблон.
-        """
-        query = select(HTMLTemplates.template).filter(HTMLTemplates.id == template_id)
-        result = await self.db.execute(query)
+        if not result:
+            return None
 
-        if result:
-            row, = result
-            logger.info(log_names.info.success_get, template_id, 'html_templates table')
-            return row.template  # type: ignore
+        row, = result
+        logger.info(log_names.info.accepted, f'message with id {notification_id}')
+        if row['template'] is None:
+            logger.error(log_names.error.failed_get, row['template_id'], 'html_templates table')
+        return ClaimedDataDB(**dict(row))
 
-        logger.error(log_names.error.failed_get, template_id, 'html_templates table')
-        return None
-
-    async def mark_as_passed_to_handler(self, notification_id: Union[UUID, str]) -> bool:
+    async def unmark_as_passed_to_handler(self, notification_id: Union[UUID, str], created_from: datetime) -> None:
         """
-        Метод проставляет отметку о том, что сообщение взято в обработку (дабы не допустить коллизий).
-
-        И возвращает ответ на вопрос:
-        была ли запись взята первый раз, или её уже кто-то начал обрабатывать перед нами.
-
-        PS:
-        Возможно не совсем верно смешивать два действия в одном методе,
-        однако, когда для меня стоял выбор, что сделать:
-
-        1. два запроса к БД, но раздельные методы типа
-        def mark_as_passed_to_handler() -> None
-        def someone_already_took() -> bool
-
-        2. Один запрос к БД, но, возможно, менее читаемо (реализовано сейчас)
-
-        Я выбрала второй вариант, т.к. жертвовать запросами мне видится более критично.
+        Метод убирает отметку о том, что сообщение взято в обработку (дабы не допустить коллизий).
 
         Args:
             notification_id: id сообщения
-
-        Returns:
-            Вернёт ответ на вопрос была ли запись взята первый раз, или её уже кто-то начал обрабатывать перед нами.
+            created_from: начало секции уведомления
         """
-        query = update(
-            SingleEmails
-        ).filter(
-            and_(
-                SingleEmails.id == notification_id,
-                SingleEmails.passed_to_handler_at == None,  # noqa: E711
-                SingleEmails.deleted_at == None  # noqa: E711
-            )
-        ).values(
-            passed_to_handler_at=func.now()
-        ).returning(
-            SingleEmails.id
+        await self.db.execute_compiled(
+            self._unmark_as_passed_to_handler,
+            notification_id=notification_id,
+            created_from=created_from
         )
-        result = await self.db.execute(query)
 
-        if result is not None:  # Если None — метку не удалось поставить, а значит она уже стоит.
-            logger.info(log_names.info.accepted, f'message with id {notification_id}')
-
-        return bool(result)
-
-    async def unmark_as_passed_to_handler(self, notification_id: Union[UUID, str]) -> None:
+    async def mark_as_expired(self, notification_id: Union[UUID, str], created_from: datetime) -> None:
         """
-        Метод убирает отметку о том, что сообщение взято в обработку (дабы не допустить коллизий).
+        Метод отмечает в БД, что уведомление не успели отправить до крайнего срока.
 
         Args:
             notification_id: id сообщения
+            created_from: начало секции уведомления
         """
-        query = update(
-            SingleEmails
-        ).filter(
-            and_(
-                SingleEmails.id == notification_id,
-                SingleEmails.deleted_at == None  # noqa: E711
-            )
-        ).values(
-            passed_to_handler_at=None
+        await self.db.execute_compiled(
+            self._mark_as_expired,
+            notification_id=notification_id,
+            created_from=created_from
         )
-        await self.db.execute(query)
 
 
 logger = logging.getLogger('email_formatter.db_service')
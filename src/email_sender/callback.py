@@ -9,12 +9,14 @@ import logging
 from aio_pika.abc import AbstractIncomingMessage
 
 from config.settings import config
+from db.message_brokers.broker_factory import message_broker_factory
+from db.parking.parking_lot import parking_lot
 from email_sender.models.log import log_names
 from email_sender.models.message_data import MessageData
-from email_sender.services.email_sender import sender_service
+from email_sender.services.email_sender import STAGE, sender_service
 
 
-async def callback(message: AbstractIncomingMessage) -> None:
+async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS213
     """
     Функция-обработчик сообщений.
 
@@ -36,17 +38,26 @@ async def callback(message: AbstractIncomingMessage) -> None:
     message_data = MessageData(
         x_request_id=header,
         count_retry=header,
+        priority=header,
+        deadline=header,
+        created_at=header,
         notification_id=message.body,
         html=message.body,
         reply_to=message.body,
         to=message.body,
         subject=message.body
     )
-    if message_data.count_retry > config.rabbit_mq.max_retry_count:
-        logger.info(log_names.error.drop_message, 'Too many repeat inserts in the queue', message_data.x_request_id)
+    # Просроченное уведомление выкидываем сразу — до походов в БД, Auth и SMTP.
+    if message_broker_factory.is_expired(message_data.deadline):
+        logger.info(log_names.error.drop_message, 'Deadline has passed', message_data.x_request_id)
+        await sender_service.expire(message_data.notification_id, message_data.created_at)
         return await message.ack()
 
-    locked = await sender_service.lock(message_data.notification_id)
+    # Попытки кончились — паркуем сообщение, чтобы после аварии вернуть его в конвейер.
+    if message_data.count_retry > config.rabbit_mq.max_retry_count:
+        return await park(message, message_data.x_request_id)
+
+    locked = await sender_service.lock(message_data.notification_id, message_data.created_at)
 
     # Если не удалось заблокировать, значит уже обработано (или удалено).
     if not locked:
@@ -57,16 +68,39 @@ async def callback(message: AbstractIncomingMessage) -> None:
     try:
         notification = sender_service.create_notification(message_data)
         smtp_response = await sender_service.post_notification(notification)
-        await sender_service.post_response(message_data.notification_id, smtp_response)
+        await sender_service.post_response(
+            message_data.notification_id,
+            smtp_response,
+            message_data.created_at
+        )
 
         logger.info(log_names.info.success_data_sent, f'id {message_data.notification_id}', message_data.x_request_id)
+        await sender_service.mark_done(message_data.notification_id)
         return await message.ack()  # Говорим — перемога!
 
     except Exception as error:
         # Если не смогли завершить транзакцию, снимаем блокировку и реджектим сообщение.
         logger.warning(log_names.warn.retrying, message_data.notification_id, error, message_data.x_request_id)
-        await sender_service.unlock(message_data.notification_id)
-        return await message.reject()
+        await sender_service.unlock(message_data.notification_id, message_data.created_at)
+        return await message_broker_factory.retry(message, str(error))
+
+
+async def park(message: AbstractIncomingMessage, x_request_id: str) -> None:
+    """
+    Функция паркует сообщение, исчерпавшее max_retry_count (см. db/parking).
+
+    В кэш обработанных сообщение не отмечаем: иначе после возврата из парковки его выкинет lock().
+    Если запарковать не вышло — сообщение уходит на ещё один повтор, но не теряется.
+
+    Args:
+        message: сообщение, приходящее из очереди
+        x_request_id: id запроса
+    """
+    if not await parking_lot.park(STAGE, config.rabbit_mq.queue_formatted_single_messages, message):
+        return await message_broker_factory.retry(message, 'Failed park message')
+
+    logger.info(log_names.error.drop_message, 'Too many repeat inserts in the queue (parked)', x_request_id)
+    return await message.ack()
 
 
 logger = logging.getLogger('email_sender')
@@ -16,6 +16,7 @@ class LogInfo(BaseOrjson):
     success_data_sent: str = 'Success data sent %s. X-Request-Id %s'
     started: str = 'Started %s'
     accepted: str = 'Accepted for processing %s'
+    accepted_batch: str = 'Accepted for processing %s of %s messages'
 
 
 class LogWarning(BaseOrjson):
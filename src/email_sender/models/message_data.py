@@ -1,18 +1,21 @@
 """Модуль содержит Pydantic модель для данных, приходящих из очереди."""
-from typing import Union
+from typing import Optional, Union
 
 import orjson
 from pydantic import validator
 
+from db.message_brokers.broker_factory import message_broker_factory
+from db.message_brokers.delivery_headers import DeliveryHeaders
 from email_sender.models.base_config import BaseConfigModel  # type: ignore
 
 
-class MessageData(BaseConfigModel):
+class MessageData(DeliveryHeaders, BaseConfigModel):  # noqa: WPS214
 
     """Данные из очереди."""
 
     x_request_id: Union[str, dict]
     count_retry: Union[int, dict]
+    created_at: Union[float, dict, None]
     notification_id: Union[str, bytes]
     html: Union[str, bytes]
     reply_to: Union[str, bytes]
@@ -43,7 +46,20 @@ class MessageData(BaseConfigModel):
         Returns:
             Вернёт count retry значение.
         """
-        return message['headers']['x-death'][0]['count']
+        return message_broker_factory.get_retry_count(message['headers'])
+
+    @validator('created_at')
+    def get_created_at(cls, message: dict) -> Optional[float]:  # noqa: WPS615
+        """
+        Метод выкусывает из словаря с заголовками время создания уведомления (его передаём дальше по конвейеру).
+
+        Args:
+            message: сообщение
+
+        Returns:
+            Вернёт unix timestamp или None, если время не передано.
+        """
+        return message_broker_factory.get_created_at(message['headers'])
 
     @validator('notification_id')
     def get_notification_id(cls, message: bytes) -> str:  # noqa: WPS615
@@ -4,20 +4,40 @@
 """
 import logging
 from email.message import EmailMessage
-from typing import Union
+from typing import Optional, Union
 from uuid import UUID
 
 import aiosmtplib
 
 from config.settings import config
+from db.cache.dedup_cache import dedup_cache
+from db.storage.micro_batcher import MicroBatcher
+from db.storage.partitions import get_created_from
 from email_sender.models.message_data import MessageData
 from email_sender.services.pg import db_service
 
+STAGE = 'email_sender'
 
-class EmailSenderService:
+
+class EmailSenderService:  # noqa: WPS214
 
     """Класс с интерфейсом email_sender."""
 
+    def __init__(self) -> None:
+        """Конструктор."""
+        self.claim_batcher = MicroBatcher(
+            name='sent_at',
+            flush=db_service.mark_many_as_sent_at,
+            max_size=config.pg.batch_max_size,
+            max_delay=config.pg.batch_max_delay
+        )
+        self.results_batcher = MicroBatcher(
+            name='sent_results',
+            flush=db_service.mark_as_sent_results,
+            max_size=config.pg.batch_max_size,
+            max_delay=config.pg.batch_max_delay
+        )
+
     def create_notification(self, message_data: MessageData) -> EmailMessage:
         """
         Метод создаёт сообщение для отправки в SMTP.
@@ -57,37 +77,77 @@ class EmailSenderService:
         )
         return response[1]
 
-    async def lock(self, notification_id: Union[UUID, str]) -> bool:
+    async def lock(self, notification_id: Union[UUID, str], created_at: Optional[float]) -> bool:
         """
         Метод проставляет отметку в БД, что сообщение взято в обработку.
 
         Args:
             notification_id: id сообщения
+            created_at: время создания уведомления (заголовок x-created-at)
 
         Returns:
             Вернёт ответ на вопрос удалось ли проставить отметку.
             Если нет — значит кто-то до нас её уже проставил, а значит это сообщение уже не наше дело.
+            Если сообщение есть в кэше обработанных — в БД даже не ходим.
+            Отметки одновременно обрабатываемых сообщений ставятся микро-пачками, одним UPDATE на пачку.
         """
-        return await db_service.mark_as_sent_at(notification_id=notification_id)
+        if await dedup_cache.is_done(STAGE, notification_id):
+            return False
+        return await self.claim_batcher.submit((notification_id, get_created_from(created_at)))
 
-    async def unlock(self, notification_id: Union[UUID, str]) -> None:
+    async def mark_done(self, notification_id: Union[UUID, str]) -> None:
         """
-        Метод убирает отметку в БД, что сообщение взято в обработку.
+        Метод запоминает в кэше, что сервис закончил работу с сообщением (успех или окончательный дроп).
 
         Args:
             notification_id: id сообщения
         """
-        await db_service.unmark_as_sent_at(notification_id=notification_id)
+        await dedup_cache.mark_done(STAGE, notification_id)
 
-    async def post_response(self, notification_id: Union[UUID, str], response: str) -> None:
+    async def expire(self, notification_id: Union[UUID, str], created_at: Optional[float]) -> None:
+        """
+        Метод окончательно снимает с обработки уведомление, у которого истёк крайний срок.
+
+        Args:
+            notification_id: id сообщения
+            created_at: время создания уведомления
+        """
+        await db_service.mark_as_expired(notification_id=notification_id, created_from=get_created_from(created_at))
+        await dedup_cache.mark_done(STAGE, notification_id)
+
+    async def unlock(self, notification_id: Union[UUID, str], created_at: Optional[float]) -> None:
+        """
+        Метод убирает отметку в БД, что сообщение взято в обработку.
+
+        Args:
+            notification_id: id сообщения
+            created_at: время создания уведомления
+        """
+        await db_service.unmark_as_sent_at(notification_id=notification_id, created_from=get_created_from(created_at))
+
+    async def post_response(
+        self,
+        notification_id: Union[UUID, str],
+        response: str,
+        created_at: Optional[float]
+    ) -> None:
         """
         Метод записывает в БД ответ из SMTP сервера.
 
+        Ответы копятся в микро-пачку и пишутся одним UPDATE на всю пачку;
+        метод вернётся, когда пачка с этим ответом записана.
+
         Args:
             notification_id: id сообщения
             response: ответ сервера
+            created_at: время создания уведомления
         """
-        await db_service.mark_as_sent_result(notification_id=notification_id, result=response)
+        await self.results_batcher.submit((notification_id, response, get_created_from(created_at)))
+
+    async def stop(self) -> None:
+        """Метод дописывает в БД накопленные отметки и ответы SMTP сервера (до закрытия соединений с БД)."""
+        await self.claim_batcher.stop()
+        await self.results_batcher.stop()
 
 
 logger = logging.getLogger('email_sender')
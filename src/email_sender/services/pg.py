@@ -1,18 +1,90 @@
 """
 Модуль содержит сервис для работы с Postgres.
 Уже высокоуровневая бизнес логика.
+
+Запросы горячего пути собраны один раз (с bindparam) и компилируются при создании сервиса,
+на каждое сообщение остаётся только подставить параметры (см. db/storage/compiled_query.py).
 """
 import logging
-from typing import Union
+from datetime import datetime
+from typing import List, Tuple, Union
 from uuid import UUID
 
-from sqlalchemy import and_, update, func
+from sqlalchemy import Text, and_, bindparam, cast, update, func
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 
-from db.models.email_single_notifications import SingleEmails
+from db.models.delivery_state import EXPIRED_RESULT, DeliveryState
 from db.storage.abstract_classes import AbstractDBClient
 from db.storage.orm_factory import db
 from email_sender.models.log import log_names
 
+# Отметки живут в узкой таблице delivery_state (db/models/delivery_state.py).
+# До email_sender сообщение доходит только после того, как email_formatter взял уведомление в обработку:
+# строка состояния уже есть, а удалить такое уведомление API не даст — проверять deleted_at не нужно.
+# created_from — начало самой старой секции среди уведомлений запроса (db/storage/partitions.py).
+
+# Взятие в обработку пачки сообщений одним запросом (см. db/storage/micro_batcher.py):
+# RETURNING вернёт только те id, отметку которых поставили мы.
+MARK_MANY_AS_SENT_AT = update(
+    DeliveryState
+).filter(
+    and_(
+        DeliveryState.notification_id == func.any(cast(bindparam('notification_ids'), ARRAY(PG_UUID(as_uuid=True)))),
+        DeliveryState.created_at >= bindparam('created_from'),
+        DeliveryState.sent_at == None  # noqa: E711
+    )
+).values(
+    sent_at=func.now()
+).returning(
+    DeliveryState.notification_id
+)
+
+UNMARK_AS_SENT_AT = update(
+    DeliveryState
+).filter(
+    and_(
+        DeliveryState.notification_id == bindparam('notification_id'),
+        DeliveryState.created_at >= bindparam('created_from')
+    )
+).values(
+    sent_at=None
+)
+
+# Ответы SMTP пишем пачкой (см. db/storage/micro_batcher.py): id и ответы приходят двумя массивами,
+# unnest склеивает их в строки. Текст запроса не зависит от размера пачки — prepared statement один.
+SENT_RESULTS = func.unnest(
+    cast(bindparam('notification_ids'), ARRAY(PG_UUID(as_uuid=True))),
+    cast(bindparam('results'), ARRAY(Text))
+).table_valued(
+    'notification_id',
+    'result'
+).render_derived(
+    name='sent_results'
+)
+
+MARK_AS_SENT_RESULTS = update(
+    DeliveryState
+).filter(
+    and_(
+        DeliveryState.notification_id == SENT_RESULTS.c.notification_id,
+        DeliveryState.created_at >= bindparam('created_from')
+    )
+).values(
+    sent_result=SENT_RESULTS.c.result
+)
+
+MARK_AS_EXPIRED = update(
+    DeliveryState
+).filter(
+    and_(
+        DeliveryState.notification_id == bindparam('notification_id'),
+        DeliveryState.created_at >= bindparam('created_from'),
+        DeliveryState.sent_at == None  # noqa: E711
+    )
+).values(
+    sent_result=EXPIRED_RESULT
+)
+
 
 class DBService:  # noqa: WPS214
 
@@ -26,72 +98,80 @@ class DBService:  # noqa: WPS214
             database: интерфейс для низкоуровневой работы с БД.
         """
         self.db = database
+        self._mark_many_as_sent_at = database.prepare(MARK_MANY_AS_SENT_AT, fetch_all=True)
+        self._unmark_as_sent_at = database.prepare(UNMARK_AS_SENT_AT)
+        self._mark_as_sent_results = database.prepare(MARK_AS_SENT_RESULTS)
+        self._mark_as_expired = database.prepare(MARK_AS_EXPIRED)
 
-    async def mark_as_sent_at(self, notification_id: Union[UUID, str]) -> bool:
+    async def mark_many_as_sent_at(self, claims: List[Tuple[Union[UUID, str], datetime]]) -> List[bool]:
         """
-        Метод ставит отметку о том, что сообщение отправлено.
+        Метод одним запросом ставит отметку о том, что сообщения отправлены, для пачки сообщений.
 
         Args:
-            notification_id: id сообщения
+            claims: пары (id сообщения, начало секции уведомления)
+
+        Returns:
+            Вернёт для каждого id (в том же порядке) ответ на вопрос, удалось ли поставить отметку нам.
+            Если один id пришёл в пачке дважды — отметка достанется только первому.
         """
-        query = update(
-            SingleEmails
-        ).filter(
-            and_(
-                SingleEmails.id == notification_id,
-                SingleEmails.sent_at == None,  # noqa: E711
-                SingleEmails.deleted_at == None  # noqa: E711
-            )
-        ).values(
-            sent_at=func.now()
-        ).returning(
-            SingleEmails.id
+        notification_ids, created_froms = zip(*claims)
+        rows = await self.db.execute_compiled(
+            self._mark_many_as_sent_at,
+            notification_ids=list(notification_ids),
+            created_from=min(created_froms)
         )
-        result = await self.db.execute(query)
+        claimed = {str(row['notification_id']) for row in rows}
 
-        if result is not None:  # Если None — метку не удалось поставить, а значит она уже стоит.
-            logger.info(log_names.info.accepted, f'message with id {notification_id}')
+        locked = []
+        for notification_id in map(str, notification_ids):
+            locked.append(notification_id in claimed)
+            claimed.discard(notification_id)
 
-        return bool(result)
+        logger.info(log_names.info.accepted_batch, sum(locked), len(locked))
+        return locked
 
-    async def unmark_as_sent_at(self, notification_id: Union[UUID, str]) -> None:
+    async def unmark_as_sent_at(self, notification_id: Union[UUID, str], created_from: datetime) -> None:
         """
         Метод убирает отметку о том, что сообщение отправлено.
 
         Args:
             notification_id: id сообщения
+            created_from: начало секции уведомления
+        """
+        await self.db.execute_compiled(
+            self._unmark_as_sent_at,
+            notification_id=notification_id,
+            created_from=created_from
+        )
+
+    async def mark_as_sent_results(self, sent_results: List[Tuple[Union[UUID, str], str, datetime]]) -> None:
+        """
+        Метод одним запросом проставляет в БД ответы от SMTP сервера для пачки сообщений.
+
+        Args:
+            sent_results: тройки (id сообщения, ответ сервера, начало секции уведомления)
         """
-        query = update(
-            SingleEmails
-        ).filter(
-            and_(
-                SingleEmails.id == notification_id,
-                SingleEmails.deleted_at == None  # noqa: E711
-            )
-        ).values(
-            sent_at=None
+        notification_ids, results, created_froms = zip(*sent_results)
+        await self.db.execute_compiled(
+            self._mark_as_sent_results,
+            notification_ids=list(notification_ids),
+            results=list(results),
+            created_from=min(created_froms)
         )
-        await self.db.execute(query)
 
-    async def mark_as_sent_result(self, notification_id: Union[UUID, str], result: str) -> None:
+    async def mark_as_expired(self, notification_id: Union[UUID, str], created_from: datetime) -> None:
         """
-        Метод проставляет в БД ответ от SMTP сервера.
+        Метод отмечает в БД, что уведомление не успели отправить до крайнего срока.
 
         Args:
             notification_id: id сообщения
-            result: ответ сервера
+            created_from: начало секции уведомления
         """
-        query = update(
-            SingleEmails
-        ).filter(
-            and_(
-                SingleEmails.id == notification_id,
-                SingleEmails.deleted_at == None  # noqa: E711
-            )
-        ).values(
-            sent_result=result
+        await self.db.execute_compiled(
+            self._mark_as_expired,
+            notification_id=notification_id,
+            created_from=created_from
         )
-        await self.db.execute(query)
 
 
 logger = logging.getLogger('email_sender.db_service')
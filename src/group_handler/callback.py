@@ -5,14 +5,18 @@
 для работы group_handler в одну функцию-обработчик callback.
 """
 import logging
+from typing import List
 
 from aio_pika.abc import AbstractIncomingMessage
 
 from config.settings import config
-from db.message_brokers.rabbit_message_broker import message_broker_factory
+from db.message_brokers.abstract_classes import DEADLINE_HEADER
+from db.message_brokers.broker_factory import message_broker_factory
+from db.parking.parking_lot import parking_lot
+from group_handler.models.data_single_emails import DataSingleEmails
 from group_handler.models.log import log_names
 from group_handler.models.message_data import MessageData
-from group_handler.services.group_handler import group_handler_service
+from group_handler.services.group_handler import STAGE, group_handler_service
 
 
 async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WPS212,WPS213
@@ -37,13 +41,21 @@ async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WP
     message_data = MessageData(
         x_request_id=header,
         count_retry=header,
+        priority=header,
+        deadline=header,
         notification_id=message.body
     )
 
-    if message_data.count_retry > config.rabbit_mq.max_retry_count:
-        logger.info(log_names.error.drop_message, 'Too many repeat inserts in the queue', message_data.x_request_id)
+    # Просроченное уведомление выкидываем сразу — до походов в БД, Auth и SMTP.
+    if message_broker_factory.is_expired(message_data.deadline):
+        logger.info(log_names.error.drop_message, 'Deadline has passed', message_data.x_request_id)
+        await group_handler_service.expire(message_data.notification_id)
         return await message.ack()
 
+    # Попытки кончились — паркуем сообщение, чтобы после аварии вернуть его в конвейер.
+    if message_data.count_retry > config.rabbit_mq.max_retry_count:
+        return await park(message, message_data.x_request_id)
+
     locked = await group_handler_service.lock(message_data.notification_id)
 
     # Если не удалось заблокировать, значит уже обработано (или удалено).
@@ -57,31 +69,66 @@ async def callback(message: AbstractIncomingMessage) -> None:  # noqa: WPS231,WP
             notification_id=message_data.notification_id,
             x_request_id=message_data.x_request_id
         )
-        await group_handler_service.post_data(**all_data.dict())
-
-        # Регистрируем события в очередь.
-        for row in all_data.users:
-            if not await message_broker_factory.publish(
-                message_body=str(row.id).encode(),
-                queue_name=config.rabbit_mq.queue_raw_single_messages,
-                message_headers={'x-request-id': message_data.x_request_id},
-                delay=row.delay
-            ):
-                logger.warning(
-                    log_names.warn.retrying,
-                    message_data.notification_id,
-                    'Failed connect to Rabbit',
-                    message_data.x_request_id
-                )
-                return await message.reject()
-
-        return await message.ack()
+        await group_handler_service.post_data(all_data.users)
 
     except Exception as error:
-        # Если не смогли завершить транзакцию, снимаем блокировку и реджектим сообщение.
+        # Если не смогли записать письма, снимаем блокировку и реджектим сообщение.
         logger.warning(log_names.warn.retrying, message_data.notification_id, error, message_data.x_request_id)
         await group_handler_service.unlock(message_data.notification_id)
-        return await message.reject()
+        return await message_broker_factory.retry(message, str(error))
+
+    return await publish(message, message_data, all_data.users)
+
+
+async def publish(message: AbstractIncomingMessage, message_data: MessageData, users: List[DataSingleEmails]) -> None:
+    """
+    Функция отправляет сообщения о письмах рассылки, уже записанных в single_emails.
+
+    Рассылку целиком дальше не повторяем: get_data выдал бы письмам новые id, и письма задублировались бы.
+    Неподтверждённые Rabbit сообщения group_handler_service.publish досылает сам, а недосланное кладёт в outbox.
+    Если не вышло и это — письма остаются только в single_emails (по group_id их можно найти и дослать),
+    а блокировка рассылки не снимается, чтобы повтор не создал дублей.
+
+    Args:
+        message: сообщение, приходящее из очереди
+        message_data: данные сообщения
+        users: письма рассылки
+    """
+    # Приоритет и срок рассылки передаём каждому письму.
+    message_headers = {
+        'x-request-id': message_data.x_request_id,
+        'priority': message_data.priority,
+        DEADLINE_HEADER: message_data.deadline
+    }
+    notification_id, x_request_id = message_data.notification_id, message_data.x_request_id
+    try:
+        in_outbox = await group_handler_service.publish(users, message_headers)
+    except Exception as error:
+        logger.error(log_names.error.failed_publish_group, notification_id, error, x_request_id)
+        return await message.ack()
+
+    if in_outbox:
+        logger.warning(log_names.warn.sent_to_outbox, in_outbox, notification_id, x_request_id)
+    await group_handler_service.mark_done(notification_id)
+    return await message.ack()
+
+
+async def park(message: AbstractIncomingMessage, x_request_id: str) -> None:
+    """
+    Функция паркует сообщение, исчерпавшее max_retry_count (см. db/parking).
+
+    В кэш обработанных сообщение не отмечаем: иначе после возврата из парковки его выкинет lock().
+    Если запарковать не вышло — сообщение уходит на ещё один повтор, но не теряется.
+
+    Args:
+        message: сообщение, приходящее из очереди
+        x_request_id: id запроса
+    """
+    if not await parking_lot.park(STAGE, config.rabbit_mq.queue_raw_group_messages, message):
+        return await message_broker_factory.retry(message, 'Failed park message')
+
+    logger.info(log_names.error.drop_message, 'Too many repeat inserts in the queue (parked)', x_request_id)
+    return await message.ack()
 
 
 logger = logging.getLogger('group_handler')
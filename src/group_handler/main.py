@@ -11,13 +11,15 @@
 """
 import asyncio
 import logging
+import signal
 from logging import config as logging_config
 
 import aiohttp
 
 from config.logging_settings import LOGGING
 from config.settings import config
-from db.message_brokers.rabbit_message_broker import message_broker_factory
+from db.cache.dedup_cache import dedup_cache
+from db.message_brokers.broker_factory import message_broker_factory
 from db.storage import orm_factory
 from group_handler.callback import callback  # type: ignore
 from group_handler.models.log import log_names
@@ -30,8 +32,12 @@ async def startup() -> None:
 
     headers = {'Authorization': config.auth_api.access_token.get_secret_value()}
     aiohttp_session.session = aiohttp.ClientSession(headers=headers)
+    await message_broker_factory.start()
     await message_broker_factory.idempotency_startup()
+    # По SIGTERM перестаём брать новые сообщения и доделываем начатые (см. consume).
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, message_broker_factory.stop_consuming)
     await orm_factory.db.start()
+    await dedup_cache.start()
     logger.info(log_names.info.started, 'group handler')
 
 
@@ -40,7 +46,9 @@ async def shutdown() -> None:
     """Функция для действий во время завершения работы приложения."""
 
     await aiohttp_session.session.close()  # type: ignore
+    await message_broker_factory.stop()
     await orm_factory.db.stop()
+    await dedup_cache.stop()
 
 
 async def main() -> None:
@@ -50,7 +58,9 @@ async def main() -> None:
     await startup()
     await message_broker_factory.consume(
         queue_name=config.rabbit_mq.queue_raw_group_messages,
-        callback=callback
+        callback=callback,
+        prefetch_count=config.rabbit_mq.prefetch_raw_group_messages,
+        max_in_flight=config.rabbit_mq.max_in_flight_raw_group_messages
     )
     await shutdown()
 
@@ -1,4 +1,5 @@
 """Модуль содержит pydantic классы."""
+from datetime import datetime
 from typing import Dict, Optional
 from uuid import UUID
 
@@ -17,3 +18,4 @@ class DataSingleEmails(BaseConfigModel):
     subject: str
     message: Dict
     delay: int = 0
+    created_at: Optional[datetime]
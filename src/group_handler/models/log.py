@@ -7,6 +7,7 @@ class LogError(BaseOrjson):
     """Критические ошибки."""
 
     drop_message: str = 'Dropped message because %s. X-Request-Id %s'
+    failed_publish_group: str = 'Failed publish group %s due to %s, emails are only in single_emails. X-Request-Id %s'
 
 
 class LogInfo(BaseOrjson):
@@ -24,6 +25,8 @@ class LogWarning(BaseOrjson):
     """Предостережения."""
 
     retrying: str = 'Retrying message %s due to %s. X-Request-Id %s'
+    failed_publish: str = 'Rabbit did not take %s messages due to %s'
+    sent_to_outbox: str = 'Rabbit did not confirm %s messages of group %s, they went to outbox. X-Request-Id %s'
 
 
 class LogNames(BaseOrjson):
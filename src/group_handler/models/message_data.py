@@ -3,10 +3,12 @@ from typing import Union
 
 from pydantic import validator
 
+from db.message_brokers.broker_factory import message_broker_factory
+from db.message_brokers.delivery_headers import DeliveryHeaders
 from group_handler.models.base_config import BaseConfigModel  # type: ignore
 
 
-class MessageData(BaseConfigModel):
+class MessageData(DeliveryHeaders, BaseConfigModel):
 
     """Данные из очереди."""
 
@@ -51,4 +53,4 @@ class MessageData(BaseConfigModel):
         Returns:
             Вернёт count retry значение.
         """
-        return message['headers']['x-death'][0]['count']
+        return message_broker_factory.get_retry_count(message['headers'])
@@ -1,15 +1,23 @@
 """Модуль содержит класс с интерфейсом для GroupHandler."""
 import logging
+from datetime import datetime, timezone
 from typing import Union, List
 from uuid import UUID, uuid4
 
+from config.settings import config
+from db.cache.dedup_cache import dedup_cache
+from db.message_brokers.abstract_classes import CREATED_AT_HEADER, SOURCE_HEADER
+from db.message_brokers.broker_factory import message_broker_factory
 from group_handler.models.all_data import NotificationData, FinalData
 from group_handler.models.data_single_emails import DataSingleEmails
+from group_handler.models.log import log_names
 from group_handler.services.auth import auth_service
 from group_handler.services.pg import db_service
 
+STAGE = 'group_handler'
 
-class GroupHandler:
+
+class GroupHandler:  # noqa: WPS214
 
     """Класс с интерфейсом для GroupHandler."""
 
@@ -23,8 +31,10 @@ class GroupHandler:
 
         Returns:
             Вернёт пачку данных.
+            Время создания у всех писем рассылки одно — они ложатся в одну секцию single_emails.
         """
         result = NotificationData()
+        created_at = datetime.now(timezone.utc)
         raw_data = await db_service.get_raw_data_by_id(notification_id=notification_id)
 
         if raw_data:
@@ -33,6 +43,7 @@ class GroupHandler:
                 row_single_emails.id = uuid4()
                 row_single_emails.destination_id = user.user_id  # type: ignore
                 row_single_emails.group_id = notification_id  # type: ignore
+                row_single_emails.created_at = created_at
 
                 if raw_data.send_with_gmt:  # В противном случае отправлять немедленно.
                     row_single_emails.delay = self._create_delay(hours=user.hours, minutes=user.minutes)  # type: ignore
@@ -50,9 +61,31 @@ class GroupHandler:
         Returns:
             Вернёт ответ на вопрос удалось ли проставить отметку.
             Если нет — значит кто-то до нас её уже проставил, а значит это сообщение уже не наше дело.
+            Если сообщение есть в кэше обработанных — в БД даже не ходим.
         """
+        if await dedup_cache.is_done(STAGE, notification_id):
+            return False
         return await db_service.mark_as_passed_to_handler(notification_id=notification_id)
 
+    async def mark_done(self, notification_id: Union[UUID, str]) -> None:
+        """
+        Метод запоминает в кэше, что сервис закончил работу с сообщением (успех или окончательный дроп).
+
+        Args:
+            notification_id: id сообщения
+        """
+        await dedup_cache.mark_done(STAGE, notification_id)
+
+    async def expire(self, notification_id: Union[UUID, str]) -> None:
+        """
+        Метод окончательно снимает с обработки рассылку, у которой истёк крайний срок.
+
+        Args:
+            notification_id: id сообщения
+        """
+        await db_service.mark_as_expired(notification_id=notification_id)
+        await dedup_cache.mark_done(STAGE, notification_id)
+
     async def unlock(self, notification_id: Union[UUID, str]) -> None:
         """
         Метод убирает отметку в БД, что сообщение взято в обработку.
@@ -62,14 +95,85 @@ class GroupHandler:
         """
         await db_service.unmark_as_passed_to_handler(notification_id=notification_id)
 
-    async def post_data(self, users: List[dict]) -> None:
+    async def post_data(self, users: List[DataSingleEmails]) -> None:
         """
         Метод записывает данные в SingleEmail.
 
+        Грузим одним бинарным COPY (без INSERT ... VALUES на всех получателей и лимита параметров),
+        а одна операция — одна транзакция: при повторе сообщения (новые id писем) не останется полузаписанной рассылки.
+        Строки для Postgres кодируются по мере отправки, но сам список получателей уже в памяти:
+        Auth отдаёт группу одним ответом, а после записи по нему же публикуются сообщения.
+
         Args:
             users: пачка данных для вставки
         """
-        await db_service.insert_to_single_emails(users)
+        await db_service.copy_to_single_emails(users)
+
+    async def publish(self, users: List[DataSingleEmails], message_headers: dict) -> int:
+        """
+        Метод отправляет сообщения о письмах рассылки в очередь одиночных писем.
+
+        Повторно отправляются только сообщения, которые Rabbit не подтвердил, и не больше publish_attempts раз:
+        повторить рассылку целиком нельзя — get_data выдаст письмам новые id, и в single_emails появятся дубли.
+        Что не подтвердилось и после этого, записывается в outbox — его доставит outbox_relay.
+
+        Args:
+            users: письма рассылки (уже записанные в single_emails)
+            message_headers: общие заголовки сообщений (x-request-id, приоритет, срок)
+
+        Returns:
+            Вернёт кол-во сообщений, отложенных в outbox.
+        """
+        pending = users
+        for _ in range(config.rabbit_mq.publish_attempts):
+            pending = await self._publish_pending(pending, message_headers)
+            if not pending:
+                return 0
+
+        await db_service.copy_to_outbox(
+            pending,
+            [self._get_headers(user, message_headers) for user in pending],
+            queue_name=config.rabbit_mq.queue_raw_single_messages
+        )
+        return len(pending)
+
+    async def _publish_pending(self, users: List[DataSingleEmails], message_headers: dict) -> List[DataSingleEmails]:
+        """
+        Внутренний метод отправляет сообщения о письмах одной пачкой.
+
+        Args:
+            users: письма
+            message_headers: общие заголовки сообщений
+
+        Returns:
+            Вернёт письма, сообщения о которых Rabbit не подтвердил.
+        """
+        try:
+            published = await message_broker_factory.publish_many(
+                messages_body=[str(user.id).encode() for user in users],
+                queue_name=config.rabbit_mq.queue_raw_single_messages,
+                messages_headers=[self._get_headers(user, message_headers) for user in users],
+                delays=[user.delay for user in users],
+                shard_keys=[str(user.destination_id) for user in users]
+            )
+        except Exception as error:
+            logger.warning(log_names.warn.failed_publish, len(users), error)
+            return users
+        return [user for user, is_published in zip(users, published) if not is_published]
+
+    def _get_headers(self, user: DataSingleEmails, message_headers: dict) -> dict:
+        """
+        Внутренний метод собирает заголовки сообщения о письме.
+
+        Args:
+            user: письмо
+            message_headers: общие заголовки сообщений
+
+        Returns:
+            Вернёт общие заголовки вместе с источником и временем создания письма.
+        """
+        created_at = user.created_at.timestamp() if user.created_at else None
+        return {**message_headers, SOURCE_HEADER: user.source, CREATED_AT_HEADER: created_at}
 
     def _create_delay(self, hours: int, minutes: int) -> int:
         """
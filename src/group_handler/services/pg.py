@@ -1,21 +1,101 @@
 """
 Модуль содержит сервис для работы с Postgres.
 Уже высокоуровневая бизнес логика.
+
+Запросы горячего пути собраны один раз (с bindparam) и компилируются при создании сервиса,
+на каждое сообщение остаётся только подставить параметры (см. db/storage/compiled_query.py).
 """
 import logging
+from datetime import datetime, timezone
 from typing import Union, Optional, List
 from uuid import UUID
 
-from sqlalchemy import and_, update, func, select, insert
+import orjson
+from sqlalchemy import bindparam, and_, update, func, select
 
 from db.models.email_group_notifications import GroupEmails
 from db.models.email_single_notifications import SingleEmails
+from db.models.outbox import Outbox
 from db.storage.abstract_classes import AbstractDBClient
 from db.storage.orm_factory import db
+from group_handler.models.data_single_emails import DataSingleEmails
 from group_handler.models.log import log_names
 from group_handler.models.raw_data_db import RawDataDB
 
 
+GET_RAW_DATA_BY_ID = select(
+    GroupEmails.source,
+    GroupEmails.destination_id,
+    GroupEmails.template_id,
+    GroupEmails.subject,
+    GroupEmails.message,
+    GroupEmails.send_with_gmt
+).filter(
+    and_(
+        GroupEmails.deleted_at == None,  # noqa: E711
+        GroupEmails.id == bindparam('notification_id')
+    )
+)
+
+MARK_AS_PASSED_TO_HANDLER = update(
+    GroupEmails
+).filter(
+    and_(
+        GroupEmails.id == bindparam('notification_id'),
+        GroupEmails.passed_to_handler_at == None,  # noqa: E711
+        GroupEmails.deleted_at == None  # noqa: E711
+    )
+).values(
+    passed_to_handler_at=func.now()
+).returning(
+    GroupEmails.id
+)
+
+MARK_AS_EXPIRED = update(
+    GroupEmails
+).filter(
+    and_(
+        GroupEmails.id == bindparam('notification_id'),
+        GroupEmails.passed_to_handler_at == None,  # noqa: E711
+        GroupEmails.deleted_at == None  # noqa: E711
+    )
+).values(
+    expired_at=func.now()
+)
+
+SINGLE_EMAILS_COPY_COLUMNS = (
+    'id',
+    'source',
+    'destination_id',
+    'template_id',
+    'group_id',
+    'subject',
+    'message',
+    'delay',
+    'created_at'
+)
+
+OUTBOX_COPY_COLUMNS = (
+    'queue_name',
+    'message_body',
+    'message_headers',
+    'delay',
+    'shard_key',
+    'created_at'
+)
+
+UNMARK_AS_PASSED_TO_HANDLER = update(
+    GroupEmails
+).filter(
+    and_(
+        GroupEmails.id == bindparam('notification_id'),
+        GroupEmails.deleted_at == None  # noqa: E711
+    )
+).values(
+    passed_to_handler_at=None
+)
+
+
 class DBService:  # noqa: WPS214
 
     """Класс для высокоуровневой работы с PG."""
@@ -28,6 +108,10 @@ class DBService:  # noqa: WPS214
             database: интерфейс для низкоуровневой работы с БД.
         """
         self.db = database
+        self._get_raw_data_by_id = database.prepare(GET_RAW_DATA_BY_ID)
+        self._mark_as_passed_to_handler = database.prepare(MARK_AS_PASSED_TO_HANDLER)
+        self._unmark_as_passed_to_handler = database.prepare(UNMARK_AS_PASSED_TO_HANDLER)
+        self._mark_as_expired = database.prepare(MARK_AS_EXPIRED)
 
     async def get_raw_data_by_id(self, notification_id: Union[UUID, str]) -> Optional[RawDataDB]:
         """
@@ -39,25 +123,12 @@ class DBService:  # noqa: WPS214
         Returns:
             Вернёт pydantic модель RawDataModel.
         """
-        query = select(
-            GroupEmails.source,
-            GroupEmails.destination_id,
-            GroupEmails.template_id,
-            GroupEmails.subject,
-            GroupEmails.message,
-            GroupEmails.send_with_gmt
-        ).filter(
-            and_(
-                GroupEmails.deleted_at == None,  # noqa: E711
-                GroupEmails.id == notification_id
-            )
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute_compiled(self._get_raw_data_by_id, notification_id=notification_id)
 
         if result:
             row, = result
             logger.info(log_names.info.success_get, notification_id, 'single_emails table')
-            return RawDataDB(**row._mapping)  # noqa: WPS437
+            return RawDataDB(**dict(row))
 
         logger.error(log_names.error.failed_get, notification_id, 'single_emails table')
         return None
@@ -87,20 +158,7 @@ class DBService:  # noqa: WPS214
         Returns:
             Вернёт ответ на вопрос была ли запись взята первый раз, или её уже кто-то начал обрабатывать перед нами.
         """
-        query = update(
-            GroupEmails
-        ).filter(
-            and_(
-                GroupEmails.id == notification_id,
-                GroupEmails.passed_to_handler_at == None,  # noqa: E711
-                GroupEmails.deleted_at == None  # noqa: E711
-            )
-        ).values(
-            passed_to_handler_at=func.now()
-        ).returning(
-            GroupEmails.id
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute_compiled(self._mark_as_passed_to_handler, notification_id=notification_id)
 
         if result is not None:  # Если None — метку не удалось поставить, а значит она уже стоит.
             logger.info(log_names.info.accepted, f'message with id {notification_id}')
@@ -114,31 +172,74 @@ class DBService:  # noqa: WPS214
         Args:
             notification_id: id сообщения
         """
-        query = update(
-            GroupEmails
-        ).filter(
-            and_(
-                GroupEmails.id == notification_id,
-                GroupEmails.deleted_at == None  # noqa: E711
+        await self.db.execute_compiled(self._unmark_as_passed_to_handler, notification_id=notification_id)
+
+    async def mark_as_expired(self, notification_id: Union[UUID, str]) -> None:
+        """
+        Метод отмечает в БД, что рассылку не успели начать до крайнего срока.
+
+        Рассылку, которую уже взяли в обработку, не трогаем: её письма созданы и истекают сами.
+
+        Args:
+            notification_id: id сообщения
+        """
+        await self.db.execute_compiled(self._mark_as_expired, notification_id=notification_id)
+
+    async def copy_to_single_emails(self, users: List[DataSingleEmails]) -> int:
+        """
+        Метод загружает пачку данных в single_emails бинарным COPY.
+
+        Строки для COPY собираются лениво, по мере отправки в Postgres.
+        created_at (default на стороне SQLAlchemy) COPY не проставит — его задаёт GroupHandler.get_data,
+        то же время уезжает дальше по конвейеру в заголовке x-created-at.
+
+        Args:
+            users: пачка данных
+
+        Returns:
+            Вернёт кол-во вставленных строк.
+        """
+        records = (
+            (
+                user.id,
+                user.source,
+                user.destination_id,
+                user.template_id,
+                user.group_id,
+                user.subject,
+                orjson.dumps(user.message).decode(),  # asyncpg ждёт jsonb строкой
+                user.delay,
+                user.created_at
             )
-        ).values(
-            passed_to_handler_at=None
+            for user in users
         )
-        await self.db.execute(query)
+        return await self.db.copy_records(SingleEmails.__table__, SINGLE_EMAILS_COPY_COLUMNS, records)
 
-    async def insert_to_single_emails(self, users: List[dict]) -> None:
+    async def copy_to_outbox(self, users: List[DataSingleEmails], messages_headers: List[dict], queue_name: str) -> int:
         """
-        Метод вставляет пачку данных в single_emails.
+        Метод записывает сообщения о письмах в outbox бинарным COPY — в брокер их переложит outbox_relay.
 
         Args:
-            users: пачка данных
+            users: письма
+            messages_headers: заголовки сообщений (по одному на каждое письмо)
+            queue_name: очередь, в которую нужно отправить сообщения
+
+        Returns:
+            Вернёт кол-во вставленных строк.
         """
-        query = insert(
-            SingleEmails
-        ).values(
-            users
+        created_at = datetime.now(timezone.utc)
+        records = (
+            (
+                queue_name,
+                str(user.id).encode(),
+                orjson.dumps(message_headers).decode(),  # asyncpg ждёт jsonb строкой
+                user.delay,
+                str(user.destination_id),
+                created_at
+            )
+            for user, message_headers in zip(users, messages_headers)
         )
-        await self.db.execute(query)
+        return await self.db.copy_records(Outbox.__table__, OUTBOX_COPY_COLUMNS, records)
 
 
 logger = logging.getLogger('group_handler.db_service')
@@ -7,6 +7,7 @@ from sqlalchemy import update, func, and_, select
 from sqlalchemy.dialects.postgresql import insert
 
 from config.settings import config
+from db.message_brokers.abstract_classes import DEADLINE_HEADER
 from db.models.email_group_notifications import GroupEmails
 from notifier_api.models.http_responses import http  # type: ignore
 from notifier_api.models.message_broker_models import MessageBrokerData
@@ -62,8 +63,13 @@ async def new_email(
     message_to_broker = MessageBrokerData(
         message_body=query_data.id,
         queue_name=config.rabbit_mq.queue_raw_group_messages,
-        message_headers={'x-request-id': x_request_id},
-        delay=query_data.delay
+        message_headers={
+            'x-request-id': x_request_id,
+            'priority': group_email.priority,
+            DEADLINE_HEADER: group_email.get_deadline_timestamp()
+        },
+        delay=query_data.delay,
+        shard_key=str(query_data.destination_id)
     )
 
     query_data.msg = await factory.insert(idempotent_query, message_to_broker)
@@ -1,12 +1,17 @@
 """Модуль содержит CRUD для работы с шаблонами email сообщений."""
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, Header
 from fastapi import Response
-from sqlalchemy import update, func, and_, select
+from sqlalchemy import update, func, and_, select, exists, literal
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql.dml import Insert, Update
+from sqlalchemy.sql.selectable import CTE
 
 from config.settings import config
+from db.message_brokers.abstract_classes import CREATED_AT_HEADER, DEADLINE_HEADER, SOURCE_HEADER
+from db.models.delivery_state import DeliveryState
 from db.models.email_single_notifications import SingleEmails
 from notifier_api.models.http_responses import http  # type: ignore
 from notifier_api.models.message_broker_models import MessageBrokerData
@@ -16,6 +21,99 @@ from notifier_api.services.emails_factory import get_emails_factory, EmailsFacto
 from utils.custom_fastapi_router import LoggedRoute
 from utils.dependencies import requests_per_minute
 
+
+def get_not_passed_to_handler(email_id: UUID) -> CTE:
+    """
+    Функция собирает подзапрос: id почты, если её ещё не взяли в обработку.
+
+    Отметка «взято в обработку» живёт в delivery_state (db/models/delivery_state.py)
+    и ставится без UPDATE single_emails.
+    Поэтому сначала блокируем строку single_emails (email_formatter берёт её FOR SHARE),
+    а потом через upsert блокируем строку состояния и проверяем отметку в её последней версии.
+    Так изменение (удаление) почты и взятие её в обработку не могут пройти одновременно.
+
+    Args:
+        email_id: id почты
+
+    Returns:
+        Вернёт CTE с колонкой notification_id (пустой, если почту уже взяли в обработку или удалили).
+    """
+    email = select(
+        SingleEmails.id,
+        SingleEmails.created_at
+    ).filter(
+        and_(
+            SingleEmails.id == email_id,
+            SingleEmails.deleted_at == None  # noqa: E711
+        )
+    ).with_for_update()
+
+    state = insert(DeliveryState).from_select(['notification_id', 'created_at'], email)
+    return state.on_conflict_do_update(
+        index_elements=[DeliveryState.notification_id, DeliveryState.created_at],
+        set_={'notification_id': state.excluded.notification_id},
+        where=DeliveryState.passed_to_handler_at == None  # noqa: E711
+    ).returning(
+        DeliveryState.notification_id,
+        DeliveryState.created_at
+    ).cte('not_passed_to_handler')
+
+
+def get_idempotent_insert(values: dict) -> Insert:
+    """
+    Функция собирает идемпотентную вставку почты.
+
+    single_emails секционирована по created_at, и уникального индекса по одному id у неё нет —
+    ON CONFLICT (id) DO NOTHING невозможен. Вместо него вставляем строку, только если почты с таким id
+    нет среди созданных за последние idempotency_window секунд: проверяются лишь свежие секции.
+    Одновременные запросы с одним ключом упорядочивает advisory lock (см. EmailsFactory.insert).
+
+    Args:
+        values: значения колонок (id — ключ идемпотентности, created_at — время создания)
+
+    Returns:
+        Вернёт INSERT ... SELECT ... WHERE NOT EXISTS с RETURNING created_at (пустой — почта уже есть).
+    """
+    window_start = values['created_at'] - timedelta(seconds=config.partitions.idempotency_window)
+    already_exist = exists().where(
+        and_(
+            SingleEmails.id == values['id'],
+            SingleEmails.created_at >= window_start
+        )
+    )
+    new_values = []
+    for column, column_value in values.items():
+        column_type = SingleEmails.__table__.columns[column].type
+        new_values.append(literal(column_value, column_type).label(column))
+    new_email = select(*new_values).where(~already_exist)
+
+    return insert(SingleEmails).from_select(list(values), new_email).returning(SingleEmails.created_at)
+
+
+def get_delete_email(email_id: UUID) -> Update:
+    """
+    Функция собирает удаление почты, которую ещё не взяли в обработку.
+
+    Args:
+        email_id: id почты
+
+    Returns:
+        Вернёт UPDATE с RETURNING deleted_at (пустой — почту уже взяли в обработку или удалили).
+    """
+    not_passed_to_handler = get_not_passed_to_handler(email_id)
+
+    query = update(SingleEmails)
+    query = query.returning(SingleEmails.deleted_at)
+    query = query.filter(
+        and_(
+            SingleEmails.id == not_passed_to_handler.c.notification_id,
+            SingleEmails.created_at == not_passed_to_handler.c.created_at,
+            SingleEmails.deleted_at == None  # noqa: E711
+        )
+    )
+    return query.values(deleted_at=func.now())
+
+
 router = APIRouter(
     prefix='/single_emails',
     route_class=LoggedRoute,
@@ -52,19 +150,26 @@ async def new_email(
     query_data = SingleEmailsQuery(**single_email.dict())
     query_data.id = idempotency_key
 
-    query = insert(SingleEmails)
-    query = query.returning(SingleEmails.created_at)
-    query = query.values(**query_data.dict(exclude={'msg', 'emails_selected'}))
-    idempotent_query = query.on_conflict_do_nothing(index_elements=['id'])
+    created_at = datetime.now(timezone.utc)
+    idempotent_query = get_idempotent_insert(
+        {**query_data.dict(exclude={'msg', 'emails_selected'}), 'created_at': created_at}
+    )
 
     message_to_broker = MessageBrokerData(
         message_body=query_data.id,
         queue_name=config.rabbit_mq.queue_raw_single_messages,
-        message_headers={'x-request-id': x_request_id},
-        delay=query_data.delay
+        message_headers={
+            'x-request-id': x_request_id,
+            'priority': single_email.priority,
+            DEADLINE_HEADER: single_email.get_deadline_timestamp(),
+            CREATED_AT_HEADER: created_at.timestamp(),
+            SOURCE_HEADER: single_email.source
+        },
+        delay=query_data.delay,
+        shard_key=str(query_data.destination_id)
     )
 
-    query_data.msg = await factory.insert(idempotent_query, message_to_broker)
+    query_data.msg = await factory.insert(idempotent_query, message_to_broker, lock_key=str(idempotency_key))
 
     return query_data
 
@@ -96,13 +201,15 @@ async def update_email(
     """
     query_data = SingleEmailsQuery(**single_email.dict())
 
+    not_passed_to_handler = get_not_passed_to_handler(single_email.id)
+
     query = update(SingleEmails)
     query = query.returning(SingleEmails.created_at)
     query = query.filter(
         and_(
-            SingleEmails.id == query_data.id,
-            SingleEmails.deleted_at == None,  # noqa: E711
-            SingleEmails.passed_to_handler_at == None  # noqa: E711
+            SingleEmails.id == not_passed_to_handler.c.notification_id,
+            SingleEmails.created_at == not_passed_to_handler.c.created_at,
+            SingleEmails.deleted_at == None  # noqa: E711
         )
     )
     query = query.values(**query_data.dict(exclude={'msg', 'emails_selected', 'id'}))
@@ -138,19 +245,7 @@ async def delete_email(
         Сообщение об удалении или об ошибке.
     """
     query_data = SingleEmailsQuery(id=email_id)
-
-    query = update(SingleEmails)
-    query = query.returning(SingleEmails.deleted_at)
-    query = query.filter(
-        and_(
-            SingleEmails.id == query_data.id,
-            SingleEmails.deleted_at == None,  # noqa: E711
-            SingleEmails.passed_to_handler_at == None  # noqa: E711
-        )
-    )
-    query = query.values(deleted_at=func.now())
-
-    query_data.msg = await factory.delete(query, response)
+    query_data.msg = await factory.delete(get_delete_email(email_id), response)
 
     return query_data
 
@@ -15,6 +15,7 @@ class MessageBrokerData(BaseOrjson):
     queue_name: str
     message_headers: Optional[Dict]
     delay: Union[int, float] = 0
+    shard_key: Optional[str] = None
 
     class Config:
 
@@ -1,6 +1,6 @@
 """Модуль содержит pydantic модели входящих данных ручки /single_emails."""
-from datetime import datetime
-from typing import Optional, Union, List, Dict
+from datetime import datetime, timezone
+from typing import Optional, Union, List, Dict, Literal
 from uuid import UUID
 
 import orjson
@@ -18,6 +18,34 @@ class SingleEmailsRequest(BaseOrjson):
     subject: str
     message: Dict
     delay: int
+    priority: Literal['high', 'normal'] = 'normal'  # high — срочные письма (сброс пароля и т.п.) в обход рассылок
+    deadline: Optional[datetime] = None  # После этого момента письмо уже не нужно — его не отправят
+
+    @validator('deadline')
+    def deadline_to_aware(cls, deadline: Optional[datetime]) -> Optional[datetime]:  # noqa: N805
+        """
+        Метод считает крайний срок без часового пояса временем UTC.
+
+        Иначе timestamp() понял бы его как местное время сервера API.
+
+        Args:
+            deadline: крайний срок доставки
+
+        Returns:
+            Вернёт время с часовым поясом (или None, если срок не задан).
+        """
+        if deadline is None or deadline.tzinfo is not None:
+            return deadline
+        return deadline.replace(tzinfo=timezone.utc)
+
+    def get_deadline_timestamp(self) -> Optional[float]:
+        """
+        Метод переводит крайний срок в unix timestamp (в таком виде он едет в заголовке x-deadline).
+
+        Returns:
+            Вернёт timestamp или None, если срок не задан.
+        """
+        return self.deadline.timestamp() if self.deadline else None
 
 
 class SingleEmailsRequestUpdate(BaseOrjson):
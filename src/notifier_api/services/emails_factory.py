@@ -1,34 +1,55 @@
-"""Модуль содержит класс с интерфейсом для работы с Emails."""
-from typing import Union, Optional, Callable
-
-from fastapi import HTTPException, Depends, Response
+"""
+Модуль содержит класс с интерфейсом для работы с Emails.
+
+GET ручки читают с реплики, а она отстаёт от primary. Чтобы клиент сразу видел то, что сам записал
+(read-your-writes), успешная запись отдаёт ему время записи — в заголовке X-Last-Write-At и в cookie last_write_at.
+Пока с этого момента не прошло read_your_writes_window секунд, запросы с этим заголовком (или cookie)
+читают с primary; остальные клиенты продолжают читать с реплики.
+Время — unix timestamp часов экземпляра API: часы экземпляров синхронизированы (NTP) куда точнее окна.
+"""
+import math
+import time
+from typing import Union, Optional, Callable, List
+
+from databases.interfaces import Record
+from fastapi import Cookie, HTTPException, Depends, Header, Response
+from sqlalchemy import func, insert, select
 from sqlalchemy.sql import Select, Update, Insert
 
-from db.message_brokers.rabbit_message_broker import message_broker_factory
+from config.settings import config
+from db.models.outbox import Outbox
 from db.storage.abstract_classes import AbstractDBClient
 from db.storage.orm_factory import AsyncPGClient, get_db
 from notifier_api.models.http_responses import http  # type: ignore
 from notifier_api.models.message_broker_models import MessageBrokerData
 from utils.custom_exceptions import DataBaseError
 
+LAST_WRITE_HEADER = 'X-Last-Write-At'
+LAST_WRITE_COOKIE = 'last_write_at'
+
 
-class EmailsFactory:
+class EmailsFactory:  # noqa: WPS214
 
     """Класс с интерфейсом для работы с Emails."""
 
-    def __init__(self, orm: AbstractDBClient) -> None:
+    def __init__(self, orm: AbstractDBClient, response: Response, last_write_at: Optional[float] = None) -> None:
         """
         Конструктор.
 
         Args:
             orm: класс для низкоуровневой работой с БД
+            response: ответ (в него пишется время записи клиента)
+            last_write_at: когда клиент последний раз писал (unix timestamp, None — неизвестно)
         """
         self.orm = orm
+        self.response = response
+        self.last_write_at = last_write_at
 
     async def insert(
         self,
         query: Union[Update, Select, Insert],
-        message_to_broker: Optional[MessageBrokerData] = None
+        message_to_broker: Optional[MessageBrokerData] = None,
+        lock_key: Optional[str] = None
     ) -> str:
         """
         Метод выполняет insert.
@@ -36,13 +57,15 @@ class EmailsFactory:
         Args:
             query: запрос
             message_to_broker: сообщение для брокера
+            lock_key: ключ идемпотентности — запросы с одним ключом выполняются по очереди
 
         Returns:
             Вернёт сообщение для API.
         """
-        result = await self._execute(query, message_to_broker)
+        result = await self._execute(query, message_to_broker, lock_key)
 
         if result:
+            self._remember_write()
             return f'Created at {result}'
         return 'Already exist'
 
@@ -60,6 +83,7 @@ class EmailsFactory:
         result = await self._execute(query)
 
         if result:
+            self._remember_write()
             return f'Updated at {result}'
         response.status_code = http.not_found.code
         return 'Not found'
@@ -78,24 +102,44 @@ class EmailsFactory:
         result = await self._execute(query)
 
         if result:
+            self._remember_write()
             return f'Deleted at {result}'
         response.status_code = http.not_found.code
         return 'Not found'
 
-    async def select(self, query: Select, response: Response, selected_model: Callable) -> tuple:
+    async def select(
+        self,
+        query: Select,
+        response: Response,
+        selected_model: Callable,
+        from_replica: bool = True
+    ) -> tuple:
         """
         Метод выполняет select.
 
+        По умолчанию читает с реплики, но с primary — если клиент писал меньше read_your_writes_window секунд назад.
+
         Args:
             query: запрос
             response: ответ
             selected_model: pydantic модель
+            from_replica: читать с реплики (False — всегда с primary)
 
         Returns:
             Вернёт сообщение для API и данные.
+
+        Raises:
+            HTTPException: если прочитать из БД не удалось
         """
         selected_data = []
-        result = await self._execute(query)
+        result: Optional[List[Record]]
+        if from_replica and not self._is_recently_written():
+            try:
+                result = await self.orm.execute_read(query)
+            except DataBaseError as error:
+                raise HTTPException(status_code=http.backoff_error.code, detail=error.message)
+        else:
+            result = await self._execute(query)
 
         if result:
             for row in result:
@@ -105,51 +149,91 @@ class EmailsFactory:
         response.status_code = http.not_found.code
         return 'Not found', selected_data
 
-    async def _execute(  # noqa: WPS231
+    async def _execute(
         self,
         query: Union[Update, Select, Insert],
-        message_to_broker: Optional[MessageBrokerData] = None
+        message_to_broker: Optional[MessageBrokerData] = None,
+        lock_key: Optional[str] = None
     ) -> Optional[list]:
         """
         Метод выполняет запрос.
 
+        Если есть сообщение для брокера — оно записывается в outbox в той же транзакции, что и сам запрос.
+        В брокер его переложит outbox_relay, так что API от брокера никак не зависит.
+
+        Если передан lock_key — перед запросом в той же транзакции берётся advisory lock по ключу.
+        Второй запрос с тем же ключом ждёт, пока первый закоммитится, и его запрос (уже с новым снимком)
+        видит вставленную первым строку: проверка «такой почты ещё нет» не гоняется (см. get_idempotent_insert).
+
         Args:
             query: запрос
             message_to_broker: сообщение для брокера
+            lock_key: ключ advisory lock
 
         Returns:
             Вернёт результат запроса.
 
         Raises:
-            HTTPException: если что-то пошло не так и в брокер записать не удалось
+            HTTPException: если что-то пошло не так и в БД записать не удалось
         """
         try:
-            result_db = await self.orm.execute(query)
-            if result_db and message_to_broker:
-                if not await message_broker_factory.publish(**message_to_broker.dict()):
-                    raise DataBaseError(
-                        db_name='message_broker',
-                        message='Message not published',
-                        error_type='Broker did not receive Basic.Ack',
-                        critical=True
-                    )
+            if message_to_broker is None and lock_key is None:
+                return await self.orm.execute(query)
+
+            async with self.orm.transaction():
+                if lock_key is not None:
+                    await self.orm.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(lock_key, 0))))
+                result_db = await self.orm.execute(query)
+                if result_db and message_to_broker is not None:  # Повтор (Already exist) в outbox не попадёт.
+                    await self.orm.execute(insert(Outbox).values(**message_to_broker.dict()))
 
         except DataBaseError as error:
             raise HTTPException(status_code=http.backoff_error.code, detail=error.message)
 
         return result_db
 
+    def _remember_write(self) -> None:
+        """Внутренний метод отдаёт клиенту время его записи (заголовок и cookie живут read_your_writes_window)."""
+        written_at = str(time.time())
+        self.response.headers[LAST_WRITE_HEADER] = written_at
+        self.response.set_cookie(
+            LAST_WRITE_COOKIE,
+            written_at,
+            max_age=math.ceil(config.pg.read_your_writes_window),
+            httponly=True
+        )
+
+    def _is_recently_written(self) -> bool:
+        """
+        Внутренний метод проверяет, писал ли клиент меньше read_your_writes_window секунд назад.
+
+        Returns:
+            Вернёт True, если читать нужно с primary.
+        """
+        if self.last_write_at is None:
+            return False
+        return time.time() - self.last_write_at < config.pg.read_your_writes_window
+
 
-async def get_emails_factory(database: AsyncPGClient = Depends(get_db)) -> EmailsFactory:
+async def get_emails_factory(
+    response: Response,
+    database: AsyncPGClient = Depends(get_db),
+    x_last_write_at: Optional[float] = Header(None, description='Value of X-Last-Write-At from the last write'),
+    last_write_at: Optional[float] = Cookie(None),
+) -> EmailsFactory:
 
     """
     Метод создаёт EmailsFactory.
 
     Args:
+        response: ответ
         database: клиент для работы с БД
+        x_last_write_at: время последней записи клиента из заголовка
+        last_write_at: время последней записи клиента из cookie
 
     Returns:
         Вернёт pydantic модель EmailsFactory.
     """
 
-    return EmailsFactory(orm=database)
+    client_written_at = x_last_write_at if x_last_write_at is not None else last_write_at
+    return EmailsFactory(orm=database, response=response, last_write_at=client_written_at)
@@ -0,0 +1,62 @@
+"""
+Модуль содержит основную логику работы сервиса.
+Стоит пояснить что вообще делает outbox_relay:
+
+API не публикует сообщения в брокер сам, а записывает их в таблицу outbox
+в той же транзакции, что и email (transactional outbox).
+Задача outbox_relay — пачками перекладывать сообщения из outbox в брокер и удалять отправленные.
+Экземпляров может быть несколько: строки блокируются через SKIP LOCKED.
+"""
+import asyncio
+import logging
+import signal
+from logging import config as logging_config
+
+from config.logging_settings import LOGGING
+from db.message_brokers.broker_factory import message_broker_factory
+from db.storage import orm_factory
+from outbox_relay.models.log import log_names
+from outbox_relay.services.outbox_relay import outbox_relay_service
+
+
+async def startup(stopping: asyncio.Event) -> None:
+
+    """
+    Функция для действий во время старта приложения.
+
+    Args:
+        stopping: событие, которое выставится по SIGTERM
+    """
+
+    await message_broker_factory.start()
+    await message_broker_factory.idempotency_startup()
+    await orm_factory.db.start()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    logger.info(log_names.info.started, 'outbox relay')
+
+
+async def shutdown() -> None:
+
+    """Функция для действий во время завершения работы приложения."""
+
+    await message_broker_factory.stop()
+    await orm_factory.db.stop()
+
+
+async def main() -> None:
+
+    """Функция, запускающая всё приложение."""
+
+    stopping = asyncio.Event()
+    await startup(stopping)
+
+    await outbox_relay_service.run(stopping)
+    await shutdown()
+
+
+logging_config.dictConfig(LOGGING)
+logger = logging.getLogger('outbox_relay')
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
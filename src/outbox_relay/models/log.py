@@ -0,0 +1,36 @@
+"""Модуль содержит содержимое для логгеров в виде pydantic моделей."""
+from notifier_api.models.base_orjson import BaseOrjson  # type: ignore
+
+
+class LogError(BaseOrjson):
+
+    """Критические ошибки."""
+
+    failed_relay: str = 'Failed relay outbox batch due to %s'
+
+
+class LogInfo(BaseOrjson):
+
+    """Уведомления."""
+
+    started: str = 'Started %s'
+    relayed: str = 'Relayed %s of %s messages from outbox'
+
+
+class LogWarning(BaseOrjson):
+
+    """Предостережения."""
+
+    not_confirmed: str = 'Broker did not confirm %s messages to %s, they will be relayed again'
+
+
+class LogNames(BaseOrjson):
+
+    """Все существующие названия вместе."""
+
+    error: LogError = LogError()
+    warn: LogWarning = LogWarning()
+    info: LogInfo = LogInfo()
+
+
+log_names = LogNames()
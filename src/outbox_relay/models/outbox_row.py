@@ -0,0 +1,46 @@
+"""Модуль содержит pydantic модель строки из таблицы outbox."""
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+import orjson
+from pydantic import validator
+
+from outbox_relay.models.base_config import BaseConfigModel  # type: ignore
+
+
+class OutboxRow(BaseConfigModel):
+
+    """Сообщение, ожидающее отправки в брокер."""
+
+    id: int
+    queue_name: str
+    message_body: bytes
+    message_headers: Optional[Union[dict, str]]
+    delay: float
+    shard_key: Optional[str]
+    created_at: datetime
+
+    @validator('message_headers')
+    def json_to_dict(cls, message_headers: Optional[str]) -> Optional[dict]:
+        """
+        Метод преобразует JSON в dict.
+
+        Args:
+            message_headers: JSON с заголовками
+
+        Returns:
+            Вернёт словарь.
+        """
+        if message_headers is None:
+            return None
+        return orjson.loads(message_headers)
+
+    def remaining_delay(self) -> float:
+        """
+        Метод считает, сколько ещё осталось ждать сообщению (часть задержки оно уже провело в outbox).
+
+        Returns:
+            Вернёт задержку в секундах.
+        """
+        waited = (datetime.now(timezone.utc) - self.created_at).total_seconds()
+        return max(self.delay - waited, 0)
@@ -0,0 +1,116 @@
+"""Модуль содержит класс с интерфейсом для OutboxRelay."""
+import asyncio
+import logging
+from contextlib import suppress
+from itertools import takewhile
+from typing import Dict, List
+
+from config.settings import config
+from db.message_brokers.broker_factory import message_broker_factory
+from outbox_relay.models.log import log_names
+from outbox_relay.models.outbox_row import OutboxRow
+from outbox_relay.services.pg import db_service
+
+
+class OutboxRelay:
+
+    """Класс перекладывает сообщения из outbox в брокер."""
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        """
+        Метод перекладывает сообщения, пока не выставят stopping.
+
+        Args:
+            stopping: событие остановки (например, по SIGTERM)
+        """
+        while not stopping.is_set():
+            try:
+                relayed = await self.relay_batch()
+            except Exception as error:
+                logger.error(log_names.error.failed_relay, error)
+                relayed = 0
+
+            if relayed < config.outbox.batch_size:
+                # Outbox опустел, брокер подтвердил не всё (или что-то сломалось) — ждём,
+                # но при остановке просыпаемся сразу.
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(stopping.wait(), timeout=config.outbox.poll_interval)
+
+    async def relay_batch(self) -> int:
+        """
+        Метод перекладывает одну пачку сообщений из outbox в брокер.
+
+        Блокировка строк, публикация и удаление подтверждённых сообщений происходят в одной транзакции.
+        Если что-то упадёт после публикации, но до commit — сообщения отправятся ещё раз (at-least-once),
+        с дублями справляются блокировки в обработчиках.
+        Если упадёт запрос к БД — транзакция откатится целиком (внутри неё запросы не повторяются,
+        см. orm_factory.py), и run повторит пачку уже в новой транзакции.
+
+        Returns:
+            Вернёт кол-во подтверждённых брокером (и удалённых из outbox) сообщений.
+            Если брокер отверг пачку, run не должен сразу брать её снова.
+        """
+        async with db_service.db.transaction():
+            rows = await db_service.lock_batch(limit=config.outbox.batch_size)
+            if not rows:
+                return 0
+
+            published_ids = await self._publish(rows)
+            if published_ids:
+                await db_service.delete_by_ids(published_ids)
+
+        logger.info(log_names.info.relayed, len(published_ids), len(rows))
+        return len(published_ids)
+
+    async def _publish(self, rows: List[OutboxRow]) -> List[int]:
+        """
+        Внутренний метод публикует сообщения в брокер, по пачке на каждую очередь.
+
+        Порядок внутри очереди сохраняется: если брокер не подтвердил сообщение,
+        то и все следующие за ним в эту очередь останутся в outbox до следующей попытки.
+
+        Args:
+            rows: сообщения из outbox
+
+        Returns:
+            Вернёт id сообщений, которые можно удалить из outbox.
+        """
+        rows_by_queue: Dict[str, List[OutboxRow]] = {}
+        for outbox_row in rows:
+            rows_by_queue.setdefault(outbox_row.queue_name, []).append(outbox_row)
+
+        published_ids = []
+        for queue_name, queue_rows in rows_by_queue.items():
+            published = await message_broker_factory.publish_many(
+                messages_body=[row.message_body for row in queue_rows],
+                queue_name=queue_name,
+                messages_headers=[row.message_headers for row in queue_rows],  # type: ignore
+                delays=[row.remaining_delay() for row in queue_rows],
+                shard_keys=[row.shard_key for row in queue_rows],
+                spill=False  # Удаляем из outbox только подтверждённое Rabbit: журнал не fsync-ится.
+            )
+            confirmed = self._get_confirmed_prefix(queue_rows, published)
+            published_ids.extend(confirmed)
+
+            if len(confirmed) < len(queue_rows):
+                logger.warning(log_names.warn.not_confirmed, len(queue_rows) - len(confirmed), queue_name)
+
+        return published_ids
+
+    def _get_confirmed_prefix(self, rows: List[OutboxRow], published: List[bool]) -> List[int]:
+        """
+        Внутренний метод возвращает id подтверждённых сообщений до первого неподтверждённого.
+
+        Args:
+            rows: сообщения одной очереди
+            published: результаты публикации (по порядку)
+
+        Returns:
+            Вернёт id сообщений.
+        """
+        confirmed = takewhile(lambda pair: pair[1], zip(rows, published))
+        return [outbox_row.id for outbox_row, _ in confirmed]
+
+
+logger = logging.getLogger('outbox_relay')
+outbox_relay_service = OutboxRelay()
@@ -0,0 +1,85 @@
+"""
+Модуль содержит сервис для работы с Postgres.
+Уже высокоуровневая бизнес логика.
+"""
+import logging
+from typing import List
+
+from sqlalchemy import select, delete
+from sqlalchemy.sql import Select
+
+from db.models.outbox import Outbox
+from db.storage.abstract_classes import AbstractDBClient
+from db.storage.orm_factory import db
+from outbox_relay.models.outbox_row import OutboxRow
+
+
+def get_lock_batch(limit: int) -> Select:
+    """
+    Функция собирает запрос, блокирующий самые старые сообщения из outbox.
+
+    Args:
+        limit: сколько сообщений достать
+
+    Returns:
+        Вернёт SELECT ... ORDER BY id LIMIT ... FOR UPDATE SKIP LOCKED.
+    """
+    return select(
+        Outbox.id,
+        Outbox.queue_name,
+        Outbox.message_body,
+        Outbox.message_headers,
+        Outbox.delay,
+        Outbox.shard_key,
+        Outbox.created_at
+    ).order_by(
+        Outbox.id
+    ).limit(
+        limit
+    ).with_for_update(
+        skip_locked=True
+    )
+
+
+class DBService:
+
+    """Класс для высокоуровневой работы с PG."""
+
+    def __init__(self, database: AbstractDBClient) -> None:
+        """
+        Конструктор.
+
+        Args:
+            database: интерфейс для низкоуровневой работы с БД.
+        """
+        self.db = database
+
+    async def lock_batch(self, limit: int) -> List[OutboxRow]:
+        """
+        Метод достаёт и блокирует (до конца транзакции) самые старые сообщения из outbox.
+
+        Строки, заблокированные другим экземпляром outbox_relay, пропускаются (SKIP LOCKED),
+        поэтому несколько экземпляров не отправят одно и то же сообщение одновременно.
+
+        Args:
+            limit: сколько сообщений достать
+
+        Returns:
+            Вернёт сообщения в порядке их записи.
+        """
+        result = await self.db.execute(get_lock_batch(limit))
+        return [OutboxRow(**row._mapping) for row in result or []]  # noqa: WPS437
+
+    async def delete_by_ids(self, outbox_ids: List[int]) -> None:
+        """
+        Метод удаляет из outbox сообщения, которые брокер подтвердил.
+
+        Args:
+            outbox_ids: id сообщений
+        """
+        query = delete(Outbox).filter(Outbox.id.in_(outbox_ids))
+        await self.db.execute(query)
+
+
+logger = logging.getLogger('outbox_relay.db_service')
+db_service = DBService(database=db)
@@ -0,0 +1,93 @@
+"""
+Модуль содержит CLI для возврата запаркованных сообщений в конвейер.
+
+Обработчики паркуют в таблицу parked_messages сообщения, исчерпавшие max_retry_count (см. db/parking).
+После аварии (SMTP, Auth) их можно вернуть пачками и с ограничением скорости,
+отфильтровав по этапу, источнику, времени парковки или тексту ошибки.
+Сообщения возвращаются через outbox, так что outbox_relay должен работать.
+
+Запуск (из директории src, Postgres и Vault должны быть доступны):
+python -m parking_replay.main --stage email_sender --since 2026-10-18T10:00 --error timeout --rate 50
+python -m parking_replay.main --stage email_sender --dry-run
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from logging import config as logging_config
+
+from config.logging_settings import LOGGING
+from db.storage import orm_factory
+from parking_replay.models.log import log_names
+from parking_replay.models.replay_filter import ReplayFilter
+from parking_replay.services.parking_replay import parking_replay_service
+
+
+def positive_rate(rate: str) -> float:
+    """
+    Функция проверяет аргумент --rate.
+
+    Args:
+        rate: сколько сообщений в секунду возвращать
+
+    Returns:
+        Вернёт rate числом.
+
+    Raises:
+        ArgumentTypeError: если rate не больше нуля
+    """
+    parsed_rate = float(rate)
+    if parsed_rate <= 0:
+        raise argparse.ArgumentTypeError(f'rate must be greater than 0, got {rate}')
+    return parsed_rate
+
+
+async def main(args: argparse.Namespace) -> None:
+
+    """
+    Функция, запускающая всё приложение.
+
+    Args:
+        args: аргументы командной строки
+    """
+
+    replay_filter = ReplayFilter(
+        stage=args.stage,
+        source=args.source,
+        since=args.since,
+        until=args.until,
+        error=args.error
+    )
+    await orm_factory.db.start()
+    logger.info(log_names.info.started, 'parking replay')
+    try:
+        if args.dry_run:
+            for stage, parked in (await parking_replay_service.count(replay_filter)).items():
+                print(f'{stage}: {parked}')  # noqa: WPS421
+            return
+
+        await parking_replay_service.replay(
+            replay_filter,
+            rate=args.rate,
+            batch_size=args.batch_size,
+            limit=args.limit
+        )
+    finally:
+        await orm_factory.db.stop()
+
+
+logging_config.dictConfig(LOGGING)
+logger = logging.getLogger('parking_replay')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay parked messages')
+    parser.add_argument('--stage', help='email_formatter, email_sender или group_handler')
+    parser.add_argument('--source', help='источник (source) уведомления')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='запаркованы не раньше (ISO 8601)')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='запаркованы раньше (ISO 8601)')
+    parser.add_argument('--error', help='подстрока последней ошибки')
+    parser.add_argument('--rate', type=positive_rate, default=100, help='сообщений в секунду (больше 0)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--limit', type=int, help='сколько сообщений вернуть всего')
+    parser.add_argument('--dry-run', action='store_true', help='только посчитать')
+    asyncio.run(main(parser.parse_args()))
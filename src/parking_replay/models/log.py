@@ -0,0 +1,29 @@
+"""Модуль содержит содержимое для логгеров в виде pydantic моделей."""
+from notifier_api.models.base_orjson import BaseOrjson  # type: ignore
+
+
+class LogError(BaseOrjson):
+
+    """Критические ошибки."""
+
+    failed_replay: str = 'Failed replay parked batch due to %s'
+
+
+class LogInfo(BaseOrjson):
+
+    """Уведомления."""
+
+    started: str = 'Started %s'
+    replayed: str = 'Replayed %s parked messages (%s total)'
+    finished: str = 'Finished: replayed %s parked messages'
+
+
+class LogNames(BaseOrjson):
+
+    """Все существующие названия вместе."""
+
+    error: LogError = LogError()
+    info: LogInfo = LogInfo()
+
+
+log_names = LogNames()
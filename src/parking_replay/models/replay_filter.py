@@ -0,0 +1,16 @@
+"""Модуль содержит pydantic модель фильтра запаркованных сообщений."""
+from datetime import datetime
+from typing import Optional
+
+from parking_replay.models.base_config import BaseConfigModel  # type: ignore
+
+
+class ReplayFilter(BaseConfigModel):
+
+    """Какие запаркованные сообщения вернуть в конвейер (пустое поле — без ограничения)."""
+
+    stage: Optional[str]
+    source: Optional[str]
+    since: Optional[datetime]
+    until: Optional[datetime]
+    error: Optional[str]  # Подстрока последней ошибки (без учёта регистра)
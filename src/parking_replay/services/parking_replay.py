@@ -0,0 +1,75 @@
+"""Модуль содержит класс с интерфейсом для ParkingReplay."""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from db.storage.orm_factory import db
+from parking_replay.models.log import log_names
+from parking_replay.models.replay_filter import ReplayFilter
+from parking_replay.services.pg import db_service
+
+
+class ParkingReplay:
+
+    """Класс возвращает запаркованные сообщения в конвейер с ограничением скорости."""
+
+    async def count(self, replay_filter: ReplayFilter) -> Dict[str, int]:
+        """
+        Метод считает, сколько сообщений вернёт replay с таким фильтром.
+
+        Args:
+            replay_filter: фильтр
+
+        Returns:
+            Вернёт словарь этап — кол-во сообщений.
+        """
+        return await db_service.count_by_stage(replay_filter)
+
+    async def replay(
+        self,
+        replay_filter: ReplayFilter,
+        rate: float,
+        batch_size: int,
+        limit: Optional[int] = None
+    ) -> int:
+        """
+        Метод пачками перекладывает подходящие сообщения из парковки в outbox.
+
+        Каждая пачка — одна транзакция: блокировка строк (SKIP LOCKED), копирование в outbox и отметка replayed_at.
+        Между пачками ждём столько, чтобы в outbox попадало не больше rate сообщений в секунду —
+        иначе после аварии вернувшийся вал снова положил бы SMTP или Auth.
+
+        Args:
+            replay_filter: фильтр
+            rate: сколько сообщений в секунду возвращать
+            batch_size: размер пачки
+            limit: сколько сообщений вернуть всего (None — все подходящие)
+
+        Returns:
+            Вернёт кол-во возвращённых сообщений.
+        """
+        replayed = 0
+        while limit is None or replayed < limit:
+            started_at = time.monotonic()
+            batch_limit = batch_size if limit is None else min(batch_size, limit - replayed)
+
+            async with db.transaction():
+                parked_ids = await db_service.lock_batch(replay_filter, limit=batch_limit)
+                if parked_ids:
+                    await db_service.move_to_outbox(parked_ids)
+
+            if not parked_ids:
+                break
+
+            replayed += len(parked_ids)
+            logger.info(log_names.info.replayed, len(parked_ids), replayed)
+            elapsed = time.monotonic() - started_at
+            await asyncio.sleep(max(len(parked_ids) / rate - elapsed, 0))
+
+        logger.info(log_names.info.finished, replayed)
+        return replayed
+
+
+logger = logging.getLogger('parking_replay')
+parking_replay_service = ParkingReplay()
@@ -0,0 +1,144 @@
+"""
+Модуль содержит сервис для работы с Postgres.
+Уже высокоуровневая бизнес логика.
+"""
+import logging
+from typing import Dict, List
+
+from sqlalchemy import and_, cast, func, insert, literal, select, update, Text
+from sqlalchemy.sql.elements import BooleanClauseList
+
+from db.models.outbox import Outbox
+from db.models.parked_messages import ParkedMessages
+from db.storage.abstract_classes import AbstractDBClient
+from db.storage.orm_factory import db
+from parking_replay.models.replay_filter import ReplayFilter
+
+# Счётчики попыток и последняя ошибка — от прошлой жизни сообщения, после возврата попытки начинаются заново.
+RESET_HEADERS = ('retry-count', 'retry-tier', 'x-last-error')
+
+
+class DBService:
+
+    """Класс для высокоуровневой работы с PG."""
+
+    def __init__(self, database: AbstractDBClient) -> None:
+        """
+        Конструктор.
+
+        Args:
+            database: интерфейс для низкоуровневой работы с БД.
+        """
+        self.db = database
+
+    async def count_by_stage(self, replay_filter: ReplayFilter) -> Dict[str, int]:
+        """
+        Метод считает, сколько не возвращённых сообщений подходит под фильтр.
+
+        Args:
+            replay_filter: фильтр
+
+        Returns:
+            Вернёт словарь этап — кол-во сообщений.
+        """
+        query = select(
+            ParkedMessages.stage,
+            func.count(ParkedMessages.id).label('parked')
+        ).filter(
+            self._get_condition(replay_filter)
+        ).group_by(
+            ParkedMessages.stage
+        )
+        result = await self.db.execute(query)
+        return {row.stage: row.parked for row in result or []}
+
+    async def lock_batch(self, replay_filter: ReplayFilter, limit: int) -> List[int]:
+        """
+        Метод достаёт и блокирует (до конца транзакции) самые старые подходящие сообщения.
+
+        Args:
+            replay_filter: фильтр
+            limit: сколько сообщений достать
+
+        Returns:
+            Вернёт id сообщений.
+        """
+        query = select(
+            ParkedMessages.id
+        ).filter(
+            self._get_condition(replay_filter)
+        ).order_by(
+            ParkedMessages.id
+        ).limit(
+            limit
+        ).with_for_update(
+            skip_locked=True
+        )
+        result = await self.db.execute(query)
+        return [row.id for row in result or []]
+
+    async def move_to_outbox(self, parked_ids: List[int]) -> None:
+        """
+        Метод копирует сообщения в outbox (оттуда их опубликует outbox_relay) и отмечает их возвращёнными.
+
+        Ключ шарда переносится, чтобы сообщение вернулось в свой шард (порядок писем одного получателя).
+        Задержка — 0: сообщение запарковал обработчик, а значит свою задержку оно уже отождало.
+
+        Args:
+            parked_ids: id сообщений
+        """
+        message_headers = ParkedMessages.message_headers
+        for header in RESET_HEADERS:
+            message_headers = message_headers.op('-')(cast(header, Text))
+
+        query = insert(Outbox).from_select(
+            ['queue_name', 'message_body', 'message_headers', 'shard_key', 'delay'],
+            select(
+                ParkedMessages.queue_name,
+                ParkedMessages.message_body,
+                message_headers,
+                ParkedMessages.shard_key,
+                literal(0)
+            ).filter(
+                ParkedMessages.id.in_(parked_ids)
+            ).order_by(
+                ParkedMessages.id
+            )
+        )
+        await self.db.execute(query)
+
+        query = update(
+            ParkedMessages
+        ).filter(
+            ParkedMessages.id.in_(parked_ids)
+        ).values(
+            replayed_at=func.now()
+        )
+        await self.db.execute(query)
+
+    def _get_condition(self, replay_filter: ReplayFilter) -> BooleanClauseList:
+        """
+        Внутренний метод собирает условие WHERE по фильтру.
+
+        Args:
+            replay_filter: фильтр
+
+        Returns:
+            Вернёт условие.
+        """
+        conditions = [ParkedMessages.replayed_at == None]  # noqa: E711
+        if replay_filter.stage is not None:
+            conditions.append(ParkedMessages.stage == replay_filter.stage)
+        if replay_filter.source is not None:
+            conditions.append(ParkedMessages.source == replay_filter.source)
+        if replay_filter.since is not None:
+            conditions.append(ParkedMessages.parked_at >= replay_filter.since)
+        if replay_filter.until is not None:
+            conditions.append(ParkedMessages.parked_at < replay_filter.until)
+        if replay_filter.error is not None:
+            conditions.append(ParkedMessages.error.ilike(f'%{replay_filter.error}%'))
+        return and_(*conditions)
+
+
+logger = logging.getLogger('parking_replay.db_service')
+db_service = DBService(database=db)
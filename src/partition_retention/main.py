@@ -0,0 +1,58 @@
+"""
+Модуль содержит основную логику работы сервиса.
+Стоит пояснить что вообще делает partition_retention:
+
+single_emails и delivery_state секционированы по времени создания уведомления, по суткам
+(см. db/storage/partitions.py). Задача partition_retention — заранее создавать секции на ahead_days вперёд
+и отцеплять секции старше retention_days: они переезжают в схему архива (archive_schema) или удаляются.
+Так таблицы горячего пути не растут бесконечно, а старые уведомления уходят без массового DELETE.
+"""
+import asyncio
+import logging
+import signal
+from logging import config as logging_config
+
+from config.logging_settings import LOGGING
+from db.storage import orm_factory
+from partition_retention.models.log import log_names
+from partition_retention.services.partition_retention import partition_retention_service
+
+
+async def startup(stopping: asyncio.Event) -> None:
+
+    """
+    Функция для действий во время старта приложения.
+
+    Args:
+        stopping: событие, которое выставится по SIGTERM
+    """
+
+    await orm_factory.db.start()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    logger.info(log_names.info.started, 'partition retention')
+
+
+async def shutdown() -> None:
+
+    """Функция для действий во время завершения работы приложения."""
+
+    await orm_factory.db.stop()
+
+
+async def main() -> None:
+
+    """Функция, запускающая всё приложение."""
+
+    stopping = asyncio.Event()
+    await startup(stopping)
+
+    await partition_retention_service.run(stopping)
+    await shutdown()
+
+
+logging_config.dictConfig(LOGGING)
+logger = logging.getLogger('partition_retention')
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
@@ -0,0 +1,40 @@
+"""Модуль содержит содержимое для логгеров в виде pydantic моделей."""
+from notifier_api.models.base_orjson import BaseOrjson  # type: ignore
+
+
+class LogError(BaseOrjson):
+
+    """Критические ошибки."""
+
+    failed_maintain: str = 'Failed maintain partitions due to %s'
+    few_ahead: str = 'Only %s partitions of %s are created ahead, %s required'
+    rows_in_default: str = 'Rows fell into default partition %s: daily partitions ran out'
+
+
+class LogInfo(BaseOrjson):
+
+    """Уведомления."""
+
+    started: str = 'Started %s'
+    created: str = 'Created partition %s'
+    archived: str = 'Detached partition %s into schema %s'
+    dropped: str = 'Detached and dropped partition %s'
+
+
+class LogWarning(BaseOrjson):
+
+    """Предостережения."""
+
+    failed_detach: str = 'Failed detach partition %s due to %s, will try again later'
+
+
+class LogNames(BaseOrjson):
+
+    """Все существующие названия вместе."""
+
+    error: LogError = LogError()
+    warn: LogWarning = LogWarning()
+    info: LogInfo = LogInfo()
+
+
+log_names = LogNames()
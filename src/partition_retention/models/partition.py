@@ -0,0 +1,12 @@
+"""Модуль содержит pydantic модель секции."""
+from datetime import datetime
+
+from partition_retention.models.base_config import BaseConfigModel  # type: ignore
+
+
+class Partition(BaseConfigModel):
+
+    """Секция секционированной таблицы."""
+
+    name: str
+    upper_bound: datetime  # Верхняя граница (не включительно): в секции created_at < upper_bound
@@ -0,0 +1,138 @@
+"""Модуль содержит класс с интерфейсом для PartitionRetention."""
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime, timezone
+
+from config.settings import config
+from db.storage.partitions import (
+    PARTITIONED_TABLES,
+    PARTITION_INTERVAL,
+    get_default_partition_name,
+    get_legacy_partition_name,
+    get_partition_name,
+    get_partition_start
+)
+from partition_retention.models.log import log_names
+from partition_retention.services.pg import db_service
+
+
+class PartitionRetention:
+
+    """Класс следит за секциями single_emails и delivery_state (см. db/storage/partitions.py)."""
+
+    async def run(self, stopping: asyncio.Event) -> None:
+        """
+        Метод раз в check_interval секунд обслуживает секции, пока не выставят stopping.
+
+        Args:
+            stopping: событие остановки (например, по SIGTERM)
+        """
+        while not stopping.is_set():
+            try:
+                await self.maintain()
+            except Exception as error:
+                logger.error(log_names.error.failed_maintain, error)
+
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stopping.wait(), timeout=config.partitions.check_interval)
+
+    async def maintain(self) -> None:
+        """
+        Метод создаёт секции наперёд, убирает устаревшие и проверяет запас секций.
+
+        Секции наперёд нужны, чтобы вставка не попадала в секцию по умолчанию: та одна на всё время,
+        и запросы горячего пути её не отбрасывают.
+        Устаревшие — те, что целиком старше retention_days: горячий путь их уже не читает.
+        """
+        today = get_partition_start(datetime.now(timezone.utc))
+        for table in PARTITIONED_TABLES:
+            await self.create_ahead(table, today)
+            await self.retire(table, today - config.partitions.retention_days * PARTITION_INTERVAL)
+            await self.check(table, today)
+
+    async def create_ahead(self, table: str, today: datetime) -> None:
+        """
+        Метод создаёт секции до today + ahead_days включительно.
+
+        Секции идут подряд, начиная с верхней границы последней из них. Если сервис стоял и секции кончились,
+        пропущенные дни (но не старше retention_days) тоже получают секции: вставки за эти дни лежат
+        в секции по умолчанию и переедут в них.
+
+        Args:
+            table: секционированная таблица
+            today: начало сегодняшней секции
+        """
+        partitions = await db_service.get_partitions(table)
+        oldest_start = today - config.partitions.retention_days * PARTITION_INTERVAL
+        partition_start = max(partitions[-1].upper_bound, oldest_start) if partitions else today
+        last_start = today + config.partitions.ahead_days * PARTITION_INTERVAL
+
+        while partition_start <= last_start:
+            partition_name = get_partition_name(table, partition_start)
+            await db_service.create_partition(
+                table,
+                partition_name,
+                partition_start,
+                lock_timeout_ms=config.partitions.lock_timeout_ms
+            )
+            logger.info(log_names.info.created, partition_name)
+            partition_start += PARTITION_INTERVAL
+
+    async def retire(self, table: str, cutoff: datetime) -> None:
+        """
+        Метод отцепляет секции, целиком лежащие раньше cutoff, и архивирует (или удаляет) их.
+
+        Если секцию не удалось отцепить (например, не дождались блокировки) — попробуем в следующий раз.
+        Секцию *_legacy (всё, что было до перехода на секции) не трогаем: она не суточная,
+        и её архивирование — разовое решение, а не плановая ротация.
+
+        Args:
+            table: секционированная таблица
+            cutoff: всё, что создано раньше, больше не нужно
+        """
+        archive_schema = config.partitions.archive_schema
+        legacy_name = get_legacy_partition_name(table)
+        outdated = [
+            partition
+            for partition in await db_service.get_partitions(table)
+            if partition.upper_bound <= cutoff and partition.name != legacy_name
+        ]
+        for partition in outdated:
+            try:
+                await db_service.retire_partition(
+                    table,
+                    partition.name,
+                    archive_schema=archive_schema,
+                    lock_timeout_ms=config.partitions.lock_timeout_ms
+                )
+            except Exception as error:
+                logger.warning(log_names.warn.failed_detach, partition.name, error)
+                continue
+
+            if archive_schema:
+                logger.info(log_names.info.archived, partition.name, archive_schema)
+            else:
+                logger.info(log_names.info.dropped, partition.name)
+
+    async def check(self, table: str, today: datetime) -> None:
+        """
+        Метод пишет ошибку в лог, если секций наперёд меньше min_ahead_days или строки попали в секцию по умолчанию.
+
+        Args:
+            table: секционированная таблица
+            today: начало сегодняшней секции
+        """
+        partitions = await db_service.get_partitions(table)
+        covered_until = partitions[-1].upper_bound if partitions else today
+        # Сегодняшняя секция не в счёт: наперёд — только секции начиная с завтрашней.
+        days_ahead = max((covered_until - today) // PARTITION_INTERVAL - 1, 0)
+        if days_ahead < config.partitions.min_ahead_days:
+            logger.error(log_names.error.few_ahead, days_ahead, table, config.partitions.min_ahead_days)
+
+        if await db_service.has_default_rows(table):
+            logger.error(log_names.error.rows_in_default, get_default_partition_name(table))
+
+
+logger = logging.getLogger('partition_retention')
+partition_retention_service = PartitionRetention()
@@ -0,0 +1,170 @@
+"""
+Модуль содержит сервис для работы с Postgres.
+Уже высокоуровневая бизнес логика.
+
+Названия таблиц и секций не приходят извне — их собирает db/storage/partitions.py,
+поэтому DDL собирается строкой (bindparam в DDL Postgres не принимает).
+"""
+import logging
+from datetime import datetime
+from types import MappingProxyType
+from typing import List
+
+from sqlalchemy import Boolean, DateTime, Text, text
+
+from db.models.delivery_state import DELIVERY_STATE_FILLFACTOR
+from db.storage.abstract_classes import AbstractDBClient
+from db.storage.orm_factory import db
+from db.storage.partitions import PARTITION_INTERVAL, PARTITION_SCHEMA, get_default_partition_name
+from partition_retention.models.partition import Partition
+
+# Верхнюю границу секции достаём из её определения: FOR VALUES FROM (...) TO ('2026-10-19 00:00:00+00').
+# У секции по умолчанию определение — DEFAULT, границы нет: в список она не попадает.
+GET_PARTITIONS_SQL = r"""
+SELECT name, upper_bound
+FROM (
+    SELECT
+        child.relname AS name,
+        (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'TO \(''(.*)''\)'))[1]::timestamptz AS upper_bound
+    FROM pg_inherits
+    JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = to_regclass(:parent)
+) AS partitions
+WHERE upper_bound IS NOT NULL
+ORDER BY upper_bound
+"""
+GET_PARTITIONS = text(GET_PARTITIONS_SQL).columns(name=Text, upper_bound=DateTime(timezone=True))
+
+# Секция создаётся отдельной таблицей и прицепляется после того, как в неё переехали строки из секции по умолчанию:
+# CREATE TABLE ... PARTITION OF упал бы, найдя там строки из её диапазона.
+CREATE_DETACHED_PARTITION = """
+CREATE TABLE {schema}.{partition} (LIKE {schema}.{table} INCLUDING DEFAULTS){storage}
+"""
+MOVE_FROM_DEFAULT = """
+WITH moved AS (
+    DELETE FROM {schema}.{default} WHERE created_at >= '{start}' AND created_at < '{end}' RETURNING *
+)
+INSERT INTO {schema}.{partition} SELECT * FROM moved
+"""
+ATTACH_PARTITION = """
+ALTER TABLE {schema}.{table} ATTACH PARTITION {schema}.{partition} FOR VALUES FROM ('{start}') TO ('{end}')
+"""
+
+HAS_DEFAULT_ROWS = 'SELECT EXISTS (SELECT 1 FROM {schema}.{default}) AS has_rows'
+
+# Свободное место под HOT-обновления нужно только секциям delivery_state (см. db/models/delivery_state.py).
+STORAGE_PARAMETERS = MappingProxyType({'delivery_state': f' WITH (fillfactor = {DELIVERY_STATE_FILLFACTOR})'})
+
+
+class DBService:
+
+    """Класс для высокоуровневой работы с PG."""
+
+    def __init__(self, database: AbstractDBClient) -> None:
+        """
+        Конструктор.
+
+        Args:
+            database: интерфейс для низкоуровневой работы с БД.
+        """
+        self.db = database
+
+    async def get_partitions(self, table: str) -> List[Partition]:
+        """
+        Метод достаёт секции таблицы.
+
+        Args:
+            table: секционированная таблица (без схемы)
+
+        Returns:
+            Вернёт секции по возрастанию верхней границы.
+        """
+        query = GET_PARTITIONS.bindparams(parent=f'{PARTITION_SCHEMA}.{table}')
+        result = await self.db.execute(query)
+        return [Partition(**row._mapping) for row in result or []]  # noqa: WPS437
+
+    async def create_partition(
+        self,
+        table: str,
+        partition_name: str,
+        partition_start: datetime,
+        lock_timeout_ms: int
+    ) -> None:
+        """
+        Метод создаёт секцию на один интервал (PARTITION_INTERVAL) и забирает её строки из секции по умолчанию.
+
+        Всё в одной транзакции. ATTACH блокирует секцию по умолчанию (и проверяет, что в ней не осталось строк
+        из диапазона новой секции), поэтому блокировку ждём не дольше lock_timeout_ms, как и при отцеплении.
+
+        Args:
+            table: секционированная таблица (без схемы)
+            partition_name: название секции (без схемы)
+            partition_start: начало секции
+            lock_timeout_ms: сколько ждать блокировку (мс)
+        """
+        names = {
+            'schema': PARTITION_SCHEMA,
+            'table': table,
+            'partition': partition_name,
+            'default': get_default_partition_name(table),
+            'start': partition_start.isoformat(),
+            'end': (partition_start + PARTITION_INTERVAL).isoformat(),
+            'storage': STORAGE_PARAMETERS.get(table, '')
+        }
+        lock_timeout = int(lock_timeout_ms)
+        async with self.db.transaction():
+            await self.db.execute(text(f'SET LOCAL lock_timeout = {lock_timeout}'))
+            await self.db.execute(text(CREATE_DETACHED_PARTITION.format(**names)))
+            await self.db.execute(text(MOVE_FROM_DEFAULT.format(**names)))
+            await self.db.execute(text(ATTACH_PARTITION.format(**names)))
+
+    async def has_default_rows(self, table: str) -> bool:
+        """
+        Метод проверяет, попадали ли строки в секцию по умолчанию.
+
+        Args:
+            table: секционированная таблица (без схемы)
+
+        Returns:
+            Вернёт True, если в секции по умолчанию есть строки.
+        """
+        query = HAS_DEFAULT_ROWS.format(schema=PARTITION_SCHEMA, default=get_default_partition_name(table))
+        result = await self.db.execute(text(query).columns(has_rows=Boolean))
+        return bool(result and result[0].has_rows)
+
+    async def retire_partition(
+        self,
+        table: str,
+        partition_name: str,
+        archive_schema: str,
+        lock_timeout_ms: int
+    ) -> None:
+        """
+        Метод отцепляет секцию от таблицы и переносит её в схему архива (или удаляет).
+
+        Всё в одной транзакции: отцепленная, но не перенесённая секция не потеряется, если что-то упадёт посередине.
+        DETACH берёт эксклюзивную блокировку на всю таблицу, поэтому ждём её не дольше lock_timeout_ms:
+        лучше отцепить секцию в следующий раз, чем выстроить за собой очередь из запросов горячего пути.
+
+        Args:
+            table: секционированная таблица (без схемы)
+            partition_name: название секции (без схемы)
+            archive_schema: схема архива (пусто — секция удаляется)
+            lock_timeout_ms: сколько ждать блокировку (мс)
+        """
+        partition = f'{PARTITION_SCHEMA}.{partition_name}'
+        lock_timeout = int(lock_timeout_ms)
+        async with self.db.transaction():
+            await self.db.execute(text(f'SET LOCAL lock_timeout = {lock_timeout}'))
+            await self.db.execute(text(f'ALTER TABLE {PARTITION_SCHEMA}.{table} DETACH PARTITION {partition}'))
+
+            if not archive_schema:
+                await self.db.execute(text(f'DROP TABLE {partition}'))
+                return
+
+            await self.db.execute(text(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}'))
+            await self.db.execute(text(f'ALTER TABLE {partition} SET SCHEMA {archive_schema}'))
+
+
+logger = logging.getLogger('partition_retention.db_service')
+db_service = DBService(database=db)
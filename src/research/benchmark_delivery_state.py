@@ -0,0 +1,183 @@
+"""
+Бенчмарк обновлений отметок обработки: «как было» против «как стало».
+
+Как было — отметки (passed_to_handler_at, sent_at, sent_result) лежат в широкой строке рядом с JSONB message,
+каждое обновление переписывает всю строку.
+Как стало — отметки в узкой таблице с fillfactor (db/models/delivery_state.py).
+
+На каждое уведомление выполняется цепочка обработчиков: взять в обработку (formatter), взять на отправку (sender),
+записать ответ SMTP. Бенчмарк создаёт обе таблицы в отдельной схеме, замеряет обновления в секунду,
+размер таблиц после прогона и долю HOT-обновлений, а в конце удаляет схему.
+
+Запуск (из директории src, Postgres и Vault должны быть доступны):
+python -m research.benchmark_delivery_state --rows 20000 --concurrency 20 --message-size 1500
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from typing import List
+
+import asyncpg
+import orjson
+
+from config.settings import config
+from db.models.delivery_state import DELIVERY_STATE_FILLFACTOR
+
+SCHEMA = 'research_delivery_state'
+MEBIBYTE = 2 ** 20
+
+CREATE_TABLES = f"""
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.wide (
+    id uuid PRIMARY KEY,
+    message jsonb NOT NULL,
+    deleted_at timestamptz,
+    passed_to_handler_at timestamptz,
+    sent_at timestamptz,
+    sent_result text
+);
+CREATE TABLE {SCHEMA}.narrow_emails (
+    id uuid PRIMARY KEY,
+    message jsonb NOT NULL,
+    deleted_at timestamptz
+);
+CREATE TABLE {SCHEMA}.narrow_state (
+    notification_id uuid PRIMARY KEY REFERENCES {SCHEMA}.narrow_emails (id) ON DELETE CASCADE,
+    passed_to_handler_at timestamptz,
+    sent_at timestamptz,
+    sent_result text
+) WITH (fillfactor = {DELIVERY_STATE_FILLFACTOR});
+"""
+
+WIDE_STEPS = (
+    f"""UPDATE {SCHEMA}.wide SET passed_to_handler_at = now()
+    WHERE id = $1 AND passed_to_handler_at IS NULL AND deleted_at IS NULL""",
+    f'UPDATE {SCHEMA}.wide SET sent_at = now() WHERE id = $1 AND sent_at IS NULL AND deleted_at IS NULL',
+    f"UPDATE {SCHEMA}.wide SET sent_result = '250 OK' WHERE id = $1 AND deleted_at IS NULL"
+)
+
+NARROW_STEPS = (
+    f"""INSERT INTO {SCHEMA}.narrow_state (notification_id, passed_to_handler_at)
+    SELECT id, now() FROM {SCHEMA}.narrow_emails WHERE id = $1 AND deleted_at IS NULL FOR SHARE
+    ON CONFLICT (notification_id) DO UPDATE SET passed_to_handler_at = excluded.passed_to_handler_at
+    WHERE {SCHEMA}.narrow_state.passed_to_handler_at IS NULL""",
+    f'UPDATE {SCHEMA}.narrow_state SET sent_at = now() WHERE notification_id = $1 AND sent_at IS NULL',
+    f"UPDATE {SCHEMA}.narrow_state SET sent_result = '250 OK' WHERE notification_id = $1"
+)
+
+TABLE_STATS = """
+SELECT n_tup_upd + n_tup_ins AS writes, n_tup_hot_upd AS hot, pg_total_relation_size(relid) AS size
+FROM pg_stat_user_tables WHERE schemaname = $1 AND relname = $2
+"""
+
+
+async def fill(pool: asyncpg.Pool, table: str, ids: List[uuid.UUID], message_size: int) -> None:
+    """
+    Функция заполняет таблицу уведомлениями.
+
+    Args:
+        pool: пул соединений
+        table: таблица с колонками id и message
+        ids: id уведомлений
+        message_size: примерный размер JSONB message в байтах
+    """
+    # Случайный текст: иначе Postgres сожмёт message в пару байт и широкая строка перестанет быть широкой.
+    message = orjson.dumps({'text': os.urandom(message_size // 2).hex()}).decode()
+    async with pool.acquire() as connection:
+        await connection.copy_records_to_table(
+            table,
+            schema_name=SCHEMA,
+            columns=['id', 'message'],
+            records=((notification_id, message) for notification_id in ids)
+        )
+
+
+async def measure(pool: asyncpg.Pool, steps: tuple, ids: List[uuid.UUID], concurrency: int) -> float:
+    """
+    Функция прогоняет цепочку обновлений по всем уведомлениям и замеряет их кол-во в секунду.
+
+    Args:
+        pool: пул соединений
+        steps: запросы цепочки (параметр — id уведомления)
+        ids: id уведомлений
+        concurrency: сколько уведомлений обрабатывается одновременно
+
+    Returns:
+        Вернёт кол-во обновлений в секунду.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process(notification_id: uuid.UUID) -> None:
+        async with semaphore:
+            async with pool.acquire() as connection:
+                for step in steps:
+                    await connection.execute(step, notification_id)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(process(notification_id) for notification_id in ids))
+    return len(ids) * len(steps) / (time.perf_counter() - started_at)
+
+
+async def print_table_stats(pool: asyncpg.Pool, label: str, tables: List[str]) -> None:
+    """
+    Функция печатает размер таблиц и долю HOT-обновлений.
+
+    Args:
+        pool: пул соединений
+        label: подпись
+        tables: таблицы варианта
+    """
+    for table in tables:
+        row = await pool.fetchrow(TABLE_STATS, SCHEMA, table)
+        hot_share = row['hot'] / row['writes'] if row['writes'] else 0
+        size_mib = row['size'] / MEBIBYTE
+        print(f'{label:8} {table:14} size {size_mib:8.1f} MiB, hot updates {hot_share:6.1%}')  # noqa: WPS421
+
+
+async def main(rows: int, concurrency: int, message_size: int) -> None:
+    """
+    Функция запускает оба варианта и печатает результат.
+
+    Args:
+        rows: сколько уведомлений создать
+        concurrency: сколько уведомлений обрабатывается одновременно
+        message_size: примерный размер JSONB message в байтах
+    """
+    pool = await asyncpg.create_pool(
+        user=config.pg.login.get_secret_value(),
+        password=config.pg.password.get_secret_value(),
+        host=config.pg.host,
+        database=config.pg.db_name,
+        min_size=concurrency,
+        max_size=concurrency
+    )
+    ids = [uuid.uuid4() for _ in range(rows)]
+    try:
+        await pool.execute(CREATE_TABLES)
+        await fill(pool, 'wide', ids, message_size)
+        await fill(pool, 'narrow_emails', ids, message_size)
+
+        before = await measure(pool, WIDE_STEPS, ids, concurrency)
+        after = await measure(pool, NARROW_STEPS, ids, concurrency)
+
+        await asyncio.sleep(1)  # Даём статистике доехать до pg_stat_user_tables.
+        await print_table_stats(pool, 'before', ['wide'])
+        await print_table_stats(pool, 'after', ['narrow_emails', 'narrow_state'])
+    finally:
+        await pool.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+        await pool.close()
+
+    print(f'wide row:        {before:10.1f} updates/s')  # noqa: WPS421
+    print(f'delivery_state:  {after:10.1f} updates/s')  # noqa: WPS421
+    print(f'speedup:         {after / before:10.1f}x')  # noqa: WPS421
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark delivery state updates')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--message-size', type=int, default=1500)
+    args = parser.parse_args()
+    asyncio.run(main(rows=args.rows, concurrency=args.concurrency, message_size=args.message_size))
@@ -0,0 +1,101 @@
+"""
+Бенчмарк двухступенчатого конвейера (как email_formatter → email_sender) поверх разных брокеров.
+
+Первая ступень перекладывает сообщение во вторую очередь, вторая — подтверждает и замеряет задержку
+от публикации до обработки. Бизнес логики нет, так что меряется только накладные расходы брокера.
+
+Запуск (из директории src, для rabbit Rabbit и Vault должны быть доступны):
+python -m research.benchmark_pipeline --broker memory --messages 10000
+python -m research.benchmark_pipeline --broker rabbit --messages 10000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from functools import partial
+from typing import List
+
+from aio_pika.abc import AbstractIncomingMessage
+
+from db.message_brokers.abstract_classes import AbstractMessageBroker
+from db.message_brokers.memory_message_broker import InMemoryMessageBroker
+from db.message_brokers.rabbit_message_broker import RabbitMessageBroker
+
+QUEUE_FORMAT = 'queue_benchmark_format'
+QUEUE_SEND = 'queue_benchmark_send'
+
+
+async def format_callback(broker: AbstractMessageBroker, message: AbstractIncomingMessage) -> None:
+    """
+    Функция первой ступени: перекладывает сообщение во вторую очередь.
+
+    Args:
+        broker: брокер сообщений
+        message: сообщение
+    """
+    await broker.publish(message_body=message.body, queue_name=QUEUE_SEND)
+    await message.ack()
+
+
+async def send_callback(
+    latencies: List[float],
+    messages: int,
+    done: asyncio.Event,
+    message: AbstractIncomingMessage
+) -> None:
+    """
+    Функция второй ступени: замеряет задержку и подтверждает сообщение.
+
+    Args:
+        latencies: сюда складываются задержки
+        messages: сколько всего сообщений ждём
+        done: выставится, когда придут все сообщения
+        message: сообщение
+    """
+    latencies.append(time.perf_counter() - float(message.body))
+    await message.ack()
+    if len(latencies) == messages:
+        done.set()
+
+
+async def main(broker_name: str, messages: int) -> None:
+    """
+    Функция прогоняет сообщения через конвейер и печатает результат.
+
+    Args:
+        broker_name: rabbit или memory
+        messages: сколько сообщений опубликовать
+    """
+    broker = InMemoryMessageBroker() if broker_name == 'memory' else RabbitMessageBroker()
+    await broker.start()
+    await broker.idempotency_startup()
+
+    latencies: List[float] = []
+    done = asyncio.Event()
+    consumers = asyncio.gather(
+        broker.consume(queue_name=QUEUE_FORMAT, callback=partial(format_callback, broker)),
+        broker.consume(queue_name=QUEUE_SEND, callback=partial(send_callback, latencies, messages, done))
+    )
+
+    started_at = time.perf_counter()
+    for _ in range(messages):
+        await broker.publish(message_body=str(time.perf_counter()).encode(), queue_name=QUEUE_FORMAT)
+    await done.wait()
+    elapsed = time.perf_counter() - started_at
+
+    broker.stop_consuming()
+    await consumers
+    await broker.stop()
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(f'{broker_name}: {messages / elapsed:10.1f} msg/s')  # noqa: WPS421
+    print(f'latency p50: {percentiles[49] * 1000:8.2f} ms')  # noqa: WPS421
+    print(f'latency p99: {percentiles[98] * 1000:8.2f} ms')  # noqa: WPS421
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark formatter -> sender pipeline')
+    parser.add_argument('--broker', choices=['memory', 'rabbit'], default='memory')
+    parser.add_argument('--messages', type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main(broker_name=args.broker, messages=args.messages))
@@ -0,0 +1,115 @@
+"""
+Бенчмарк скорости publish в RabbitMQ: «как было» против «как стало».
+
+Как было — на каждое сообщение новое соединение, новый канал, объявление обменника и очереди.
+Как стало — одно долгоживущее соединение и пул каналов (RabbitMessageBroker.start()).
+
+Запуск (из директории src, Rabbit и Vault должны быть доступны):
+python -m research.benchmark_publish --messages 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import aio_pika
+from aio_pika import DeliveryMode, ExchangeType, Message
+
+from config.settings import config
+from db.message_brokers.broker_factory import message_broker_factory
+
+QUEUE_NAME = 'queue_benchmark_publish'
+
+
+async def publish_with_new_connection(message_body: bytes) -> None:
+    """
+    Функция повторяет старую реализацию publish: соединение на каждое сообщение.
+
+    Args:
+        message_body: содержимое сообщения
+    """
+    connection = await aio_pika.connect_robust(
+        host=config.rabbit_mq.host,
+        port=config.rabbit_mq.port,
+        login=config.rabbit_mq.login.get_secret_value(),
+        password=config.rabbit_mq.password.get_secret_value()
+    )
+    try:
+        channel = await connection.channel()
+        exchange_incoming = await channel.declare_exchange(
+            name=config.rabbit_mq.exchange_incoming,
+            type=ExchangeType.FANOUT,
+            durable=True
+        )
+        queue = await channel.declare_queue(
+            name=QUEUE_NAME,
+            durable=True,
+            arguments={'x-dead-letter-exchange': config.rabbit_mq.exchange_retry}
+        )
+        await queue.bind(config.rabbit_mq.exchange_sorter, routing_key=QUEUE_NAME)
+        message = Message(body=message_body, delivery_mode=DeliveryMode.PERSISTENT)
+        await exchange_incoming.publish(message=message, routing_key=QUEUE_NAME)
+    finally:
+        await connection.close()
+
+
+async def publish_with_pool(message_body: bytes) -> None:
+    """
+    Функция публикует сообщение через долгоживущее соединение и пул каналов.
+
+    Args:
+        message_body: содержимое сообщения
+    """
+    await message_broker_factory.publish(message_body=message_body, queue_name=QUEUE_NAME)
+
+
+async def measure(publish: Callable[[bytes], Awaitable[None]], messages: int, concurrency: int) -> float:
+    """
+    Функция замеряет кол-во опубликованных сообщений в секунду.
+
+    Args:
+        publish: функция публикации одного сообщения
+        messages: сколько сообщений опубликовать
+        concurrency: сколько publish выполняется одновременно
+
+    Returns:
+        Вернёт кол-во сообщений в секунду.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def publish_one(number: int) -> None:
+        async with semaphore:
+            await publish(f'benchmark {number}'.encode())
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(publish_one(number) for number in range(messages)))
+    return messages / (time.perf_counter() - started_at)
+
+
+async def main(messages: int, concurrency: int) -> None:
+    """
+    Функция запускает оба варианта и печатает результат.
+
+    Args:
+        messages: сколько сообщений опубликовать
+        concurrency: сколько publish выполняется одновременно
+    """
+    await message_broker_factory.start()
+    await message_broker_factory.idempotency_startup()
+    try:
+        before = await measure(publish_with_new_connection, messages, concurrency)
+        after = await measure(publish_with_pool, messages, concurrency)
+    finally:
+        await message_broker_factory.stop()
+
+    print(f'connection per message: {before:10.1f} msg/s')  # noqa: WPS421
+    print(f'persistent connection:  {after:10.1f} msg/s')  # noqa: WPS421
+    print(f'speedup:                {after / before:10.1f}x')  # noqa: WPS421
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark RabbitMessageBroker.publish')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(messages=args.messages, concurrency=args.concurrency))
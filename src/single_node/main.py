@@ -0,0 +1,105 @@
+"""
+Модуль запускает весь конвейер обработки в одном процессе.
+
+outbox_relay, partition_retention, group_handler, email_formatter и email_sender работают в одном event loop
+и общаются через общий брокер сообщений. С message_broker=memory Rabbit вообще не нужен —
+это режим для небольших установок на одной машине, где поход в брокер дороже самой обработки.
+API по-прежнему отдельный процесс: он пишет сообщения в outbox, а отсюда их забирает outbox_relay.
+"""
+import asyncio
+import logging
+import signal
+from logging import config as logging_config
+
+import aiohttp
+
+from config.logging_settings import LOGGING
+from config.settings import config
+from db.cache.dedup_cache import dedup_cache
+from db.message_brokers.broker_factory import message_broker_factory
+from db.storage import orm_factory
+from email_formatter.callback import callback as formatter_callback  # type: ignore
+from email_sender.callback import callback as sender_callback  # type: ignore
+from group_handler.callback import callback as group_callback  # type: ignore
+from outbox_relay.services.outbox_relay import outbox_relay_service
+from partition_retention.services.partition_retention import partition_retention_service
+from utils import aiohttp_session
+
+
+def stop(stopping: asyncio.Event) -> None:
+    """
+    Функция останавливает outbox_relay, partition_retention и все consumer-ы.
+
+    Args:
+        stopping: событие остановки outbox_relay и partition_retention
+    """
+    stopping.set()
+    message_broker_factory.stop_consuming()
+
+
+async def startup(stopping: asyncio.Event) -> None:
+
+    """
+    Функция для действий во время старта приложения.
+
+    Args:
+        stopping: событие остановки outbox_relay и partition_retention
+    """
+
+    headers = {'Authorization': config.auth_api.access_token.get_secret_value()}
+    aiohttp_session.session = aiohttp.ClientSession(headers=headers)
+    await message_broker_factory.start()
+    await message_broker_factory.idempotency_startup()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop, stopping)
+    await orm_factory.db.start()
+    await dedup_cache.start()
+    logger.info('Started single node')
+
+
+async def shutdown() -> None:
+
+    """Функция для действий во время завершения работы приложения."""
+
+    await aiohttp_session.session.close()  # type: ignore
+    await message_broker_factory.stop()
+    await orm_factory.db.stop()
+    await dedup_cache.stop()
+
+
+async def main() -> None:
+
+    """Функция, запускающая всё приложение."""
+
+    stopping = asyncio.Event()
+    await startup(stopping)
+    await asyncio.gather(
+        outbox_relay_service.run(stopping),
+        partition_retention_service.run(stopping),
+        message_broker_factory.consume(
+            queue_name=config.rabbit_mq.queue_raw_group_messages,
+            callback=group_callback,
+            prefetch_count=config.rabbit_mq.prefetch_raw_group_messages,
+            max_in_flight=config.rabbit_mq.max_in_flight_raw_group_messages
+        ),
+        message_broker_factory.consume(
+            queue_name=config.rabbit_mq.queue_raw_single_messages,
+            callback=formatter_callback,
+            prefetch_count=config.rabbit_mq.prefetch_raw_single_messages,
+            max_in_flight=config.rabbit_mq.max_in_flight_raw_single_messages
+        ),
+        message_broker_factory.consume(
+            queue_name=config.rabbit_mq.queue_formatted_single_messages,
+            callback=sender_callback,
+            prefetch_count=config.rabbit_mq.prefetch_formatted_single_messages,
+            max_in_flight=config.rabbit_mq.max_in_flight_formatted_single_messages
+        )
+    )
+    await shutdown()
+
+
+logging_config.dictConfig(LOGGING)
+logger = logging.getLogger('single_node')
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
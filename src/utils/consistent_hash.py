@@ -0,0 +1,32 @@
+"""Модуль содержит функцию консистентного хеширования (jump consistent hash, Lamping & Veach)."""
+import hashlib
+
+JUMP_MULTIPLIER = 2862933555777941757
+UINT64 = 2 ** 64  # noqa: WPS432
+JUMP_SCALE = 2 ** 31  # noqa: WPS432
+JUMP_SHIFT = 33
+
+
+def jump_hash(key: str, buckets: int) -> int:
+    """
+    Функция выбирает номер корзины для ключа.
+
+    Один и тот же ключ всегда попадает в одну корзину (в любом процессе — hash() не подойдёт, он солится),
+    а при увеличении кол-ва корзин с n до n + 1 переезжает только 1 / (n + 1) ключей.
+
+    Args:
+        key: ключ (например, destination_id)
+        buckets: кол-во корзин
+
+    Returns:
+        Вернёт номер корзины от 0 до buckets - 1.
+    """
+    digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+    bucket, candidate = -1, 0
+
+    while candidate < buckets:
+        bucket = candidate
+        digest = (digest * JUMP_MULTIPLIER + 1) % UINT64
+        candidate = int((bucket + 1) * (JUMP_SCALE / ((digest >> JUMP_SHIFT) + 1)))
+
+    return bucket
@@ -2,7 +2,6 @@
 import aiohttp
 
 from config.settings import config
-from db.message_brokers.rabbit_message_broker import message_broker_factory
 from db.storage import orm_factory
 from utils import aiohttp_session
 
@@ -13,10 +12,9 @@ async def startup() -> None:
 
     headers = {'Authorization': config.auth_api.access_token.get_secret_value()}
     aiohttp_session.session = aiohttp.ClientSession(headers=headers)
-    await message_broker_factory.idempotency_startup()
 
     # await event_broker.start()
-    await orm_factory.db.start()
+    await orm_factory.db.start(with_replica=True)
 
 
 async def shutdown() -> None:
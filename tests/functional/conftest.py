@@ -3,6 +3,7 @@ import asyncio
 from typing import Optional, Callable, Generator, AsyncGenerator
 
 import aiohttp
+import asyncpg
 import pytest
 
 from tests.functional.settings import settings
@@ -37,6 +38,16 @@ async def session() -> AsyncGenerator:
     await session.close()
 
 
+@pytest.fixture
+async def pg_connection() -> AsyncGenerator:
+    """Фикстура возвращает соединение с Postgres, настроенное для проверки планов."""
+    connection = await asyncpg.connect(settings.pg.dsn)
+    await connection.execute('SET enable_seqscan = off')
+    await connection.execute('SET plan_cache_mode = force_custom_plan')
+    yield connection
+    await connection.close()
+
+
 @pytest.fixture
 def make_request(session: dict) -> Callable:
     """
@@ -0,0 +1,122 @@
+"""Модуль содержит тесты outbox_relay."""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncGenerator, Coroutine, List
+
+import pytest
+
+from config.settings import config
+from outbox_relay.models.outbox_row import OutboxRow
+from outbox_relay.services import outbox_relay as outbox_relay_module
+from outbox_relay.services.outbox_relay import outbox_relay_service
+
+
+# Единый декоратор для всех асинхронных тестов (https://github.com/pytest-dev/pytest-asyncio#pytestmarkasyncio)
+pytestmark = pytest.mark.asyncio
+
+
+class FakeDB:
+
+    """Подмена соединения с БД: транзакция ничего не делает."""
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncGenerator:
+        """Метод открывает пустую транзакцию."""
+        yield
+
+
+class FakeDBService:
+
+    """Подмена сервиса outbox: всегда отдаёт полную пачку и запоминает удалённые id."""
+
+    def __init__(self) -> None:
+        self.db = FakeDB()
+        self.deleted_ids: List[int] = []
+
+    async def lock_batch(self, limit: int) -> List[OutboxRow]:
+        """
+        Метод возвращает полную пачку сообщений.
+
+        Args:
+            limit: размер пачки
+
+        Returns:
+            Вернёт limit сообщений в одну очередь.
+        """
+        return [
+            OutboxRow(
+                id=row_id,
+                queue_name='outbox_test',
+                message_body=b'{}',
+                message_headers=None,
+                delay=0,
+                shard_key=None,
+                created_at=datetime.now(timezone.utc)
+            )
+            for row_id in range(limit)
+        ]
+
+    async def delete_by_ids(self, ids: List[int]) -> None:
+        """
+        Метод запоминает удалённые id.
+
+        Args:
+            ids: id сообщений
+        """
+        self.deleted_ids.extend(ids)
+
+
+class RejectingBroker:
+
+    """Подмена брокера: не подтверждает ни одного сообщения."""
+
+    def __init__(self, stopping: asyncio.Event) -> None:
+        self.stopping = stopping
+        self.calls = 0
+
+    async def publish_many(self, messages_body: List[bytes], **kwargs: Any) -> List[bool]:
+        """
+        Метод «публикует» сообщения.
+
+        Если relay не ждёт между пачками, после нескольких вызовов тест останавливает его сам.
+
+        Args:
+            messages_body: тела сообщений
+            kwargs: остальные параметры publish_many
+
+        Returns:
+            Вернёт False для каждого сообщения.
+        """
+        self.calls += 1
+        if self.calls >= 3:
+            self.stopping.set()
+        return [False] * len(messages_body)
+
+
+async def test_relay_waits_when_nothing_confirmed(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Функция проверяет, что relay ждёт poll_interval, если брокер отверг всю пачку, а не берёт её снова.
+
+    Args:
+        monkeypatch: фикстура pytest для подмены атрибутов
+    """
+    stopping = asyncio.Event()
+    db_service = FakeDBService()
+    broker = RejectingBroker(stopping)
+    timeouts = []
+
+    async def fake_wait_for(awaitable: Coroutine, timeout: float) -> None:
+        awaitable.close()
+        timeouts.append(timeout)
+        stopping.set()
+
+    monkeypatch.setattr(outbox_relay_module, 'db_service', db_service)
+    monkeypatch.setattr(outbox_relay_module, 'message_broker_factory', broker)
+    monkeypatch.setattr(outbox_relay_module.asyncio, 'wait_for', fake_wait_for)
+
+    await outbox_relay_service.run(stopping)
+
+    assert broker.calls == 1
+    assert timeouts == [config.outbox.poll_interval]
+    assert not db_service.deleted_ids
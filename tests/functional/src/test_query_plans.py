@@ -0,0 +1,115 @@
+"""
+Модуль содержит регрессионную проверку планов запросов горячего пути (EXPLAIN).
+
+Тестам нужна база с применёнными миграциями (данные не нужны) и настройки сервисов (Vault):
+запросы берутся у самих сервисов (см. testdata/query_plans.py).
+Запрос выполняется через asyncpg с теми же параметрами, что у сервиса, и план смотрится через EXPLAIN:
+- таблицы горячего пути не читаются Seq Scan — поиск идёт по индексу;
+- блокировки ищут строку по первичному ключу;
+- где запрос читает только ключ, чтение должно остаться Index Only Scan;
+- секции раньше created_from отбрасываются.
+
+enable_seqscan выключен, чтобы на пустой базе планировщик не выбрал Seq Scan просто потому, что таблица маленькая:
+если подходящего индекса нет, Seq Scan всё равно останется в плане.
+Запросы с секциями в Postgres 13 отбрасывают их только в custom плане (для UPDATE), поэтому он и проверяется.
+"""
+import json
+import re
+from typing import Iterator, List, Optional
+
+import asyncpg
+import pytest
+
+from tests.functional.testdata.models import PlanCheck
+from tests.functional.testdata.query_plans import CREATED_FROM, PARAMS, plan_checks
+
+# Единый декоратор для всех асинхронных тестов (https://github.com/pytest-dev/pytest-asyncio#pytestmarkasyncio)
+pytestmark = pytest.mark.asyncio
+
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_(?:p(?P<day>\d{8})|legacy|(?P<default>default))$')
+
+
+def iter_scans(plan: dict) -> Iterator[dict]:
+    """
+    Функция обходит дерево плана и отдаёт узлы, читающие таблицы.
+
+    Args:
+        plan: узел плана (EXPLAIN FORMAT JSON)
+
+    Yields:
+        Узлы Seq Scan, Index Scan, Index Only Scan и т.д.
+    """
+    if 'Relation Name' in plan and plan['Node Type'].endswith('Scan'):
+        yield plan
+    for child in plan.get('Plans', []):
+        yield from iter_scans(child)
+
+
+def get_table(relation: str) -> str:
+    """
+    Функция возвращает таблицу, к которой относится секция.
+
+    Args:
+        relation: таблица или секция
+
+    Returns:
+        Вернёт название секционированной таблицы (для обычной таблицы — её саму).
+    """
+    partition = PARTITION_NAME.match(relation)
+    return partition.group('table') if partition else relation
+
+
+def get_index_name(scan: dict) -> Optional[str]:
+    """
+    Функция возвращает индекс, по которому читается таблица.
+
+    Args:
+        scan: узел плана, читающий таблицу
+
+    Returns:
+        Вернёт название индекса (для Bitmap Heap Scan — индекса под ним) или None, если индекса нет.
+    """
+    if 'Index Name' in scan:
+        return scan['Index Name']
+    for child in scan.get('Plans', []):
+        index_name = get_index_name(child)
+        if index_name:
+            return index_name
+    return None
+
+
+@pytest.mark.parametrize('check', plan_checks, ids=[check.name for check in plan_checks])
+async def test_query_plan(pg_connection: asyncpg.Connection, check: PlanCheck) -> None:
+    """
+    Функция проверяет план запроса горячего пути.
+
+    Args:
+        pg_connection: соединение с Postgres
+        check: запрос и ожидания от его плана
+    """
+    explain = await pg_connection.fetchval(f'EXPLAIN (FORMAT JSON) {check.query.sql}', *check.query.bind(PARAMS))
+
+    scans: List[dict] = [
+        scan for scan in iter_scans(json.loads(explain)[0]['Plan'])
+        if get_table(scan['Relation Name']) in check.tables
+    ]
+    assert scans, f'{check.name}: no scans of {check.tables} in plan'
+
+    for scan in scans:
+        description = f'{check.name}: {scan["Node Type"]} of {scan["Relation Name"]}'
+        assert scan['Node Type'] != 'Seq Scan', description
+        if check.index_only:
+            assert scan['Node Type'] == 'Index Only Scan', description
+        if check.primary_key:
+            index_name = get_index_name(scan)
+            assert index_name and index_name.endswith('_pkey'), f'{description} via {index_name}'
+
+    if check.pruned:
+        first_day = f'{CREATED_FROM:%Y%m%d}'
+        for scan in scans:
+            partition = PARTITION_NAME.match(scan['Relation Name'])
+            # Секцию по умолчанию условие created_at >= ... не отбрасывает: пока секции наперёд есть, она пуста.
+            if partition is None or partition.group('default'):
+                continue
+            assert partition.group('day') and partition.group('day') >= first_day, \
+                f'{check.name}: partition {scan["Relation Name"]} was not pruned'
@@ -1,10 +1,11 @@
 """Модуль содержит pydantic модели."""
 from dataclasses import dataclass
-from typing import Dict, Optional, Union
+from typing import Dict, Optional, Tuple, Union
 from uuid import UUID
 
 from multidict import CIMultiDictProxy
 
+from db.storage.compiled_query import CompiledQuery
 from src.notifier_api.models.base_orjson import BaseOrjson  # type: ignore
 
 
@@ -36,3 +37,20 @@ class Scenario(BaseOrjson):
         """Настройка валидации при изменении значения поля."""
 
         validate_assignment = True
+
+
+class PlanCheck(BaseOrjson):
+
+    """Запрос горячего пути, план которого проверяем через EXPLAIN."""
+
+    name: str
+    query: CompiledQuery  # Запрос, который выполняет сервис
+    tables: Tuple[str, ...]  # Таблицы (и их секции), которые нельзя читать Seq Scan
+    index_only: bool = False  # Читать их можно только Index Only Scan
+    primary_key: bool = False  # Читать их можно только по первичному ключу
+    pruned: bool = False  # Секции раньше created_from должны быть отброшены
+
+    class Config:
+        """CompiledQuery — не pydantic модель."""
+
+        arbitrary_types_allowed = True
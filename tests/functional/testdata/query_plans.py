@@ -0,0 +1,145 @@
+"""
+Модуль содержит запросы горячего пути, планы которых проверяет test_query_plans.
+
+Запросы берутся у самих сервисов, а не переписываются сюда руками: заранее скомпилированные CompiledQuery
+(src/db/storage/compiled_query.py) — как есть, а запросы, которые собираются на каждый вызов, —
+через те же функции-сборщики, скомпилированные db.prepare. В EXPLAIN уходит ровно тот SQL, что выполняет сервис.
+
+Частичных и покрывающих индексов под блокировки нет (см. миграцию b9e2d7f4a318_hot_path_indexes):
+каждая блокировка ищет одну строку по первичному ключу, что и проверяет primary_key. Outbox разбирается
+по порядку первичного ключа, а FOR UPDATE всё равно читает саму строку — Index Only Scan тут невозможен.
+"""
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from config.settings import config
+from db.storage.orm_factory import db
+from db.storage.partitions import PARTITION_INTERVAL, get_partition_start
+from email_formatter.services.pg import db_service as formatter_db
+from email_sender.services.pg import db_service as sender_db
+from group_handler.services.pg import db_service as group_handler_db
+from notifier_api.api.v1.emails.single_emails import get_delete_email, get_idempotent_insert
+from outbox_relay.services.pg import get_lock_batch
+
+from tests.functional.testdata.models import PlanCheck
+
+NOTIFICATION_ID = UUID('00000000-0000-4000-8000-000000000000')
+# Секция, созданная наперёд: все секции до неё (в том числе *_legacy) план должен отбросить.
+CREATED_FROM = get_partition_start(datetime.now(timezone.utc)) + 2 * PARTITION_INTERVAL
+
+# Значения bindparam по именам: каждый запрос берёт те, что в нём есть (см. CompiledQuery.bind).
+PARAMS = {
+    'created_from': CREATED_FROM,
+    'notification_id': NOTIFICATION_ID,
+    'notification_ids': [NOTIFICATION_ID],
+    'results': ['250 OK'],
+}
+
+# Окно идемпотентности начинается ровно с CREATED_FROM.
+NEW_EMAIL = {
+    'id': NOTIFICATION_ID,
+    'source': 'plan_check',
+    'destination_id': NOTIFICATION_ID,
+    'template_id': NOTIFICATION_ID,
+    'subject': 'plan check',
+    'message': {},
+    'delay': 0,
+    'created_at': CREATED_FROM + timedelta(seconds=config.partitions.idempotency_window),
+}
+
+plan_checks = [
+    PlanCheck(
+        name='formatter_claim_and_fetch',
+        query=formatter_db._claim_and_fetch,
+        tables=('single_emails', 'html_templates'),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='formatter_unmark',
+        query=formatter_db._unmark_as_passed_to_handler,
+        tables=('delivery_state',),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='formatter_mark_as_expired',
+        query=formatter_db._mark_as_expired,
+        tables=('single_emails',),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='sender_mark_many_as_sent_at',
+        query=sender_db._mark_many_as_sent_at,
+        tables=('delivery_state',),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='sender_unmark_as_sent_at',
+        query=sender_db._unmark_as_sent_at,
+        tables=('delivery_state',),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='sender_mark_as_sent_results',
+        query=sender_db._mark_as_sent_results,
+        tables=('delivery_state',),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='sender_mark_as_expired',
+        query=sender_db._mark_as_expired,
+        tables=('delivery_state',),
+        primary_key=True,
+        pruned=True
+    ),
+    PlanCheck(
+        name='group_handler_lock',
+        query=group_handler_db._mark_as_passed_to_handler,
+        tables=('group_emails',),
+        primary_key=True
+    ),
+    PlanCheck(
+        name='group_handler_unlock',
+        query=group_handler_db._unmark_as_passed_to_handler,
+        tables=('group_emails',),
+        primary_key=True
+    ),
+    PlanCheck(
+        name='group_handler_mark_as_expired',
+        query=group_handler_db._mark_as_expired,
+        tables=('group_emails',),
+        primary_key=True
+    ),
+    PlanCheck(
+        name='group_handler_get_raw_data',
+        query=group_handler_db._get_raw_data_by_id,
+        tables=('group_emails',),
+        primary_key=True
+    ),
+    # Повтор ключа идемпотентности ищется только по ключу: Index Only Scan.
+    PlanCheck(
+        name='api_idempotent_insert',
+        query=db.prepare(get_idempotent_insert(NEW_EMAIL)),
+        tables=('single_emails',),
+        index_only=True,
+        pruned=True
+    ),
+    # Время создания почты API при удалении не знает — секции не отбрасываются, но каждая ищется по ключу.
+    PlanCheck(
+        name='api_delete_email',
+        query=db.prepare(get_delete_email(NOTIFICATION_ID)),
+        tables=('single_emails',),
+        primary_key=True
+    ),
+    PlanCheck(
+        name='outbox_lock_batch',
+        query=db.prepare(get_lock_batch(config.outbox.batch_size)),
+        tables=('outbox',),
+        primary_key=True
+    )
+]